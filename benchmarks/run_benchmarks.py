@@ -0,0 +1,215 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+import numpy as np
+
+# The pipeline modules live in the project root and embedding/
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'embedding'))
+
+from synthetic import llm_output, synthetic_graph, write_corpus
+from stub_neo4j import StubDriver
+
+results_dir = os.path.join(script_dir, 'results')
+BENCHMARKS = ['parse', 'extract', 'repair', 'ingest', 'embedding', 'clustering']
+
+# A throughput drop larger than this against the baseline is flagged
+regression_threshold = 0.10
+
+
+def timed(name, items, fn, **extra):
+    """Runs fn once and returns its benchmark entry."""
+    start = time.perf_counter()
+    out = fn()
+    seconds = time.perf_counter() - start
+    entry = {'seconds': seconds, 'items': items,
+             'items_per_sec': items / seconds if seconds > 0 else float('inf'), **extra}
+    print(f"{name:<12}{items:>10}{seconds:>10.2f}s{entry['items_per_sec']:>14.1f}/s")
+    return entry, out
+
+
+def hashing_encoder(dim=384):
+    """
+    Deterministic bag-of-words encoder (hashed token counts), a fast offline
+    stand-in for the sentence-transformers model.
+    """
+    def encode(texts):
+        out = np.zeros((len(texts), dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in text.lower().split():
+                out[row, zlib.crc32(token.encode('utf-8')) % dim] += 1.0
+        return out
+    encode.model_name = 'hashing'
+    return encode
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=project_root,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run(args):
+    from corpus_reader import iter_corpus
+    from tei_prompt import build_prompt_from_record
+    from extraction import ExtractionRunner, MockBackend
+    from llm_json_repair import repair_directory
+    from database_test import Neo4jPusher
+    from embedding_store import EmbeddingStore, make_encoder
+    from cluster_selection import select_k
+
+    only = set(args.only.split(',')) if args.only else set(BENCHMARKS)
+    work = tempfile.mkdtemp(prefix='nasa_nlp_bench_')
+    xml_dir, txt_dir = os.path.join(work, 'xmls'), os.path.join(work, 'txt')
+    os.makedirs(txt_dir)
+    results = {}
+    try:
+        print(f"Generating {args.papers} synthetic TEI papers in {work}...")
+        start = time.perf_counter()
+        corpus_bytes = write_corpus(xml_dir, args.papers, seed=args.seed, sections=args.sections)
+        print(f"  {corpus_bytes / 1e6:.1f} MB in {time.perf_counter() - start:.1f}s\n")
+        print(f"{'benchmark':<12}{'items':>10}{'time':>11}{'throughput':>16}")
+
+        # Parsing feeds the later stages, so it always runs
+        entry, records = timed('parse', args.papers, lambda: list(iter_corpus(xml_dir)))
+        entry['mb_per_sec'] = corpus_bytes / 1e6 / entry['seconds']
+        if 'parse' in only:
+            results['parse'] = entry
+
+        if 'extract' in only:
+            prompts = [(r.file, build_prompt_from_record(r)[0]) for r in records]
+
+            def respond(text):
+                # Each prompt maps to a stable synthetic graph
+                return json.dumps(synthetic_graph(zlib.crc32(text.encode('utf-8')), args.seed))
+
+            backend = MockBackend(latency=args.latency, jitter=args.latency / 2,
+                                  failure_rate=args.failure_rate, seed=args.seed, responder=respond)
+            runner = ExtractionRunner(backend, concurrency=args.concurrency, progress_every=10 ** 9)
+            entry, out = timed('extract', len(prompts), lambda: runner.run(prompts))
+            entry.update(retries=sum(r.retries for r in out), failed=sum(1 for r in out if r.error),
+                         latency=args.latency, failure_rate=args.failure_rate,
+                         concurrency=args.concurrency)
+            results['extract'] = entry
+
+        # Raw LLM outputs with injected glitches, for repair and ingest
+        rng = random.Random(args.seed)
+        for i in range(args.papers):
+            with open(os.path.join(txt_dir, f'synthetic_{i:06d}.txt'), 'w', encoding='utf-8') as f:
+                f.write(llm_output(synthetic_graph(i, args.seed), rng, args.glitch_rate))
+
+        if 'repair' in only or 'ingest' in only:
+            entry, reports = timed('repair', args.papers, lambda: repair_directory(txt_dir))
+            entry.update({s: sum(1 for r in reports if r['status'] == s) for s in ('ok', 'repaired', 'failed')})
+            if 'repair' in only:
+                results['repair'] = entry
+
+        if 'ingest' in only:
+            documents = []
+            for name in sorted(os.listdir(txt_dir)):
+                if name.endswith('.json'):
+                    with open(os.path.join(txt_dir, name), encoding='utf-8') as f:
+                        documents.append(json.load(f))
+            driver = StubDriver()
+            pusher = Neo4jPusher(None, None, None, driver=driver)
+            rows = sum(len(d['nodes']) + len(d['relationships']) for d in documents)
+            entry, _ = timed('ingest', rows, lambda: pusher.push_batched(documents, batch_size=args.batch_size))
+            entry.update(driver.stats(), documents=len(documents), batch_size=args.batch_size)
+            results['ingest'] = entry
+
+        embeddings = None
+        if 'embedding' in only or 'clustering' in only:
+            ids = list(range(1, len(records) + 1))
+            texts = [r.abstract for r in records]
+            encoder = make_encoder(batch_size=64) if args.model else hashing_encoder()
+            store = EmbeddingStore(work, dtype='float32')
+            entry, (_, embeddings, _) = timed('embedding', len(texts), lambda: store.update(ids, texts, encoder))
+            # A second pass with nothing new measures the incremental path alone
+            start = time.perf_counter()
+            store.update(ids, texts, encoder)
+            entry.update(model=encoder.model_name, noop_update_seconds=time.perf_counter() - start)
+            if 'embedding' in only:
+                results['embedding'] = entry
+
+        if 'clustering' in only:
+            matrix = np.asarray(embeddings, dtype=np.float32)
+            entry, selection = timed('clustering', len(matrix),
+                                     lambda: select_k(matrix, range(2, 11), mode='warm', seed=args.seed))
+            entry.update(best_k=selection[int(np.nanargmax([r['silhouette'] for r in selection]))]['k'])
+            results['clustering'] = entry
+    finally:
+        if args.keep:
+            print(f"\nKept benchmark files in {work}")
+        else:
+            shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline_path):
+    """Prints throughput changes against a previous results file."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\nAgainst {os.path.basename(baseline_path)} (commit {baseline.get('commit')}):")
+    regressions = 0
+    for name, entry in results.items():
+        old = baseline['benchmarks'].get(name)
+        if not old:
+            continue
+        change = entry['items_per_sec'] / old['items_per_sec'] - 1
+        flag = ''
+        if change < -regression_threshold:
+            flag = '  ⚠️ regression'
+            regressions += 1
+        print(f"  {name:<12}{old['items_per_sec']:>12.1f} -> {entry['items_per_sec']:>12.1f}/s ({change:+.1%}){flag}")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline Nasa_NLP pipeline benchmarks on a synthetic corpus.')
+    parser.add_argument('--papers', type=int, default=1000, help='Synthetic corpus size (1k-100k)')
+    parser.add_argument('--sections', type=int, default=8, help='Body sections per paper')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', help='Comma-separated subset of: ' + ', '.join(BENCHMARKS))
+    parser.add_argument('--latency', type=float, default=0.05, help='Mock Gemini latency in seconds')
+    parser.add_argument('--failure-rate', type=float, default=0.02, help='Mock Gemini 429/503 rate')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--glitch-rate', type=float, default=0.1, help='Share of malformed LLM outputs')
+    parser.add_argument('--batch-size', type=int, default=500, help='Rows per UNWIND batch')
+    parser.add_argument('--model', action='store_true', help='Use the real sentence-transformers model')
+    parser.add_argument('--out', help='Results file (default: results/<commit>-<papers>.json)')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated corpus')
+    args = parser.parse_args()
+
+    commit = git_commit()
+    benchmarks = run(args)
+    report = {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'config': {k: v for k, v in vars(args).items() if k not in ('out', 'compare', 'keep')},
+        'benchmarks': benchmarks,
+    }
+    out = args.out or os.path.join(results_dir, f"{commit}-{args.papers}.json")
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {out}")
+
+    if args.compare and compare(benchmarks, args.compare):
+        sys.exit(1)
@@ -0,0 +1,87 @@
+import threading
+
+
+class StubResult:
+    def consume(self):
+        return None
+
+    def data(self):
+        return []
+
+    def single(self):
+        return None
+
+    def __iter__(self):
+        return iter([])
+
+
+class StubTransaction:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def run(self, query, parameters=None, **kwargs):
+        self.driver.record(query, parameters or kwargs)
+        return StubResult()
+
+
+class StubSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        return None
+
+    def run(self, query, parameters=None, **kwargs):
+        self.driver.record(query, parameters or kwargs)
+        return StubResult()
+
+    def execute_write(self, work, *args, **kwargs):
+        with self.driver.lock:
+            self.driver.transactions += 1
+        return work(StubTransaction(self.driver), *args, **kwargs)
+
+    execute_read = execute_write
+
+
+class StubDriver:
+    """
+    Drop-in for neo4j.Driver that stores nothing and counts what would have
+    gone over the wire: sessions, transactions, round-trips (statements) and
+    UNWIND rows. Inject it with Neo4jPusher(..., driver=StubDriver()).
+    With keep_statements, every (query, parameters) pair is also kept in
+    `statements`, so tests can check the Cypher that was sent.
+    """
+
+    def __init__(self, keep_statements=False):
+        self.lock = threading.Lock()
+        self.statements = [] if keep_statements else None
+        self.sessions = 0
+        self.transactions = 0
+        self.round_trips = 0
+        self.rows = 0
+
+    def session(self, **kwargs):
+        with self.lock:
+            self.sessions += 1
+        return StubSession(self)
+
+    def record(self, query, parameters):
+        rows = parameters.get("rows") if isinstance(parameters, dict) else None
+        with self.lock:
+            if self.statements is not None:
+                self.statements.append((query, parameters))
+            self.round_trips += 1
+            self.rows += len(rows) if rows is not None else 1
+
+    def close(self):
+        return None
+
+    def stats(self):
+        return {"sessions": self.sessions, "transactions": self.transactions,
+                "round_trips": self.round_trips, "rows": self.rows}
@@ -0,0 +1,187 @@
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+
+# Vocabulary drawn from the NASA bioscience corpus, so tokenisation, prompt
+# budgets and entity names behave like the real files
+WORDS = (
+    "microgravity spaceflight radiation bone loss muscle atrophy mice astronaut plant root "
+    "arabidopsis gene expression oxidative stress immune response cell culture stem cells "
+    "microbial biofilm bacteria yeast protein signaling pathway mitochondria telomere "
+    "cardiovascular heart vascular tissue skeletal hindlimb unloading simulated rotating "
+    "wall vessel clinostat international space station transcriptome proteome metabolism "
+    "dna damage repair calcium osteoclast osteoblast fibroblast growth development "
+    "circadian rhythm sleep vision intracranial pressure countermeasure exercise diet"
+).split()
+
+FUNDERS = ["National Aeronautics and Space Administration", "European Space Agency",
+           "National Institutes of Health", "National Science Foundation",
+           "Japan Aerospace Exploration Agency", "German Aerospace Center"]
+INSTITUTIONS = ["NASA Ames Research Center", "University of Edinburgh", "Stanford University",
+                "Kennedy Space Center", "University of Colorado", "Johnson Space Center"]
+SECTION_HEADS = ["Introduction", "Methods", "Materials and methods", "Results", "Discussion",
+                 "Conclusions", "Statistical analysis", "Animals"]
+
+# (from label, type, to label) as declared in system_prompt.txt
+SCHEMA = [
+    ("Publication", "HAS_OBJECTIVE", "Objective"),
+    ("Publication", "FACES_CHALLENGE", "Challenge"),
+    ("Publication", "USES_METHOD", "Methodology"),
+    ("Methodology", "APPLIED_IN", "Experiment"),
+    ("Experiment", "INVOLVES_ENTITY", "BiologicalEntity"),
+    ("Experiment", "PERFORMS_MEASUREMENT", "Measurement"),
+    ("Experiment", "OBSERVES_PHENOMENON", "Phenomenon"),
+    ("Experiment", "YIELDS_RESULT", "Result"),
+    ("Publication", "USES_TECH", "Technology"),
+    ("Publication", "SUPPORTED_BY", "FundingSource"),
+    ("Publication", "CONDUCTED_BY", "ResearchGroup"),
+]
+# Labels whose entities recur across papers; the rest are paper-specific
+SHARED_LABELS = {"Methodology", "BiologicalEntity", "Measurement", "Phenomenon",
+                 "Technology", "FundingSource", "ResearchGroup"}
+
+
+def sentence(rng, n_words):
+    return " ".join(rng.choice(WORDS) for _ in range(n_words)).capitalize() + "."
+
+
+def paragraph(rng, n_sentences):
+    return " ".join(sentence(rng, rng.randint(8, 25)) for _ in range(n_sentences))
+
+
+def camel(words):
+    return words[0] + "".join(w.capitalize() for w in words[1:])
+
+
+def shared_name(rng, label, pool_size=400):
+    """Entity name from a Zipf-like pool, so popular entities repeat across papers."""
+    rank = min(int(rng.paretovariate(1.2)), pool_size)
+    local = random.Random(f"{label}:{rank}")
+    return " ".join(local.choice(WORDS) for _ in range(local.randint(1, 3)))
+
+
+def synthetic_tei(index, seed=0, sections=8, references=30):
+    """
+    One GROBID-style TEI document: header (title, funder, date, authors with
+    affiliations, DOI), keywords and abstract, body sections, and a back
+    matter with acknowledgement and bibliography, like datas/grobid_output.
+    """
+    rng = random.Random(f"{seed}:{index}")
+    title = sentence(rng, rng.randint(6, 16))[:-1]
+    authors = []
+    for a in range(rng.randint(2, 8)):
+        authors.append(
+            f'<author><persName><forename type="first">{rng.choice(WORDS).capitalize()}</forename>'
+            f'<surname>{rng.choice(WORDS).capitalize()}</surname></persName>'
+            f'<affiliation key="aff{a}"><orgName type="institution">{rng.choice(INSTITUTIONS)}</orgName>'
+            f'</affiliation></author>')
+    body = "".join(
+        f'<div xmlns="http://www.tei-c.org/ns/1.0"><head>{rng.choice(SECTION_HEADS)}</head>'
+        f'<p>{escape(paragraph(rng, rng.randint(4, 12)))}</p><p>{escape(paragraph(rng, rng.randint(2, 8)))}</p></div>'
+        for _ in range(sections))
+    bibl = "".join(
+        f'<biblStruct xml:id="b{r}"><analytic><title level="a" type="main">{escape(sentence(rng, 10))}</title>'
+        f'</analytic><monogr><imprint><date type="published" when="{rng.randint(1990, 2024)}"/></imprint>'
+        f'</monogr></biblStruct>'
+        for r in range(references))
+    keywords = "".join(f"<term>{rng.choice(WORDS)} {rng.choice(WORDS)}</term>" for _ in range(rng.randint(3, 7)))
+    year = rng.randint(2005, 2025)
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<TEI xml:space="preserve" xmlns="http://www.tei-c.org/ns/1.0">
+	<teiHeader xml:lang="en">
+		<fileDesc>
+			<titleStmt>
+				<title level="a" type="main">{escape(title)}</title>
+				<funder><orgName type="full">{rng.choice(FUNDERS)}</orgName></funder>
+			</titleStmt>
+			<publicationStmt><publisher>Synthetic</publisher>
+				<date type="published" when="{year}-01-01">{year}-01-01</date></publicationStmt>
+			<sourceDesc><biblStruct><analytic>{"".join(authors)}
+				<idno type="DOI">10.0000/synthetic.{seed}.{index}</idno></analytic></biblStruct></sourceDesc>
+		</fileDesc>
+		<profileDesc>
+			<textClass><keywords>{keywords}</keywords></textClass>
+			<abstract><div xmlns="http://www.tei-c.org/ns/1.0"><p>{escape(paragraph(rng, rng.randint(5, 10)))}</p></div></abstract>
+		</profileDesc>
+	</teiHeader>
+	<text xml:lang="en">
+		<body>{body}</body>
+		<back>
+			<div type="acknowledgement"><div><head>Acknowledgements</head><p>{escape(paragraph(rng, 2))}</p></div></div>
+			<div type="references"><listBibl>{bibl}</listBibl></div>
+		</back>
+	</text>
+</TEI>
+"""
+
+
+def synthetic_graph(index, seed=0, per_type=(1, 4)):
+    """
+    One extraction result shaped like d.json and the system_prompt.txt schema:
+    a Publication node, entities for every relationship type (shared ones
+    drawn from a cross-paper pool) and the relationships between them.
+    """
+    rng = random.Random(f"graph:{seed}:{index}")
+    publication = f"paper{seed}x{index}"
+    nodes = {("Publication", publication): {"label": "Publication", "id": publication,
+                                            "summary": paragraph(rng, 2)}}
+    relationships = []
+    ids_by_label = {"Publication": [publication]}
+    for source_label, rel_type, target_label in SCHEMA:
+        sources = ids_by_label.get(source_label) or [publication]
+        for _ in range(rng.randint(*per_type)):
+            if target_label in SHARED_LABELS:
+                name = shared_name(rng, target_label)
+            else:
+                name = f"{sentence(rng, 3)[:-1]} {index}"
+            node_id = camel(name.lower().split())
+            node = {"label": target_label, "id": node_id, "name": name.title(),
+                    "description": sentence(rng, 12)}
+            nodes.setdefault((target_label, node_id), node)
+            ids_by_label.setdefault(target_label, []).append(node_id)
+            relationships.append({"from": rng.choice(sources), "type": rel_type, "to": node_id})
+    return {"nodes": list(nodes.values()), "relationships": relationships}
+
+
+def llm_output(graph, rng, glitch_rate=0.1):
+    """
+    Serialises a graph the way the model does, injecting the failure modes
+    llm_json_repair.py handles (fences, trailing commas, nested label, truncation)
+    at `glitch_rate`.
+    """
+    text = json.dumps(graph, indent=2, ensure_ascii=False)
+    if rng.random() >= glitch_rate:
+        return text
+    glitch = rng.choice(["fences", "trailing_comma", "nested_label", "truncated"])
+    if glitch == "fences":
+        return f"```json\n{text}\n```"
+    if glitch == "trailing_comma":
+        return text.replace("}\n  ]", "},\n  ]", 1)
+    if glitch == "nested_label":
+        return text.replace('"label": ', '"label": {"label": ', 1).replace('",\n      "id"', '"},\n      "id"', 1)
+    return text[:int(len(text) * rng.uniform(0.5, 0.95))]
+
+
+def _write_paper(args):
+    directory, index, seed, sections = args
+    text = synthetic_tei(index, seed, sections)
+    with open(os.path.join(directory, f"synthetic_{index:06d}.pdf.tei.xml"), "w", encoding="utf-8") as f:
+        f.write(text)
+    return len(text.encode("utf-8"))
+
+
+def write_corpus(directory, n_papers, seed=0, sections=8, processes=None):
+    """
+    Writes n_papers synthetic TEI files into directory (in parallel).
+
+    Returns:
+        int: Total bytes written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    jobs = [(directory, i, seed, sections) for i in range(n_papers)]
+    if processes == 1 or n_papers < 64:
+        return sum(map(_write_paper, jobs))
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return sum(pool.map(_write_paper, jobs, chunksize=64))
@@ -0,0 +1,348 @@
+import json
+import os
+import re
+import sys
+import zlib
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import numpy as np
+
+txt_dir = Path("/home/ady/prjs/hh/Nasa_NLP/txt")
+# Reviewed alias table: the only one applied before loading the graph
+alias_path = Path("/home/ady/prjs/hh/Nasa_NLP/alias_table.json")
+# Proposed aliases written by this script, to be reviewed and saved as alias_path
+candidates_path = Path("/home/ady/prjs/hh/Nasa_NLP/alias_candidates.json")
+
+STOPWORDS = {"a", "an", "the", "of", "and", "in", "on", "for", "to", "with", "by", "from"}
+
+# Labels whose ids are never aliased (titles that look alike are different papers)
+EXCLUDED_LABELS = {"Publication"}
+
+# Words and word prefixes that flip an entity's meaning: names that differ in
+# them (increasedBoneLoss / decreasedBoneLoss, homodimerization / dimerization)
+# are never merged
+POLARITY_WORDS = {"increase", "increased", "decrease", "decreased", "up", "down", "upregulated",
+                  "downregulated", "upregulation", "downregulation", "high", "low", "higher",
+                  "lower", "gain", "loss", "positive", "negative", "not", "no", "non", "anti",
+                  "without", "reduced", "elevated", "enhanced", "impaired", "deficient"}
+POLARITY_PREFIXES = ("increased", "decreased", "hetero", "hyper", "under", "anti", "down",
+                     "homo", "hypo", "over", "non", "dis", "in", "de", "un", "up")
+
+# Mersenne prime used for the MinHash permutations
+_PRIME = (1 << 61) - 1
+
+
+def normalize_name(value):
+    """
+    Normalisation rules applied before any matching: camelCase and
+    snake/kebab-case are split into words, text is lowercased, punctuation
+    and stopwords are dropped, and plural words are singularised.
+    """
+    value = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", str(value))
+    value = re.sub(r"([A-Z]+)([A-Z][a-z])", r"\1 \2", value)
+    words = re.findall(r"[^\W_]+", value.lower())
+    out = []
+    for word in words:
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        out.append(word)
+    return " ".join(out)
+
+
+def shingles(text, n=3):
+    """Character n-grams of a normalised name (the whole name if shorter)."""
+    text = text.replace(" ", "_")
+    if len(text) <= n:
+        return {text}
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class MinHasher:
+    """MinHash signatures over string shingles with seeded universal hashing."""
+
+    def __init__(self, num_perm=64, seed=42):
+        rng = np.random.default_rng(seed)
+        # a, b and the 32-bit shingle hashes stay below 2^32, so a * x + b fits in uint64
+        self.a = rng.integers(1, 1 << 32, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 32, num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+
+    def signature(self, items):
+        hashes = np.array([zlib.crc32(s.encode("utf-8")) for s in items], dtype=np.uint64)
+        # (a * x + b) mod p for every permutation and shingle
+        values = (np.outer(self.a, hashes) + self.b[:, None]) % _PRIME
+        return values.min(axis=1)
+
+
+def lsh_candidates(signatures, bands=16):
+    """
+    Blocking index: candidate pairs are keys whose signatures agree on every
+    row of at least one band, so only likely matches are ever compared.
+    """
+    buckets = defaultdict(list)
+    for key, sig in signatures.items():
+        rows = len(sig) // bands
+        for band in range(bands):
+            buckets[(band, sig[band * rows:(band + 1) * rows].tobytes())].append(key)
+    pairs = set()
+    for keys in buckets.values():
+        if 1 < len(keys) <= 50:  # oversized buckets are uninformative
+            for i in range(len(keys)):
+                for j in range(i + 1, len(keys)):
+                    pairs.add((keys[i], keys[j]) if keys[i] < keys[j] else (keys[j], keys[i]))
+    return pairs
+
+
+def markers(norm):
+    """Tokens that identify a specific variant: anything with a digit, or very short."""
+    return {w for w in norm.split() if len(w) <= 2 or any(c.isdigit() for c in w)}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def _strip_prefix(word):
+    for prefix in POLARITY_PREFIXES:
+        if word.startswith(prefix) and len(word) - len(prefix) >= 4:
+            return word[len(prefix):]
+    return word
+
+
+def polarity_conflict(a, b):
+    """
+    True if two normalised names differ in a polarity or negation word, or
+    in a word that is the other's word with a polarity prefix
+    (upregulated / downregulated, dimerization / homodimerization).
+    """
+    wa, wb = set(a.split()), set(b.split())
+    if wa & POLARITY_WORDS != wb & POLARITY_WORDS:
+        return True
+    return any(_strip_prefix(x) == _strip_prefix(y) for x in wa - wb for y in wb - wa)
+
+
+def compatible(a, b):
+    """Whether two normalised names may be aliases: same markers, same polarity."""
+    return markers(a) == markers(b) and not polarity_conflict(a, b)
+
+
+class UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        self.parent.setdefault(x, x)
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a, b):
+        self.parent[self.find(a)] = self.find(b)
+
+
+def load_alias_table(path=alias_path):
+    """{label: {alias id: canonical id}}; an empty table if the file is missing."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_alias_table(table, path=candidates_path):
+    """Writes a table for review; it is applied only once saved as alias_path."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(table, f, indent=1, sort_keys=True)
+
+
+def build_alias_table(documents, table=None, threshold=0.9, encoder=None,
+                      embedding_threshold=0.9, embedding_floor=0.5):
+    """
+    Groups near-duplicate node ids per label and maps every alias to one
+    canonical id. Publication ids (EXCLUDED_LABELS) are never aliased.
+
+    Ids with the same normalised name are merged directly. Other pairs come
+    only from the MinHash/LSH blocking index and must share the same numeric
+    and short marker tokens (so isoforms and residues stay apart) and the
+    same polarity (see polarity_conflict). They merge on name similarity
+    alone only when the Jaccard similarity of their name shingles reaches
+    `threshold`. With an `encoder` (texts -> vectors), candidate pairs between
+    `embedding_floor` and `threshold` also merge when their name embeddings
+    have cosine similarity >= `embedding_threshold`. A merge is refused if it
+    would put incompatible names into one group, so near-matches do not chain.
+
+    Args:
+        documents (iterable): {"nodes": [...], "relationships": [...]} dicts.
+        table (dict): Reviewed alias table; its canonical ids stay canonical,
+            so incremental runs are stable.
+
+    Returns:
+        dict: Updated {label: {alias id: canonical id}}, to be reviewed.
+    """
+    table = {label: dict(aliases) for label, aliases in (table or {}).items()}
+    counts = Counter()
+    for data in documents:
+        for node in data.get("nodes", []):
+            if node.get("label") and node.get("id") and node["label"] not in EXCLUDED_LABELS:
+                counts[(node["label"], node["id"])] += 1
+    # Already-known canonical ids take part so new aliases can attach to them
+    for label, aliases in table.items():
+        for canonical in set(aliases.values()):
+            counts.setdefault((label, canonical), 0)
+    known_canonical = {(label, c) for label, aliases in table.items() for c in aliases.values()}
+
+    names = {key: normalize_name(key[1]) for key in counts}
+    for label, aliases in table.items():
+        for alias in aliases:
+            names.setdefault((label, alias), normalize_name(alias))
+    uf = UnionFind()
+    members = {key: [key] for key in names}
+
+    def merge(a, b, check=True):
+        ra, rb = uf.find(a), uf.find(b)
+        if ra == rb:
+            return
+        if check and not all(compatible(names[x], names[y]) for x in members[ra] for y in members[rb]):
+            return
+        uf.union(ra, rb)
+        members[rb].extend(members.pop(ra))
+
+    # Reviewed aliases are kept as they are
+    for label, aliases in table.items():
+        for alias, canonical in aliases.items():
+            merge((label, alias), (label, canonical), check=False)
+
+    by_norm = {}
+    for key in counts:
+        first = by_norm.setdefault((key[0], names[key]), key)
+        merge(key, first, check=False)
+
+    hasher = MinHasher()
+    reps = {first: shingles(norm) for (label, norm), first in by_norm.items() if norm}
+    signatures = {key: hasher.signature(sh) for key, sh in reps.items()}
+
+    borderline = []
+    for a, b in sorted(lsh_candidates(signatures)):
+        if a[0] != b[0] or not compatible(names[a], names[b]):
+            continue  # never merge across labels, residues/isoforms like S58 vs S62, or opposites
+        score = jaccard(reps[a], reps[b])
+        if score >= threshold:
+            merge(a, b)
+        elif encoder is not None and score >= embedding_floor:
+            borderline.append((a, b))
+
+    if borderline:
+        keys = sorted({k for pair in borderline for k in pair})
+        vectors = np.asarray(encoder([names[k] for k in keys]), dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        row = {k: i for i, k in enumerate(keys)}
+        for a, b in borderline:
+            if float(vectors[row[a]] @ vectors[row[b]]) >= embedding_threshold:
+                merge(a, b)
+
+    groups = defaultdict(list)
+    for key in counts:
+        groups[uf.find(key)].append(key)
+
+    for members in groups.values():
+        # Keep an existing canonical id; otherwise the most used, then shortest id
+        canonical = min(members, key=lambda k: (k not in known_canonical, -counts[k], len(k[1]), k[1]))
+        for key in members:
+            if key != canonical:
+                table.setdefault(key[0], {})[key[1]] = canonical[1]
+    return table
+
+
+def endpoint_aliases(table):
+    """
+    {alias id: canonical id} over every label, for relationship endpoints
+    (which carry no label). Ids aliased to different canonical ids under
+    different labels are left out.
+    """
+    flat = {}
+    ambiguous = set()
+    for aliases in table.values():
+        for alias, canonical in aliases.items():
+            if flat.setdefault(alias, canonical) != canonical:
+                ambiguous.add(alias)
+    for alias in ambiguous:
+        del flat[alias]
+    return flat
+
+
+def apply_aliases(data, table, endpoints=None):
+    """
+    Rewrites node ids and relationship endpoints of one document to their
+    canonical ids, merging nodes that collapse onto the same id. Endpoints
+    that are not nodes of this document (they live in other files) are
+    mapped through the whole table.
+
+    Args:
+        endpoints (dict): endpoint_aliases(table), precomputed by callers
+            that apply one table to many documents.
+    """
+    if endpoints is None:
+        endpoints = endpoint_aliases(table)
+    id_map = {}
+    nodes = {}
+    for node in data.get("nodes", []):
+        label, node_id = node.get("label"), node.get("id")
+        canonical = table.get(label, {}).get(node_id, node_id)
+        id_map[node_id] = canonical
+        merged = nodes.setdefault((label, canonical), {})
+        merged.update(node)
+        merged["id"] = canonical
+
+    relationships = {}
+    for rel in data.get("relationships", []):
+        rel = dict(rel)
+        for end in ("from", "to"):
+            node_id = rel.get(end)
+            rel[end] = id_map[node_id] if node_id in id_map else endpoints.get(node_id, node_id)
+        relationships[(rel["from"], rel.get("type"), rel["to"])] = rel
+    return {"nodes": list(nodes.values()), "relationships": list(relationships.values())}
+
+
+def node_count(documents, table=None):
+    """Distinct (label, id) nodes across documents, optionally after aliasing."""
+    table = table or {}
+    return len({(n.get("label"), table.get(n.get("label"), {}).get(n.get("id"), n.get("id")))
+                for data in documents for n in data.get("nodes", [])})
+
+
+if __name__ == "__main__":
+    from database_test import document_files
+
+    use_embeddings = "--embeddings" in sys.argv
+    files = document_files(txt_dir)
+    documents = []
+    for f in files:
+        try:
+            documents.append(json.loads(f.read_text(encoding="utf-8")))
+        except json.JSONDecodeError as e:
+            print(f"⚠️ Invalid JSON in {f.name}: {e}")
+
+    encoder = None
+    if use_embeddings:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "embedding"))
+        from embedding_store import make_encoder
+        encoder = make_encoder()
+
+    reviewed = load_alias_table()
+    table = build_alias_table(documents, reviewed, encoder=encoder)
+    save_alias_table(table)
+
+    for label, aliases in sorted(table.items()):
+        for alias, canonical in sorted(aliases.items()):
+            if reviewed.get(label, {}).get(alias) != canonical:
+                print(f"  {label}: {alias} -> {canonical}")
+    before, after = node_count(documents), node_count(documents, table)
+    aliases = sum(len(a) for a in table.values())
+    print(f"Nodes: {before} -> {after} ({before - after} merged, "
+          f"{(before - after) / max(before, 1):.1%} fewer); {aliases} aliases in {candidates_path}")
+    print(f"Review the candidates and save them as {alias_path}; only that file is applied.")
@@ -0,0 +1,163 @@
+import os
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from metrics import metrics
+
+# Namespace of GROBID TEI files; iterparse reports tags as '{uri}local'
+TEI_NS = '{http://www.tei-c.org/ns/1.0}'
+
+# Elements whose full subtree is needed when they close. Everything else is
+# cleared as soon as it ends, so memory stays bounded on 600 KB files.
+CAPTURED = {'title', 'idno', 'persName', 'orgName', 'funder', 'date', 'term', 'abstract'}
+BACK_DIV_TYPES = ('acknowledgement', 'funding')
+
+
+@dataclass
+class PaperRecord:
+    """Compact per-paper record produced by one streaming pass over a TEI file."""
+    file: str
+    title: str = ""
+    abstract: str = ""
+    doi: str = ""
+    year: int = None
+    keywords: list = field(default_factory=list)
+    authors: list = field(default_factory=list)
+    affiliations: list = field(default_factory=list)
+    funding: list = field(default_factory=list)
+    acknowledgement: str = ""
+    sections: list = field(default_factory=list)  # (heading, text) pairs
+    size: int = 0
+    seconds: float = 0.0
+    error: str = None
+
+
+def clean_text(element):
+    """Joins all text fragments of an element and collapses whitespace."""
+    if element is None:
+        return ""
+    return ' '.join("".join(element.itertext()).split())
+
+
+def spaced_text(element):
+    """Like clean_text, but keeps a space between child elements (names)."""
+    return ' '.join(t.strip() for t in element.itertext() if t.strip())
+
+
+def parse_tei(file_path):
+    """
+    Streams one GROBID TEI file with iterparse and returns its PaperRecord.
+    Parse errors are reported in `record.error` instead of being raised, so a
+    corpus scan never stops on one malformed file.
+    """
+    record = PaperRecord(file=os.path.basename(file_path))
+    start = time.perf_counter()
+    try:
+        record.size = os.path.getsize(file_path)
+        stack = []
+        # Number of open elements whose subtree is still needed
+        keeping = 0
+        keep_flags = []
+        for event, elem in ET.iterparse(file_path, events=('start', 'end')):
+            tag = elem.tag[len(TEI_NS):] if elem.tag.startswith(TEI_NS) else elem.tag
+            if event == 'start':
+                parent = stack[-1] if stack else None
+                keep = tag in CAPTURED or (tag == 'div' and (
+                    parent == 'body' or (parent == 'back' and elem.get('type') in BACK_DIV_TYPES)))
+                stack.append(tag)
+                keep_flags.append(keep)
+                keeping += keep
+                continue
+
+            stack.pop()
+            keeping -= keep_flags.pop()
+            _capture(record, tag, elem, stack)
+            # Free the subtree unless an enclosing element still needs it
+            if not keeping:
+                elem.clear()
+    except ET.ParseError as e:
+        record.error = f"Error parsing file: {e}"
+    except OSError as e:
+        record.error = f"Error reading file: {e}"
+    record.seconds = time.perf_counter() - start
+    return record
+
+
+def _capture(record, tag, elem, stack):
+    """Copies the text of a just-closed element into the record, by position."""
+    parent = stack[-1] if stack else None
+
+    if tag == 'title' and parent == 'titleStmt' and not record.title:
+        record.title = clean_text(elem)
+    elif tag == 'funder' and parent == 'titleStmt':
+        name = clean_text(elem)
+        if name:
+            record.funding.append(name)
+    elif tag == 'date' and 'publicationStmt' in stack and record.year is None:
+        when = elem.get('when', '')
+        if when[:4].isdigit():
+            record.year = int(when[:4])
+    elif tag == 'idno' and elem.get('type') == 'DOI' and 'sourceDesc' in stack and not record.doi:
+        record.doi = clean_text(elem)
+    # Cited works also have analytic/author entries, under listBibl; only the
+    # paper's own header (sourceDesc) counts
+    elif tag == 'persName' and parent == 'author' and 'analytic' in stack and 'sourceDesc' in stack:
+        name = spaced_text(elem)
+        if name:
+            record.authors.append(name)
+    elif tag == 'orgName' and 'affiliation' in stack and 'analytic' in stack and 'sourceDesc' in stack:
+        name = clean_text(elem)
+        if name and name not in record.affiliations:
+            record.affiliations.append(name)
+    elif tag == 'term' and parent == 'keywords':
+        term = clean_text(elem)
+        if term:
+            record.keywords.append(term)
+    elif tag == 'abstract' and 'profileDesc' in stack:
+        record.abstract = clean_text(elem)
+    elif tag == 'div' and parent == 'body':
+        head = clean_text(elem.find(TEI_NS + 'head'))
+        text = " ".join(clean_text(p) for p in elem.findall(TEI_NS + 'p'))
+        if text:
+            record.sections.append((head, text))
+    elif tag == 'div' and parent == 'back' and elem.get('type') in BACK_DIV_TYPES:
+        text = " ".join(clean_text(p) for p in elem.iter(TEI_NS + 'p'))
+        record.acknowledgement = " ".join(filter(None, [record.acknowledgement, text]))
+
+
+def list_tei_files(xml_directory):
+    """Sorted paths of every .xml file in a directory."""
+    files = sorted(f for f in os.listdir(xml_directory) if f.lower().endswith('.xml'))
+    return [os.path.join(xml_directory, f) for f in files]
+
+
+def iter_corpus(xml_directory=None, files=None, processes=None, chunksize=8):
+    """
+    Yields a PaperRecord for every TEI file, in sorted file order.
+
+    Args:
+        xml_directory (str): Folder of TEI files (ignored if `files` is given).
+        files (list): Explicit file paths to read instead of a whole folder.
+        processes (int): Worker processes; 1 parses in-process, None uses all cores.
+        chunksize (int): Files handed to a worker at a time.
+    """
+    paths = list(files) if files is not None else list_tei_files(xml_directory)
+    if processes == 1 or len(paths) < 2:
+        yield from _observed(map(parse_tei, paths))
+        return
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        yield from _observed(pool.map(parse_tei, paths, chunksize=chunksize))
+
+
+def _observed(records):
+    """Records parse latency and bytes read in the parent process (workers' metrics are not shared)."""
+    for record in records:
+        metrics.observe("tei.parse", record.seconds)
+        metrics.count("tei.files")
+        metrics.count("tei.bytes_read", record.size)
+        if record.error:
+            metrics.count("tei.errors")
+        yield record
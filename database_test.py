@@ -1,24 +1,104 @@
 import json
+import time
 from pathlib import Path
 from neo4j import GraphDatabase
 
+from schema import prompt_path, schema_labels
+from canonicalize import alias_path, apply_aliases, endpoint_aliases, load_alias_table
+from dedup import skip_duplicates
+from metrics import metrics
+
 password = "F7W9GlWtknBO60zxgJ319UQ2SbWgpoTUD0xBcjMCBqI"
 uri = "neo4j+s://63457fdc.databases.neo4j.io"
 user = "neo4j"
 
 txt_dir = Path("/home/ady/prjs/hh/Nasa_NLP/txt")
 
+# Rows sent per UNWIND statement / transaction in push_batched
+batch_size = 500
+
+# Touched after every batched ingest into the real graph, so graph_api.py drops its cached results
+ingest_marker = Path(__file__).resolve().parent / ".graph_ingested"
+
+
+def quote_name(name):
+    """Backtick-quote a label or relationship type for use in Cypher."""
+    return "`" + str(name).replace("`", "``") + "`"
+
+
+def chunked(rows, size):
+    """Yield successive slices of at most `size` rows."""
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
 
 class Neo4jPusher:
-    def __init__(self, uri, user, password):
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+    def __init__(self, uri, user, password, driver=None, schema_path=prompt_path, marker=None):
+        # A pre-built driver (local instance or a stub) can be injected for testing
+        self.driver = driver or GraphDatabase.driver(uri, auth=(user, password))
+        # File touched after each batched ingest (ingest_marker for the real graph)
+        self.marker = marker
+        # id -> labels of every node pushed so far, used to label-scope edge MATCHes
+        self.id_labels = {}
+        self.constrained_labels = set()
+        if schema_path:
+            self.ensure_constraints(schema_labels(schema_path))
 
     def close(self):
         self.driver.close()
 
+    def ensure_constraints(self, labels):
+        """
+        Idempotently creates an `id` uniqueness constraint (and with it the
+        backing index) for every label, so MERGE and MATCH on id are index
+        lookups instead of label scans.
+        """
+        missing = [label for label in labels if label not in self.constrained_labels]
+        if not missing:
+            return
+        with self.driver.session() as session:
+            for label in missing:
+                cypher = (
+                    f"CREATE CONSTRAINT {quote_name(label.lower() + '_id_unique')} IF NOT EXISTS "
+                    f"FOR (n:{quote_name(label)}) REQUIRE n.id IS UNIQUE"
+                )
+                session.run(cypher).consume()
+                metrics.count("neo4j.round_trips")
+                self.constrained_labels.add(label)
+
+    def register_labels(self, nodes):
+        """Records the label of every node so later edges can be label-scoped."""
+        for node in nodes:
+            label = node.get("label")
+            node_id = node.get("id")
+            if label and node_id:
+                self.id_labels.setdefault(node_id, set()).add(label)
+
+    def label_of(self, node_id):
+        """
+        The label to scope a MATCH on `node_id` with: None when the id is
+        unknown or exists under several labels, so the unlabelled match still
+        reaches every node with that id.
+        """
+        labels = self.id_labels.get(node_id, ())
+        return next(iter(labels)) if len(labels) == 1 else None
+
+    def endpoint_pattern(self, var, node_id, param):
+        """
+        Builds the MATCH pattern for a relationship endpoint, scoped to the
+        node's label when it is known and unique. Other ids fall back to an
+        unlabelled match.
+        """
+        label = self.label_of(node_id)
+        if label:
+            return f"({var}:{quote_name(label)} {{id: {param}}})"
+        return f"({var} {{id: {param}}})"
+
     def push_data(self, data):
         nodes = data.get("nodes", [])
         relationships = data.get("relationships", [])
+        self.register_labels(nodes)
+        self.ensure_constraints({node["label"] for node in nodes if node.get("label")})
 
         with self.driver.session() as session:
             # Merge nodes
@@ -28,12 +108,11 @@ class Neo4jPusher:
                 properties = {k: v for k, v in node.items() if k not in ["label", "id"]}
                 if not label or not node_id:
                     continue
-                cypher = (
-                    f"MERGE (n:{label} {{id: $id}}) "
-                    f"SET " + ", ".join([f"n.{k} = ${k}" for k in properties.keys()])
-                )
-                params = {"id": node_id, **properties}
-                session.run(cypher, params)
+                cypher = f"MERGE (n:{quote_name(label)} {{id: $id}}) SET n += $props"
+                params = {"id": node_id, "props": properties}
+                with metrics.timer("neo4j.statement"):
+                    session.run(cypher, params)
+                metrics.count("neo4j.round_trips")
 
             # Create relationships
             for rel in relationships:
@@ -43,20 +122,155 @@ class Neo4jPusher:
                 if not from_id or not to_id or not rel_type:
                     continue
                 cypher = (
-                    "MATCH (a {id: $from_id}), (b {id: $to_id}) "
-                    f"MERGE (a)-[r:{rel_type}]->(b)"
+                    f"MATCH {self.endpoint_pattern('a', from_id, '$from_id')}, "
+                    f"{self.endpoint_pattern('b', to_id, '$to_id')} "
+                    f"MERGE (a)-[r:{quote_name(rel_type)}]->(b)"
                 )
                 params = {"from_id": from_id, "to_id": to_id}
-                session.run(cypher, params)
+                with metrics.timer("neo4j.statement"):
+                    session.run(cypher, params)
+                metrics.count("neo4j.round_trips")
+
+    def group_rows(self, documents):
+        """
+        Groups the nodes of many documents by label and the relationships by type.
+
+        Nodes that share a label and id are merged into one row (later properties
+        win), and duplicate relationships are dropped, so each batch only carries
+        the rows Neo4j actually has to MERGE. Relationships are keyed by the
+        labels of both endpoints, resolved from the id -> labels map; an endpoint
+        whose label is unknown or ambiguous gets None (an unlabelled match).
 
+        Returns:
+            tuple: ({label: [{"id", "props"}]},
+                    {(from_label, rel_type, to_label): [{"from", "to"}]})
+        """
+        node_rows = {}
+        rel_rows = {}
 
-# Create pusher instance
-pusher = Neo4jPusher(uri, user, password)
+        for data in documents:
+            for node in data.get("nodes", []):
+                label = node.get("label")
+                node_id = node.get("id")
+                if not label or not node_id:
+                    continue
+                properties = {k: v for k, v in node.items() if k not in ["label", "id"]}
+                rows = node_rows.setdefault(label, {})
+                rows.setdefault(node_id, {}).update(properties)
+                self.id_labels.setdefault(node_id, set()).add(label)
 
-# Loop through all txt files and push
-for txt_file in txt_dir.glob("*.txt"):
-    with open(txt_file, "r") as f:
-        content = f.read().strip()
+            for rel in data.get("relationships", []):
+                from_id = rel.get("from")
+                to_id = rel.get("to")
+                rel_type = rel.get("type")
+                if not from_id or not to_id or not rel_type:
+                    continue
+                rel_rows.setdefault(rel_type, {})[(from_id, to_id)] = None
+
+        # Labels are resolved only after every document's nodes are known, so
+        # an edge may point at a node defined in a later file
+        keyed_rels = {}
+        for rel_type, pairs in rel_rows.items():
+            for from_id, to_id in pairs:
+                key = (self.label_of(from_id), rel_type, self.label_of(to_id))
+                keyed_rels.setdefault(key, []).append({"from": from_id, "to": to_id})
+
+        nodes = {
+            label: [{"id": node_id, "props": props} for node_id, props in rows.items()]
+            for label, rows in node_rows.items()
+        }
+        return nodes, keyed_rels
+
+    def _write_batches(self, session, cypher, rows, batch_size):
+        """Runs `cypher` once per batch of rows, each in its own write transaction."""
+        for batch in chunked(rows, batch_size):
+            with metrics.timer("neo4j.batch"):
+                session.execute_write(lambda tx, b=batch: tx.run(cypher, rows=b).consume())
+            metrics.count("neo4j.round_trips")
+            metrics.count("neo4j.rows", len(batch))
+
+    def push_batched(self, documents, batch_size=batch_size):
+        """
+        Bulk ingest path: sends nodes grouped by label and relationships grouped
+        by type as parameterised `UNWIND $rows` statements, `batch_size` rows per
+        explicit transaction, instead of one round trip per node and edge.
+
+        Args:
+            documents (iterable): Parsed {"nodes": [...], "relationships": [...]} dicts.
+            batch_size (int): Maximum rows per UNWIND statement / transaction.
+
+        Returns:
+            dict: {label or rel_type: {"rows", "seconds", "rows_per_sec"}}
+        """
+        nodes, relationships = self.group_rows(documents)
+        self.ensure_constraints(nodes.keys())
+        stats = {}
+
+        with self.driver.session() as session:
+            # Merge nodes first so relationship MATCHes can find both endpoints
+            for label, rows in nodes.items():
+                cypher = (
+                    "UNWIND $rows AS row "
+                    f"MERGE (n:{quote_name(label)} {{id: row.id}}) "
+                    "SET n += row.props"
+                )
+                start = time.perf_counter()
+                self._write_batches(session, cypher, rows, batch_size)
+                stats[label] = self._rate(len(rows), time.perf_counter() - start)
+
+            rel_totals = {}
+            for (from_label, rel_type, to_label), rows in relationships.items():
+                a = f"(a:{quote_name(from_label)} {{id: row.from}})" if from_label else "(a {id: row.from})"
+                b = f"(b:{quote_name(to_label)} {{id: row.to}})" if to_label else "(b {id: row.to})"
+                cypher = (
+                    "UNWIND $rows AS row "
+                    f"MATCH {a}, {b} "
+                    f"MERGE (a)-[r:{quote_name(rel_type)}]->(b)"
+                )
+                start = time.perf_counter()
+                self._write_batches(session, cypher, rows, batch_size)
+                total = rel_totals.setdefault(rel_type, [0, 0.0])
+                total[0] += len(rows)
+                total[1] += time.perf_counter() - start
+
+            for rel_type, (rows, seconds) in rel_totals.items():
+                stats[rel_type] = self._rate(rows, seconds)
+
+        if self.marker is not None:
+            Path(self.marker).write_text(time.strftime("%Y-%m-%dT%H:%M:%S"))
+        return stats
+
+    @staticmethod
+    def _rate(rows, seconds):
+        return {
+            "rows": rows,
+            "seconds": seconds,
+            "rows_per_sec": rows / seconds if seconds > 0 else float("inf"),
+        }
+
+
+def document_files(txt_dir):
+    """
+    One LLM output per paper in a folder: the validated, compact <stem>.json
+    artifact written by r.py when present, otherwise the raw <stem>.txt.
+    """
+    chosen = {}
+    for path in sorted(Path(txt_dir).glob("*.txt")) + sorted(Path(txt_dir).glob("*.json")):
+        chosen[path.stem] = path
+    return [chosen[stem] for stem in sorted(chosen)]
+
+
+def iter_documents(txt_dir):
+    """
+    Yields (file name, parsed JSON) for every non-empty, valid file, choosing
+    per paper between the repaired artifact and the raw output (see
+    document_files), so raw LLM output is not parsed a second time. Outputs
+    of duplicate papers (see dedup.py) are skipped.
+    """
+    files = skip_duplicates(document_files(txt_dir), by_stem=True)
+    for txt_file in files:
+        with open(txt_file, "r") as f:
+            content = f.read().strip()
 
         if not content:
             print(f"⚠️ Skipping empty file: {txt_file.name}")
@@ -68,8 +282,39 @@ for txt_file in txt_dir.glob("*.txt"):
             print(f"⚠️ Invalid JSON in {txt_file.name}: {e}")
             continue
 
-        pusher.push_data(data)
-        print(f"Pushed data from {txt_file.name}")
+        yield txt_file.name, data
+
+
+def print_ingest_stats(stats):
+    """Prints the rows/sec table returned by Neo4jPusher.push_batched."""
+    print(f"{'label/type':<24}{'rows':>10}{'seconds':>10}{'rows/sec':>12}")
+    for name, s in stats.items():
+        print(f"{name:<24}{s['rows']:>10}{s['seconds']:>10.2f}{s['rows_per_sec']:>12.0f}")
+
+
+if __name__ == "__main__":
+    # Create pusher instance
+    pusher = Neo4jPusher(uri, user, password, marker=ingest_marker)
+
+    # Near-duplicate ids are rewritten to their canonical form, from the
+    # reviewed alias table only (see canonicalize.py)
+    aliases = load_alias_table(alias_path)
+    endpoints = endpoint_aliases(aliases)
+    if aliases:
+        print(f"Applying {sum(len(a) for a in aliases.values())} id aliases from {alias_path}")
+
+    # Load every valid txt file, then push them all as UNWIND batches
+    documents = []
+    with metrics.stage("load.read"):
+        for name, data in iter_documents(txt_dir):
+            documents.append(apply_aliases(data, aliases, endpoints) if aliases else data)
+            print(f"Loaded data from {name}")
+
+    with metrics.stage("load.push"):
+        stats = pusher.push_batched(documents, batch_size=batch_size)
+    print_ingest_stats(stats)
 
-pusher.close()
-print("✅ All valid data pushed successfully.")
+    pusher.close()
+    print("✅ All valid data pushed successfully.")
+    metrics.print_summary()
+    metrics.close()
@@ -0,0 +1,235 @@
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from canonicalize import MinHasher, UnionFind, lsh_candidates, normalize_name
+from corpus_reader import list_tei_files, parse_tei
+from metrics import metrics
+
+project_root = Path(__file__).resolve().parent
+# Both TEI folders the pipeline reads: LLM input and the embedded corpus
+corpus_dirs = [project_root / "xmls", project_root / "datas" / "grobid_output"]
+duplicates_path = project_root / "duplicates.json"
+# Fingerprints of already scanned files (keyed by name, size and mtime)
+cache_path = project_root / "dedup_cache.npz"
+
+# Titles with fewer normalised words are too generic to identify a paper on their own
+min_title_words = 4
+# Body texts are compared as word 5-gram sets; pairs at estimated Jaccard >= this are duplicates
+shingle_words = 5
+body_threshold = 0.8
+num_perm = 64
+bands = 16
+
+_hasher = MinHasher(num_perm=num_perm)
+
+
+def normalize_doi(doi):
+    """Lowercased DOI without resolver prefix; "" for truncated ones like 10.1016/j.isci."""
+    doi = re.sub(r"^(https?://(dx\.)?doi\.org/|doi:\s*)", "", doi.strip().lower())
+    return doi if re.fullmatch(r"10\.\d{4,9}/\S*\d\S*", doi) else ""
+
+
+def body_shingles(text, n=shingle_words):
+    words = re.findall(r"[^\W_]+", text.lower())
+    return {" ".join(words[i:i + n]) for i in range(max(1, len(words) - n + 1))} if words else set()
+
+
+def fingerprint(path):
+    """
+    (file name, size, mtime_ns, DOI, normalised title, MinHash signature) of
+    one TEI file; run in worker processes so hashing scales with the parse.
+    """
+    record = parse_tei(path)
+    st = os.stat(path)
+    body = " ".join([record.abstract] + [text for _, text in record.sections])
+    shingles = body_shingles(body)
+    signature = _hasher.signature(shingles) if shingles else np.zeros(num_perm, dtype=np.uint64)
+    return (record.file, st.st_size, st.st_mtime_ns, normalize_doi(record.doi),
+            normalize_name(record.title), signature)
+
+
+def load_cache(path=cache_path):
+    """{file name: fingerprint} of previously scanned files."""
+    if not os.path.exists(path):
+        return {}
+    with np.load(path) as data:
+        meta = json.loads(str(data["meta"]))
+        signatures = data["signatures"]
+    return {name: (name, size, mtime, doi, title, signatures[i])
+            for i, (name, size, mtime, doi, title) in enumerate(meta)}
+
+
+def save_cache(fingerprints, path=cache_path):
+    names = sorted(fingerprints)
+    meta = [list(fingerprints[n][:5]) for n in names]
+    signatures = np.array([fingerprints[n][5] for n in names], dtype=np.uint64).reshape(len(names), num_perm)
+    tmp = str(path) + ".tmp.npz"
+    np.savez(tmp, meta=np.array(json.dumps(meta)), signatures=signatures)
+    os.replace(tmp, path)
+
+
+def scan(directories=corpus_dirs, processes=None):
+    """
+    Fingerprints of every TEI file in the folders, by file name. Files whose
+    size and mtime are unchanged since the last scan are not parsed again.
+    """
+    paths = {}
+    for directory in directories:
+        if os.path.isdir(directory):
+            for p in list_tei_files(str(directory)):
+                paths.setdefault(os.path.basename(p), p)
+    cached = load_cache()
+    fingerprints = {}
+    todo = []
+    for name, p in paths.items():
+        st = os.stat(p)
+        old = cached.get(name)
+        if old and old[1] == st.st_size and old[2] == st.st_mtime_ns:
+            fingerprints[name] = old
+        else:
+            todo.append(p)
+    if todo:
+        print(f"Fingerprinting {len(todo)} new or changed files ({len(fingerprints)} cached)...")
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            for fp in pool.map(fingerprint, todo, chunksize=8):
+                fingerprints[fp[0]] = fp
+        save_cache(fingerprints)
+    metrics.count("dedup.fingerprinted", len(todo))
+    return fingerprints
+
+
+def find_duplicates(fingerprints):
+    """
+    Groups copies of the same paper: same DOI, same normalised title, or
+    (through MinHash/LSH blocking, so it stays near-linear) near-identical body
+    text. A group never holds two different DOIs, even through files that
+    have none.
+
+    Returns:
+        list: Groups as {canonical, duplicates, reasons}, largest first; the
+        canonical copy is the first file name in sorted order.
+    """
+    uf = UnionFind()
+    reasons = {}
+    # DOIs of every group, by union-find root, so a DOI-less file cannot bridge two DOIs
+    dois = {name: {fp[3]} if fp[3] else set() for name, fp in fingerprints.items()}
+
+    def merge(a, b, reason):
+        ra, rb = uf.find(a), uf.find(b)
+        if ra == rb or len(dois[ra] | dois[rb]) > 1:
+            return
+        uf.union(ra, rb)
+        dois[rb] |= dois.pop(ra)
+        reasons[(a, b)] = reason
+
+    by_key = {}
+    for name, (_, _, _, doi, title, _) in sorted(fingerprints.items()):
+        if doi:
+            by_key.setdefault(("doi", doi), []).append(name)
+        if len(title.split()) >= min_title_words:
+            by_key.setdefault(("title", title), []).append(name)
+    for (reason, _), names in by_key.items():
+        for other in names[1:]:
+            merge(names[0], other, reason)
+
+    signatures = {name: fp[5] for name, fp in fingerprints.items() if fp[5].any()}
+    for a, b in lsh_candidates(signatures, bands=bands):
+        if float(np.mean(signatures[a] == signatures[b])) >= body_threshold:
+            merge(a, b, "body")
+
+    groups = {}
+    for name in fingerprints:
+        groups.setdefault(uf.find(name), []).append(name)
+    out = []
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        members.sort()
+        out.append({"canonical": members[0], "duplicates": members[1:],
+                    "reasons": sorted({r for (a, b), r in reasons.items() if a in members})})
+    out.sort(key=lambda g: (-len(g["duplicates"]), g["canonical"]))
+    return out
+
+
+def save_duplicates(groups, path=duplicates_path):
+    """Writes {"canonical": {duplicate file: canonical file}, "groups": [...]} atomically."""
+    canonical = {d: g["canonical"] for g in groups for d in g["duplicates"]}
+    tmp = Path(str(path) + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"canonical": canonical, "groups": groups}, f, indent=2, ensure_ascii=False)
+    tmp.replace(path)
+
+
+def load_duplicates(path=duplicates_path):
+    """{duplicate file name: canonical file name}; empty when dedup has not run."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["canonical"]
+
+
+def skip_duplicates(names, duplicates=None, by_stem=False):
+    """
+    Drops duplicate copies from a list of file names or paths, keeping one
+    file per paper: the canonical copy when it is in the list, otherwise the
+    first copy that is (so a folder holding only a duplicate still gets it).
+
+    Args:
+        names (list): TEI file names/paths, or LLM outputs when by_stem is True.
+        duplicates (dict): Duplicate map; loaded from duplicates_path if None.
+        by_stem (bool): Match on the file stem, so txt/<stem>.txt and
+            txt/<stem>.json outputs are matched to their <stem>.xml.
+    """
+    duplicates = load_duplicates() if duplicates is None else duplicates
+    if not duplicates:
+        return list(names)
+    if by_stem:
+        duplicates = {Path(d).stem: Path(c).stem for d, c in duplicates.items()}
+
+    def own_key(n):
+        base = os.path.basename(n)
+        return Path(base).stem if by_stem else base
+
+    chosen = {}
+    for n in names:
+        own = own_key(n)
+        paper = duplicates.get(own, own)
+        if paper not in chosen or own == paper or (chosen[paper] != paper and own < chosen[paper]):
+            chosen[paper] = own
+    kept = [n for n in names if chosen[duplicates.get(own_key(n), own_key(n))] == own_key(n)]
+    if len(kept) < len(names):
+        print(f"Skipping {len(names) - len(kept)} duplicate papers (see {duplicates_path.name})")
+        metrics.count("dedup.skipped", len(names) - len(kept))
+    return kept
+
+
+def run_dedup(directories=corpus_dirs, path=duplicates_path):
+    """Scans the folders and rewrites the duplicate map; returns the groups."""
+    groups = find_duplicates(scan(directories))
+    save_duplicates(groups, path)
+    return groups
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find duplicate copies of the same paper across the TEI folders.")
+    parser.add_argument("dirs", nargs="*", default=[str(d) for d in corpus_dirs])
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with metrics.stage("dedup"):
+        groups = run_dedup(args.dirs)
+    for g in groups:
+        print(f"📄 {g['canonical']} ({', '.join(g['reasons'])})")
+        for d in g["duplicates"]:
+            print(f"    ↳ {d}")
+    print(f"✅ {sum(len(g['duplicates']) for g in groups)} duplicates in {len(groups)} groups "
+          f"({time.perf_counter() - start:.1f}s). Map: {duplicates_path}")
+    metrics.print_summary()
+    metrics.close()
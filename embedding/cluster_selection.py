@@ -0,0 +1,125 @@
+import time
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+
+
+def sampled_silhouette(embeddings, labels, sample_size=2000, seed=42):
+    """
+    Silhouette on a fixed-seed sample, O(sample_size^2) instead of O(n^2).
+    NaN when the sample holds fewer than 2 labels (or one label per point),
+    where the score is undefined.
+    """
+    embeddings, labels = np.asarray(embeddings), np.asarray(labels)
+    rows = np.arange(len(labels))
+    if sample_size < len(labels):
+        rows = np.sort(np.random.default_rng(seed).choice(len(labels), sample_size, replace=False))
+    n_labels = len(np.unique(labels[rows]))
+    if n_labels < 2 or n_labels >= len(rows):
+        return float('nan')
+    return float(silhouette_score(embeddings[rows], labels[rows]))
+
+
+def fit_k(embeddings, k, init='k-means++', n_init=3, batch_size=1024, sample_size=2000, seed=42):
+    """
+    Fits MiniBatchKMeans for one k and scores it.
+
+    Returns:
+        dict: k, inertia, silhouette, seconds and the fitted centers.
+    """
+    start = time.perf_counter()
+    # An explicit init array is a warm start, so a single run is enough
+    model = MiniBatchKMeans(n_clusters=k, init=init, n_init=n_init if isinstance(init, str) else 1,
+                            batch_size=batch_size, random_state=seed)
+    labels = model.fit_predict(embeddings)
+    return {
+        'k': k,
+        'inertia': float(model.inertia_),
+        'silhouette': sampled_silhouette(embeddings, labels, sample_size, seed),
+        'seconds': time.perf_counter() - start,
+        'centers': model.cluster_centers_,
+    }
+
+
+def split_init(embeddings, centers, seed=42):
+    """
+    Warm start for k+1 clusters: the previous centers with the cluster of
+    largest squared error bisected along its principal direction (found by
+    a few power iterations).
+    """
+    labels, dists = nearest_center(embeddings, centers)
+    sse = np.bincount(labels, weights=dists, minlength=len(centers))
+    worst = int(np.argmax(sse))
+    members = embeddings[labels == worst] - centers[worst]
+
+    rng = np.random.default_rng(seed + len(centers))
+    direction = rng.normal(size=embeddings.shape[1])
+    for _ in range(10):
+        direction = members.T @ (members @ direction)
+        direction /= np.linalg.norm(direction) or 1.0
+    spread = np.std(members @ direction)
+
+    new_centers = centers.copy()
+    new_centers[worst] = centers[worst] + spread * direction
+    return np.vstack([new_centers, centers[worst] - spread * direction])
+
+
+def nearest_center(embeddings, centers, chunk=4096):
+    """Index of and squared distance to the nearest center for every point, in chunks."""
+    centers = centers.astype(embeddings.dtype)
+    labels = np.empty(len(embeddings), dtype=np.int64)
+    dists = np.empty(len(embeddings))
+    c_norm = (centers ** 2).sum(axis=1)
+    for start in range(0, len(embeddings), chunk):
+        block = embeddings[start:start + chunk]
+        d = (block ** 2).sum(axis=1)[:, None] - 2 * block @ centers.T + c_norm[None, :]
+        labels[start:start + chunk] = d.argmin(axis=1)
+        dists[start:start + chunk] = d.min(axis=1)
+    # The expanded form can dip just below zero through rounding
+    return labels, np.maximum(dists, 0)
+
+
+def select_k(embeddings, k_range, mode='warm', n_jobs=-1, batch_size=1024, sample_size=2000, seed=42):
+    """
+    Scores every k in k_range without refitting full KMeans per k.
+
+    Args:
+        embeddings (array): (n, dim) embedding matrix.
+        k_range (iterable): Candidate cluster counts, ascending.
+        mode (str): 'warm' fits k in order, each initialised from the
+            previous k's centers; 'parallel' fits the candidates
+            independently across cores.
+        n_jobs (int): Worker count for 'parallel' (joblib convention).
+        batch_size (int): MiniBatchKMeans batch size.
+        sample_size (int): Points used for the sampled silhouette.
+        seed (int): Seed for k-means and the silhouette sample.
+
+    Returns:
+        list: One dict per k (see fit_k), in k order.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    k_range = list(k_range)
+    options = dict(batch_size=batch_size, sample_size=sample_size, seed=seed)
+
+    if mode == 'parallel':
+        return Parallel(n_jobs=n_jobs)(delayed(fit_k)(embeddings, k, **options) for k in k_range)
+
+    results = []
+    for k in k_range:
+        prev = results[-1] if results else None
+        if prev is not None and prev['k'] == k - 1:
+            init = split_init(embeddings, prev['centers'], seed)
+        else:
+            init = 'k-means++'
+        results.append(fit_k(embeddings, k, init=init, **options))
+    return results
+
+
+def print_timing_report(results):
+    """Prints inertia, sampled silhouette and fit time per k."""
+    print(f"{'k':>4}{'inertia':>14}{'silhouette':>12}{'seconds':>10}")
+    for r in results:
+        print(f"{r['k']:>4}{r['inertia']:>14.2f}{r['silhouette']:>12.4f}{r['seconds']:>10.2f}")
+    print(f"Total: {sum(r['seconds'] for r in results):.2f}s")
@@ -1,17 +1,46 @@
 import os
+import sys
 import pandas as pd
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from embedding_store import EmbeddingStore, make_encoder
+from cluster_selection import select_k, print_timing_report
+from projection import ProjectionCache, load_cluster_names, cluster_name, export_json
 from sklearn.cluster import KMeans, DBSCAN
 from sklearn.metrics import silhouette_score
-from sklearn.manifold import TSNE
+import matplotlib
+
+show_plot = False  # plt.show() blocks headless runs
+if not show_plot:
+    # The backend has to be chosen before pyplot is imported
+    matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+# Shared instrumentation lives in the project root
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+from metrics import metrics
+
 # Get the directory where the script is located
 script_dir = os.path.dirname(os.path.abspath(__file__))
 abstracts_path = os.path.join(script_dir, 'abstracts.csv')
 
+# Embedding store settings: only new or changed abstracts are re-encoded
+embedding_dtype = 'float32'  # or 'float16' to halve the stored matrix
+encode_batch_size = 64
+encode_processes = 1  # >1 encodes across that many CPU processes
+
+# Cluster-count selection: 'warm' (MiniBatchKMeans warm-started across k),
+# 'parallel' (k candidates fitted across cores) or 'full' (KMeans per k)
+cluster_selection_mode = 'warm'
+silhouette_sample_size = 2000
+
+# 2-D projection: 'tsne' (PCA -> Barnes-Hut t-SNE), 'umap' or 'pca'. Coordinates
+# are cached next to the embeddings; new abstracts are placed incrementally.
+projection_method = 'tsne'
+projection_json = os.path.join(script_dir, '..', 'NASA_NLP_Frontend-main', 'public', 'cluster_projection.json')
+cluster_names_path = os.path.join(script_dir, 'cluster_names.csv')
+figure_dpi = 300
+
 # Step 1: Load the data
 print("Loading abstracts from CSV...")
 df = pd.read_csv(abstracts_path)
@@ -40,13 +69,14 @@ else:
 df_clean = df[df[text_col].notna() & (df[text_col].str.strip() != '')].copy()
 print(f"\nAbstracts after removing empty ones: {len(df_clean)}")
 
-# Step 3: Generate embeddings
-print("\nLoading embedding model (all-MiniLM-L6-v2)...")
-model = SentenceTransformer('all-MiniLM-L6-v2')
-
-print("Generating embeddings (this may take a moment)...")
-embeddings = model.encode(df_clean[text_col].tolist(), show_progress_bar=True)
-print(f"Embeddings shape: {embeddings.shape}")
+# Step 3: Generate embeddings (incrementally, via the persistent embedding store)
+store = EmbeddingStore(script_dir, dtype=embedding_dtype)
+encoder = make_encoder('all-MiniLM-L6-v2', batch_size=encode_batch_size, processes=encode_processes)
+with metrics.stage("embedding.encode"):
+    _, embeddings, encoded = store.update(df_clean[id_col].tolist(), df_clean[text_col].tolist(), encoder)
+metrics.count("embedding.encoded", encoded)
+metrics.count("embedding.reused", len(df_clean) - encoded)
+print(f"Embeddings shape: {embeddings.shape} ({encoded} encoded this run)")
 
 # Step 4: Determine optimal number of clusters using elbow method
 print("\nDetermining optimal number of clusters...")
@@ -54,19 +84,31 @@ inertias = []
 silhouette_scores = []
 K_range = range(2, min(11, len(df_clean)))
 
-for k in K_range:
-    kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
-    kmeans.fit(embeddings)
-    inertias.append(kmeans.inertia_)
-    silhouette_scores.append(silhouette_score(embeddings, kmeans.labels_))
+with metrics.stage("embedding.select_k"):
+    if cluster_selection_mode == 'full':
+        for k in K_range:
+            kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
+            kmeans.fit(embeddings)
+            inertias.append(kmeans.inertia_)
+            silhouette_scores.append(silhouette_score(embeddings, kmeans.labels_))
+    else:
+        selection = select_k(embeddings, K_range, mode=cluster_selection_mode,
+                             sample_size=silhouette_sample_size, seed=42)
+        print_timing_report(selection)
+        inertias = [r['inertia'] for r in selection]
+        silhouette_scores = [r['silhouette'] for r in selection]
 
 # Step 5: Perform K-means clustering with optimal k
-# Use silhouette score to find best k
-optimal_k = K_range[np.argmax(silhouette_scores)]
+# Use silhouette score to find best k. sampled_silhouette returns NaN when its
+# sample held fewer than 2 labels, so those k are ignored.
+if np.all(np.isnan(silhouette_scores)):
+    raise ValueError("No k produced a valid silhouette score; increase silhouette_sample_size.")
+optimal_k = K_range[np.nanargmax(silhouette_scores)]
 print(f"Optimal number of clusters (by silhouette score): {optimal_k}")
 
 kmeans = KMeans(n_clusters=optimal_k, random_state=42, n_init=10)
-clusters = kmeans.fit_predict(embeddings)
+with metrics.stage("embedding.kmeans"):
+    clusters = kmeans.fit_predict(embeddings)
 
 # Add cluster labels to dataframe
 df_clean['cluster'] = clusters
@@ -91,17 +133,18 @@ df_clean.to_csv(output_file, index=False)
 print(f"\nResults saved to: {output_file}")
 
 # Step 8: Visualize clusters using t-SNE
-print("\nGenerating t-SNE visualization...")
-tsne = TSNE(n_components=2, random_state=42, perplexity=min(30, len(df_clean)-1))
-embeddings_2d = tsne.fit_transform(embeddings)
-
-# Define cluster names
-cluster_names = {
-    0: "Space Sustainability & Microbial Adaptation",
-    1: "Human & Animal Physiology in Spaceflight",
-    2: "Plant Molecular Biology & Space Adaptation",
-    3: "Model Organisms & Experimental Methods in Space Biology"
-}
+print(f"\nGenerating {projection_method} visualization...")
+_, store_hashes, _ = store.load()
+with metrics.stage("embedding.projection"):
+    embeddings_2d, _ = ProjectionCache(script_dir).update(store_hashes, embeddings, method=projection_method)
+
+# Cluster names come from cluster_names.csv; clusters without an entry get a generic name
+cluster_names = load_cluster_names(cluster_names_path)
+
+# Export coordinates for the frontend's KnowledgeGraph view
+titles = df_clean['Title'].fillna('').tolist() if 'Title' in df_clean.columns else None
+export_json(projection_json, df_clean[id_col].tolist(), embeddings_2d, clusters, cluster_names, titles)
+print(f"Projection exported to: {os.path.normpath(projection_json)}")
 
 # Create visualization with larger figure size
 plt.figure(figsize=(15, 10))
@@ -117,22 +160,24 @@ for cluster_id in range(optimal_k):
     centroid = embeddings_2d[mask].mean(axis=0)
     
     # Add text with cluster name
-    plt.annotate(cluster_names[cluster_id],
+    plt.annotate(cluster_name(cluster_names, cluster_id),
                 xy=(centroid[0], centroid[1]),
                 xytext=(10, 10), textcoords='offset points',
                 bbox=dict(facecolor='white', edgecolor='none', alpha=0.7),
                 fontsize=10, ha='center', va='center')
 
 plt.colorbar(scatter, label='Cluster')
-plt.title(f'Abstract Clusters Visualization (t-SNE)\n{len(df_clean)} abstracts in {optimal_k} clusters')
-plt.xlabel('t-SNE dimension 1')
-plt.ylabel('t-SNE dimension 2')
+plt.title(f'Abstract Clusters Visualization ({projection_method})\n{len(df_clean)} abstracts in {optimal_k} clusters')
+plt.xlabel(f'{projection_method} dimension 1')
+plt.ylabel(f'{projection_method} dimension 2')
 plt.grid(True, alpha=0.3)
 plt.tight_layout()
 visualization_file = os.path.join(script_dir, 'clusters_visualization.png')
-plt.savefig(visualization_file, dpi=300, bbox_inches='tight')
+plt.savefig(visualization_file, dpi=figure_dpi, bbox_inches='tight')
 print("Visualization saved to: clusters_visualization.png")
-plt.show()
+if show_plot:
+    plt.show()
+plt.close()
 
 # Step 9: Generate cluster statistics
 print("\n" + "="*60)
@@ -149,4 +194,6 @@ print("="*60)
 print(f"Total abstracts processed: {len(df_clean)}")
 print(f"Number of clusters: {optimal_k}")
 print(f"Output file: {output_file}")
-print(f"Visualization: clusters_visualization.png")
\ No newline at end of file
+print(f"Visualization: clusters_visualization.png")
+metrics.print_summary()
+metrics.close()
\ No newline at end of file
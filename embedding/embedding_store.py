@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+# Default sentence-transformers model used across the embedding scripts
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+
+def content_hash(text, model_name=MODEL_NAME):
+    """Hash of the model name and text; a row is only re-encoded when this changes."""
+    return hashlib.sha1(f"{model_name}\0{text}".encode('utf-8')).hexdigest()
+
+
+def make_encoder(model_name=MODEL_NAME, batch_size=64, processes=1):
+    """
+    Returns a callable that encodes a list of texts into a float32 matrix.
+    The SentenceTransformer model is only loaded on the first call, so a run
+    where every abstract is already stored never loads it.
+
+    Args:
+        model_name (str): sentence-transformers model name.
+        batch_size (int): Texts per forward pass.
+        processes (int): CPU worker processes; >1 uses the multi-process pool.
+    """
+    state = {}
+    # Server threads may make the first call at the same time; load the model once
+    lock = threading.Lock()
+
+    def encode(texts):
+        with lock:
+            if 'model' not in state:
+                from sentence_transformers import SentenceTransformer
+                print(f"Loading embedding model ({model_name})...")
+                state['model'] = SentenceTransformer(model_name)
+        model = state['model']
+
+        if processes > 1:
+            pool = model.start_multi_process_pool(['cpu'] * processes)
+            try:
+                return model.encode_multi_process(texts, pool, batch_size=batch_size)
+            finally:
+                model.stop_multi_process_pool(pool)
+        return model.encode(texts, batch_size=batch_size, show_progress_bar=True,
+                            convert_to_numpy=True)
+
+    encode.model_name = model_name
+    return encode
+
+
+class EmbeddingStore:
+    """
+    Persistent embedding matrix in `<directory>/<name>.npy` with an id and
+    content-hash sidecar in `<name>.json`. The matrix is a plain .npy file, so
+    it can be opened with np.load(mmap_mode='r') without copying it into
+    memory. The sidecar records the size and mtime of the matrix it
+    describes, so a matrix and sidecar from different runs are never used
+    together.
+    """
+
+    def __init__(self, directory, name='embeddings', dtype='float32'):
+        self.matrix_path = os.path.join(directory, f'{name}.npy')
+        self.sidecar_path = os.path.join(directory, f'{name}.json')
+        self.dtype = np.dtype(dtype)
+
+    def load(self, mmap=True):
+        """
+        Returns (ids, hashes, matrix). The matrix is memory-mapped read-only
+        unless mmap is False. An empty store returns empty lists and None.
+        """
+        if not (os.path.exists(self.matrix_path) and os.path.exists(self.sidecar_path)):
+            return [], [], None
+        with open(self.sidecar_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        st = os.stat(self.matrix_path)
+        if meta.get('matrix') != [st.st_size, st.st_mtime_ns]:
+            print(f"Warning: {self.sidecar_path} does not describe {self.matrix_path} "
+                  f"(interrupted update?); ignoring the stored embeddings.")
+            return [], [], None
+        matrix = np.load(self.matrix_path, mmap_mode='r' if mmap else None)
+        return meta['ids'], meta['hashes'], matrix
+
+    def update(self, ids, texts, encoder):
+        """
+        Brings the store in line with the given abstracts. Rows whose content
+        hash is already stored are copied over; only new or changed texts are
+        passed to the encoder.
+
+        Args:
+            ids (list): Row ids, in the order the matrix should have.
+            texts (list): Abstract texts, aligned with ids.
+            encoder (callable): list of texts -> 2-D array (see make_encoder).
+
+        Returns:
+            tuple: (ids, read-only memory-mapped matrix, number of texts encoded)
+        """
+        model_name = getattr(encoder, 'model_name', MODEL_NAME)
+        hashes = [content_hash(t, model_name) for t in texts]
+
+        old_ids, old_hashes, old_matrix = self.load()
+        if old_matrix is not None and old_hashes == hashes and old_ids == list(ids) \
+                and old_matrix.dtype == self.dtype:
+            print(f"All {len(texts)} abstracts already embedded; nothing to encode.")
+            return list(ids), old_matrix, 0
+        old_rows = {h: row for row, h in enumerate(old_hashes)}
+
+        missing = [i for i, h in enumerate(hashes) if h not in old_rows]
+        new_vectors = None
+        if missing:
+            print(f"Encoding {len(missing)} new or changed abstracts "
+                  f"({len(texts) - len(missing)} reused from the store)...")
+            new_vectors = np.asarray(encoder([texts[i] for i in missing]))
+        else:
+            print(f"All {len(texts)} abstracts already embedded; nothing to encode.")
+
+        if new_vectors is not None:
+            dim = new_vectors.shape[1]
+        elif old_matrix is not None:
+            dim = old_matrix.shape[1]
+        else:
+            dim = 0
+
+        # Write to a temporary file first so an interrupted run keeps the old store
+        tmp_path = self.matrix_path + '.tmp.npy'
+        out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=self.dtype,
+                                        shape=(len(texts), dim))
+        if missing:
+            out[missing] = new_vectors
+        reused = [i for i, h in enumerate(hashes) if h in old_rows]
+        if reused:
+            out[reused] = old_matrix[[old_rows[hashes[i]] for i in reused]]
+        out.flush()
+        del out
+        # Release the old mapping before replacing the file it points to
+        del old_matrix
+
+        # The sidecar names the exact matrix file it belongs to (rename keeps
+        # size and mtime); both are swapped in with atomic renames
+        st = os.stat(tmp_path)
+        sidecar_tmp = self.sidecar_path + '.tmp'
+        with open(sidecar_tmp, 'w', encoding='utf-8') as f:
+            json.dump({'model': model_name, 'dtype': self.dtype.name,
+                       'matrix': [st.st_size, st.st_mtime_ns],
+                       'ids': [i.item() if isinstance(i, np.generic) else i for i in ids],
+                       'hashes': hashes}, f)
+        os.replace(tmp_path, self.matrix_path)
+        os.replace(sidecar_tmp, self.sidecar_path)
+
+        _, _, matrix = self.load()
+        return list(ids), matrix, len(missing)
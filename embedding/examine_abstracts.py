@@ -1,8 +1,13 @@
 import os
 import csv
-import xml.etree.ElementTree as ET
 import sys
 
+# The shared corpus reader lives in the project root
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+from corpus_reader import iter_corpus
+from dedup import skip_duplicates
+from metrics import metrics
+
 def extract_abstracts_to_csv(xml_directory, output_csv_file):
     """
     Parses all XML files in a directory to extract text from the <abstract> tag
@@ -19,6 +24,11 @@ def extract_abstracts_to_csv(xml_directory, output_csv_file):
         # Get a list of all files in the directory that end with .xml
         files = [f for f in os.listdir(xml_directory) if f.lower().endswith('.xml')]
         files.sort()  # Sort the list alphabetically
+        # IDs are positions in the full folder listing, so skipping a file
+        # below leaves a gap instead of renumbering every later paper.
+        id_of = {f: i + 1 for i, f in enumerate(files)}  # Assign ID starting from 1.
+        # Keep one copy of papers saved under several names (see dedup.py)
+        files = skip_duplicates(files)
         
         if not files:
             print(f"Error: No XML files found in the directory: {xml_directory}")
@@ -34,46 +44,30 @@ def extract_abstracts_to_csv(xml_directory, output_csv_file):
     with open(output_csv_file, 'w', newline='', encoding='utf-8') as csvfile:
         csv_writer = csv.writer(csvfile)
         
-        # Write the header row to the CSV file.
-        csv_writer.writerow(['ID', 'Abstract'])
-
-        # Define the namespace for TEI XML files. This is crucial for finding tags.
-        ns = {'tei': 'http://www.tei-c.org/ns/1.0'}
+        # Write the header row to the CSV file. File and Title let search results
+        # and the dashboard point back at the paper.
+        csv_writer.writerow(['ID', 'Abstract', 'File', 'Title'])
 
-        # Step 3: Loop through each file, extract data, and write to the CSV.
-        for i, filename in enumerate(files):
-            file_id = i + 1  # Assign ID starting from 1.
-            file_path = os.path.join(xml_directory, filename)
-            
-            try:
-                tree = ET.parse(file_path)
-                root = tree.getroot()
+        # Step 3: Stream each file through the shared corpus reader (one parallel
+        # iterparse pass) and write the abstracts to the CSV.
+        paths = [os.path.join(xml_directory, f) for f in files]
+        for record in iter_corpus(files=paths):
+            filename = record.file
+            file_id = id_of[filename]
 
-                # Find the <abstract> element using its path and the namespace.
-                # The './/' means it will search the entire tree for the tag.
-                abstract_element = root.find('.//tei:abstract', ns)
-                
-                abstract_text = ""
-                if abstract_element is not None:
-                    # If the tag is found, join all text fragments within it.
-                    abstract_text = "".join(abstract_element.itertext()).strip()
-                    # Clean up text by replacing newlines/multiple spaces with a single space.
-                    abstract_text = ' '.join(abstract_text.split())
-                else:
-                    abstract_text = "Abstract not found"
-                    print(f"Warning: <abstract> tag not found in {filename}")
+            if record.error:
+                print(f"Error: Could not parse {filename}. It might be a malformed XML file.")
+                csv_writer.writerow([file_id, f"Error parsing file: {filename}", filename, ""])
+                continue
 
-                # Write the ID and the extracted abstract text as a new row in the CSV.
-                csv_writer.writerow([file_id, abstract_text])
+            # The reader already joined all text fragments and collapsed whitespace.
+            # Empty abstracts are written as-is so the embedding step filters them out.
+            abstract_text = record.abstract
+            if not abstract_text:
+                print(f"Warning: <abstract> tag empty or not found in {filename}")
 
-            except ET.ParseError:
-                error_message = f"Error parsing file: {filename}"
-                print(f"Error: Could not parse {filename}. It might be a malformed XML file.")
-                csv_writer.writerow([file_id, error_message])
-            except Exception as e:
-                error_message = f"An unexpected error occurred: {e}"
-                print(f"An unexpected error occurred with file {filename}: {e}")
-                csv_writer.writerow([file_id, error_message])
+            # Write the ID, the extracted abstract text, file name and title as a new row.
+            csv_writer.writerow([file_id, abstract_text, filename, record.title])
 
     print(f"\nProcessing complete. Data has been successfully saved to '{output_csv_file}'.")
 
@@ -91,4 +85,7 @@ if __name__ == '__main__':
         print("Please ensure your directory structure matches the one described in the script's comments.")
     else:
         # Run the main function with the dynamically determined paths.
-        extract_abstracts_to_csv(xml_folder_path, output_csv_path)
\ No newline at end of file
+        with metrics.stage("abstracts.extract"):
+            extract_abstracts_to_csv(xml_folder_path, output_csv_path)
+        metrics.print_summary()
+        metrics.close()
\ No newline at end of file
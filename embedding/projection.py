@@ -0,0 +1,157 @@
+import csv
+import json
+import os
+
+import numpy as np
+from sklearn.decomposition import PCA
+from sklearn.manifold import TSNE
+
+# Neighbours used to place a new point inside an existing layout
+placement_neighbours = 10
+
+# Above this fraction of new points the layout is recomputed from scratch
+refit_fraction = 0.2
+
+
+def project(embeddings, method='tsne', seed=42):
+    """
+    Fits a 2-D layout of the embeddings.
+
+    Args:
+        embeddings (array): (n, dim) embedding matrix.
+        method (str): 'tsne' (PCA to 50 dims, then Barnes-Hut t-SNE),
+            'umap' (needs umap-learn; falls back to 'tsne' if missing) or
+            'pca' (fastest, linear).
+        seed (int): Random state for reproducible layouts.
+
+    Returns:
+        array: (n, 2) float32 coordinates.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    n = len(embeddings)
+    if method == 'pca' or n < 3:
+        return PCA(n_components=2, random_state=seed).fit_transform(embeddings).astype(np.float32)
+
+    if method == 'umap':
+        try:
+            import umap
+            reducer = umap.UMAP(n_components=2, metric='cosine', random_state=seed)
+            return reducer.fit_transform(embeddings).astype(np.float32)
+        except ImportError:
+            print("umap-learn is not installed; falling back to t-SNE.")
+
+    # PCA first keeps t-SNE's neighbour search cheap on 384-d inputs
+    reduced = PCA(n_components=min(50, n, embeddings.shape[1]), random_state=seed).fit_transform(embeddings)
+    tsne = TSNE(n_components=2, method='barnes_hut', init='pca', learning_rate='auto',
+                perplexity=min(30, n - 1), random_state=seed)
+    return tsne.fit_transform(reduced).astype(np.float32)
+
+
+def place_new_points(embeddings, coords, known, k=placement_neighbours):
+    """
+    Places points that are not in the layout yet at the similarity-weighted
+    mean of their k most similar already placed points, leaving the existing
+    coordinates untouched.
+
+    Args:
+        embeddings (array): (n, dim) embeddings for all points.
+        coords (array): (n, 2) coordinates; rows where `known` is False are filled in.
+        known (array): Boolean mask of points that already have coordinates.
+    """
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    placed = np.flatnonzero(known)
+    k = min(k, len(placed))
+    for i in np.flatnonzero(~known):
+        sims = vectors[placed] @ vectors[i]
+        top = np.argpartition(-sims, k - 1)[:k]
+        weights = np.maximum(sims[top], 1e-6)
+        coords[i] = (coords[placed[top]] * weights[:, None]).sum(axis=0) / weights.sum()
+    return coords
+
+
+class ProjectionCache:
+    """
+    2-D coordinates cached next to the embedding store
+    (`projection.npy` + `projection.json` with the content hashes and method).
+    """
+
+    def __init__(self, directory, name='projection'):
+        self.coords_path = os.path.join(directory, f'{name}.npy')
+        self.sidecar_path = os.path.join(directory, f'{name}.json')
+
+    def load(self):
+        """Returns (hashes, method, coords), or ([], None, None) when nothing is cached."""
+        if not (os.path.exists(self.coords_path) and os.path.exists(self.sidecar_path)):
+            return [], None, None
+        with open(self.sidecar_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        return meta['hashes'], meta['method'], np.load(self.coords_path)
+
+    def update(self, hashes, embeddings, method='tsne', seed=42):
+        """
+        Returns coordinates for every row. Cached rows keep their position;
+        new rows are placed incrementally. The layout is recomputed when
+        nothing is cached, the method changed or too many rows are new.
+
+        Returns:
+            tuple: ((n, 2) coordinates, whether a full fit was run)
+        """
+        old_hashes, old_method, old_coords = self.load()
+        old_rows = {h: row for row, h in enumerate(old_hashes)}
+        known = np.array([h in old_rows for h in hashes], dtype=bool)
+        new_count = int((~known).sum())
+
+        full_fit = (old_coords is None or old_method != method or not known.any()
+                    or new_count > refit_fraction * len(hashes))
+        if full_fit:
+            print(f"Computing {method} projection for {len(hashes)} points...")
+            coords = project(embeddings, method, seed)
+        else:
+            coords = np.zeros((len(hashes), 2), dtype=np.float32)
+            coords[known] = old_coords[[old_rows[h] for h, k in zip(hashes, known) if k]]
+            if new_count:
+                print(f"Placing {new_count} new points in the cached {method} layout...")
+                coords = place_new_points(embeddings, coords, known)
+            else:
+                print(f"Reusing cached {method} projection.")
+
+        np.save(self.coords_path, coords)
+        with open(self.sidecar_path, 'w', encoding='utf-8') as f:
+            json.dump({'method': method, 'hashes': list(hashes)}, f)
+        return coords, full_fit
+
+
+def load_cluster_names(csv_path):
+    """Reads {cluster id: name} from cluster_names.csv; missing file gives {}."""
+    if not os.path.exists(csv_path):
+        return {}
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        return {int(row['Cluster']): row['Name'] for row in csv.DictReader(f)}
+
+
+def cluster_name(names, cluster_id):
+    """Name of a cluster, or a generic one when it has no entry."""
+    return names.get(int(cluster_id), f"Cluster {int(cluster_id)}")
+
+
+def export_json(path, ids, coords, clusters, names, titles=None):
+    """
+    Writes the layout in the node shape KnowledgeGraph.tsx uses
+    ({id, name, group}) plus x/y and fx/fy, so ForceGraph pins the nodes
+    at their projected positions.
+    """
+    nodes = []
+    for i, paper_id in enumerate(ids):
+        x, y = (float(v) for v in coords[i])
+        group = cluster_name(names, clusters[i])
+        nodes.append({
+            'id': f"Paper:{paper_id}",
+            'name': (titles[i] if titles is not None and titles[i] else f"Paper {paper_id}"),
+            'group': group,
+            'cluster': int(clusters[i]),
+            'x': x, 'y': y, 'fx': x, 'fy': y,
+        })
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'nodes': nodes, 'links': []}, f)
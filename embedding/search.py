@@ -0,0 +1,290 @@
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from embedding_store import EmbeddingStore, make_encoder
+
+# Get the directory where the script is located
+script_dir = os.path.dirname(os.path.abspath(__file__))
+abstracts_path = os.path.join(script_dir, 'abstracts.csv')
+
+# Corpora up to this many rows are searched exactly; larger ones use the IVF index
+exact_search_limit = 20000
+# Largest k the HTTP endpoints accept
+max_k = 100
+
+
+def normalize(matrix):
+    """L2-normalises rows (as float32) so a dot product is cosine similarity."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k(scores, k):
+    """Indices and scores of the k largest entries per row, best first."""
+    k = min(k, scores.shape[1])
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-part, axis=1)
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(part, order, axis=1)
+
+
+class ExactIndex:
+    """Brute-force cosine search: one matrix product per batch of queries."""
+
+    def __init__(self, matrix):
+        self.vectors = normalize(matrix)
+
+    def search(self, queries, k=10):
+        """
+        Args:
+            queries (array): (n_queries, dim) query embeddings.
+            k (int): Results per query.
+
+        Returns:
+            tuple: (row indices, cosine scores), each (n_queries, k).
+        """
+        return top_k(normalize(queries) @ self.vectors.T, k)
+
+
+class IVFIndex:
+    """
+    Approximate cosine search with an inverted file: rows are assigned to
+    the nearest of `n_lists` spherical k-means centroids, and a query only
+    scores the rows in its `n_probe` closest lists.
+    """
+
+    def __init__(self, matrix, n_lists=None, n_probe=8, iterations=10, seed=42):
+        self.vectors = normalize(matrix)
+        n = len(self.vectors)
+        self.n_lists = n_lists or max(1, int(np.sqrt(n)))
+        self.n_probe = n_probe
+
+        rng = np.random.default_rng(seed)
+        centroids = self.vectors[rng.choice(n, self.n_lists, replace=False)]
+        for _ in range(iterations):
+            assign = np.argmax(self.vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, self.vectors)
+            empty = np.bincount(assign, minlength=self.n_lists) == 0
+            sums[empty] = centroids[empty]
+            centroids = normalize(sums)
+
+        self.centroids = centroids
+        assign = np.argmax(self.vectors @ centroids.T, axis=1)
+        order = np.argsort(assign, kind='stable')
+        bounds = np.searchsorted(assign[order], np.arange(self.n_lists + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(self.n_lists)]
+
+    def search(self, queries, k=10, n_probe=None):
+        """Same contract as ExactIndex.search; missing slots are -1 / -inf."""
+        queries = normalize(queries)
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        probes = top_k(queries @ self.centroids.T, n_probe)[0]
+
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for q, lists in enumerate(probes):
+            candidates = np.concatenate([self.lists[i] for i in lists])
+            if not len(candidates):
+                continue
+            cand_ids, cand_scores = top_k((self.vectors[candidates] @ queries[q])[None, :], k)
+            found = cand_ids.shape[1]
+            ids[q, :found] = candidates[cand_ids[0]]
+            scores[q, :found] = cand_scores[0]
+        return ids, scores
+
+
+def parse_k(params, default=10):
+    """
+    The `k` query parameter of an HTTP request.
+
+    Raises:
+        ValueError: if k is not an integer between 1 and max_k.
+    """
+    value = params.get('k', [str(default)])[0]
+    try:
+        k = int(value)
+    except ValueError:
+        raise ValueError(f"k must be an integer, got {value!r}")
+    if not 1 <= k <= max_k:
+        raise ValueError(f"k must be between 1 and {max_k}, got {k}")
+    return k
+
+
+def build_index(matrix, exact_limit=exact_search_limit, **ivf_options):
+    """Exact index for small corpora, IVF above `exact_limit` rows."""
+    if len(matrix) <= exact_limit:
+        return ExactIndex(matrix)
+    return IVFIndex(matrix, **ivf_options)
+
+
+class SemanticSearch:
+    """
+    Top-k paper search over the stored abstract embeddings, by paper id or
+    by free-text query. The query model is only loaded for text queries.
+    """
+
+    def __init__(self, directory=script_dir, csv_path=abstracts_path, index=None):
+        ids, _, matrix = EmbeddingStore(directory).load()
+        if matrix is None:
+            raise FileNotFoundError(f"No embedding store in {directory}; run embedding.py first.")
+        self.ids = ids
+        self.row_of = {paper_id: row for row, paper_id in enumerate(ids)}
+        self.index = index or build_index(matrix)
+        self.encoder = None
+        self.encoder_lock = threading.Lock()
+
+        papers = pd.read_csv(csv_path).fillna('')
+        papers = papers.set_index(papers.columns[0])
+        self.papers = papers.to_dict('index')
+
+    def _results(self, rows, scores, skip=None):
+        results = []
+        for row, score in zip(rows, scores):
+            if row < 0 or self.ids[row] == skip:
+                continue
+            paper_id = self.ids[row]
+            paper = self.papers.get(paper_id, {})
+            abstract = str(paper.get('Abstract', ''))
+            results.append({
+                'id': paper_id,
+                'score': float(score),
+                'file': paper.get('File'),
+                'title': paper.get('Title'),
+                'preview': abstract[:200] + "..." if len(abstract) > 200 else abstract,
+            })
+        return results
+
+    def similar_to(self, paper_id, k=10):
+        """Papers most similar to a stored paper, excluding the paper itself."""
+        row = self.row_of[paper_id]
+        rows, scores = self.index.search(self.index.vectors[row:row + 1], k + 1)
+        return self._results(rows[0], scores[0], skip=paper_id)[:k]
+
+    def query(self, texts, k=10):
+        """
+        Args:
+            texts (str or list): One query or a batch of queries.
+
+        Returns:
+            list: Results for a single query, or one result list per query.
+        """
+        single = isinstance(texts, str)
+        with self.encoder_lock:
+            if self.encoder is None:
+                self.encoder = make_encoder()
+        rows, scores = self.index.search(self.encoder([texts] if single else list(texts)), k)
+        results = [self._results(r, s) for r, s in zip(rows, scores)]
+        return results[0] if single else results
+
+
+def synthetic_embeddings(n, dim=384, n_topics=50, spread=0.6, seed=0):
+    """Clustered random vectors, a stand-in for a large abstract corpus."""
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(n_topics, dim))
+    return (topics[rng.integers(0, n_topics, n)] + spread * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def benchmark(matrix, k=10, n_queries=200, n_probes=(1, 4, 8, 16), seed=42):
+    """
+    Recall@k and mean per-query latency of the IVF index against exact
+    search, using stored rows (plus noise) as queries.
+    """
+    rng = np.random.default_rng(seed)
+    vectors = normalize(matrix)
+    queries = vectors[rng.integers(0, len(vectors), n_queries)]
+    queries = queries + rng.normal(scale=0.05, size=queries.shape).astype(np.float32)
+
+    exact = ExactIndex(vectors)
+    start = time.perf_counter()
+    truth = exact.search(queries, k)[0]
+    report = [{'index': 'exact', 'recall': 1.0,
+               'ms_per_query': (time.perf_counter() - start) * 1000 / n_queries}]
+
+    start = time.perf_counter()
+    ivf = IVFIndex(vectors, seed=seed)
+    build_seconds = time.perf_counter() - start
+    for n_probe in n_probes:
+        start = time.perf_counter()
+        found = ivf.search(queries, k, n_probe=n_probe)[0]
+        elapsed = time.perf_counter() - start
+        hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+        report.append({'index': f'ivf(n_lists={ivf.n_lists}, n_probe={n_probe})',
+                       'recall': hits / truth.size,
+                       'ms_per_query': elapsed * 1000 / n_queries,
+                       'build_seconds': build_seconds})
+    return report
+
+
+def make_handler(search):
+    """HTTP handler for GET /search?q=...&k=10 and GET /similar?id=...&k=10."""
+
+    class SearchHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            try:
+                k = parse_k(params)
+                if url.path == '/search' and 'q' in params:
+                    body = search.query(params['q'][0], k)
+                elif url.path == '/similar' and 'id' in params:
+                    paper_id = params['id'][0]
+                    paper_id = int(paper_id) if paper_id.isdigit() else paper_id
+                    body = search.similar_to(paper_id, k)
+                else:
+                    return self._send(404, {'error': 'use /search?q=... or /similar?id=...'})
+            except ValueError as e:
+                return self._send(400, {'error': str(e)})
+            except KeyError as e:
+                return self._send(404, {'error': f'unknown paper id {e}'})
+            self._send(200, body)
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return SearchHandler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Semantic search over the abstract embeddings.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    q = sub.add_parser('query', help="print the top-k papers for a text query")
+    q.add_argument('text')
+    q.add_argument('-k', type=int, default=10)
+    s = sub.add_parser('serve', help="serve /search and /similar over HTTP")
+    s.add_argument('--port', type=int, default=8765)
+    b = sub.add_parser('bench', help="recall/latency of IVF vs exact search")
+    b.add_argument('--synthetic', type=int, default=0,
+                   help="benchmark on this many clustered random 384-d vectors instead of the store")
+    args = parser.parse_args()
+
+    if args.command == 'bench':
+        if args.synthetic:
+            matrix = synthetic_embeddings(args.synthetic)
+        else:
+            matrix = EmbeddingStore(script_dir).load()[2]
+        for row in benchmark(matrix):
+            print(row)
+    elif args.command == 'query':
+        for result in SemanticSearch().query(args.text, args.k):
+            print(f"{result['score']:.3f}  {result['id']}  {result['title']}")
+    else:
+        server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(SemanticSearch()))
+        print(f"Serving semantic search on http://127.0.0.1:{args.port}/search?q=...")
+        server.serve_forever()
@@ -0,0 +1,284 @@
+import json
+import random
+import sys
+import threading
+import time
+from collections import deque
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+
+from llm_cache import cache_key
+from metrics import metrics
+
+# HTTP status codes worth retrying: rate limiting and transient server errors
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+
+
+@lru_cache(maxsize=None)
+def load_system_prompt(system_prompt_file_path):
+    """Reads the system prompt once per path and reuses it for every request."""
+    with open(system_prompt_file_path, "r") as f:
+        return f.read()
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token) used for TPM limiting."""
+    return max(1, len(text) // 4)
+
+
+def is_retryable(exc):
+    """True for 429/5xx API errors, based on the error's status code."""
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    return code in RETRYABLE_CODES
+
+
+class RateLimiter:
+    """
+    Thread-safe sliding-window limiter for requests-per-minute and
+    tokens-per-minute. A limit of None disables that dimension.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, window=60.0):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self.window = window
+        self.events = deque()  # (timestamp, tokens)
+        self.tokens_in_window = 0
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        # A single request larger than the TPM budget would otherwise wait forever
+        if self.tpm:
+            tokens = min(tokens, self.tpm)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                while self.events and now - self.events[0][0] >= self.window:
+                    self.tokens_in_window -= self.events.popleft()[1]
+
+                rpm_ok = self.rpm is None or len(self.events) < self.rpm
+                tpm_ok = self.tpm is None or self.tokens_in_window + tokens <= self.tpm
+                if rpm_ok and tpm_ok:
+                    self.events.append((now, tokens))
+                    self.tokens_in_window += tokens
+                    return
+                wait = self.events[0][0] + self.window - now
+            time.sleep(max(wait, 0.01))
+
+
+class GeminiBackend:
+    """One shared genai client and cached system prompt for every request."""
+
+    def __init__(self, api_key, system_prompt_file_path, model="gemini-2.5-flash"):
+        from google import genai
+        from google.genai import types
+
+        self.client = genai.Client(api_key=api_key)
+        self.model = model
+        self.config = types.GenerateContentConfig(
+            thinking_config=types.ThinkingConfig(thinking_budget=0),
+            system_instruction=load_system_prompt(system_prompt_file_path),
+        )
+        # Prompt, model and generation config: everything besides the input
+        # that determines the output, used as part of the LLM cache key
+        self.identity = f"{self.model}\0{self.config.model_dump_json()}"
+
+    def generate(self, text):
+        result = self.client.models.generate_content(
+            model=self.model,
+            config=self.config,
+            contents=[text, "\n\nfollow the rules"],
+        )
+        return result.text or "No output returned."
+
+
+class MockError(Exception):
+    """Stand-in for an API error carrying an HTTP status code."""
+
+    def __init__(self, code):
+        super().__init__(f"mock API error {code}")
+        self.code = code
+
+
+class MockBackend:
+    """
+    Offline model backend for benchmarking: sleeps for a simulated latency
+    and randomly fails with 429/503 at `failure_rate`. `responder`, if given,
+    maps the input text to the output text (e.g. a synthetic graph).
+    """
+
+    def __init__(self, latency=0.5, jitter=0.2, failure_rate=0.0, seed=42, responder=None):
+        self.model = "mock"
+        self.identity = "mock"
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.responder = responder
+        self.lock = threading.Lock()
+
+    def generate(self, text):
+        with self.lock:
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            fail = self.random.random() < self.failure_rate
+            code = self.random.choice([429, 503])
+        time.sleep(delay)
+        if fail:
+            raise MockError(code)
+        if self.responder is not None:
+            return self.responder(text)
+        return json.dumps({
+            "nodes": [{"label": "Publication", "id": f"mock{len(text)}", "summary": text[:80]}],
+            "relationships": [],
+        })
+
+
+@dataclass
+class ExtractionResult:
+    name: str
+    text: str = None
+    error: str = None
+    retries: int = 0
+    seconds: float = 0.0
+    cached: bool = False
+
+
+class ExtractionRunner:
+    """
+    Runs extraction jobs concurrently against one shared backend, honouring
+    RPM/TPM limits and retrying 429/5xx errors with exponential backoff.
+    With an LLMCache, requests whose input and backend identity were already
+    answered are served from the cache without calling the model.
+    """
+
+    def __init__(self, backend, concurrency=8, requests_per_minute=None,
+                 tokens_per_minute=None, max_attempts=6, progress_every=10, cache=None):
+        self.backend = backend
+        self.cache = cache
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.max_attempts = max_attempts
+        self.progress_every = progress_every
+
+    def _call(self, name, text):
+        result = ExtractionResult(name)
+        start = time.perf_counter()
+
+        key = None
+        if self.cache is not None:
+            key = cache_key(text, self.backend.identity)
+            hit = self.cache.get(key)
+            if hit is not None:
+                result.text, result.cached = hit[0], True
+                result.seconds = time.perf_counter() - start
+                metrics.count("llm.cache_hits")
+                return result
+            metrics.count("llm.cache_misses")
+
+        retrying = Retrying(
+            retry=retry_if_exception(is_retryable),
+            wait=wait_exponential_jitter(initial=1, max=60),
+            stop=stop_after_attempt(self.max_attempts),
+            reraise=True,
+        )
+        try:
+            for attempt in retrying:
+                with attempt:
+                    result.retries = attempt.retry_state.attempt_number - 1
+                    with metrics.timer("llm.rate_limit_wait"):
+                        self.limiter.acquire(estimate_tokens(text))
+                    metrics.count("llm.api_calls")
+                    with metrics.timer("llm.api_call"):
+                        result.text = self.backend.generate(text)
+        except Exception as e:
+            result.error = f"Error during Gemini API call: {e}"
+        if key is not None and result.error is None:
+            self.cache.put(key, result.text)
+        result.seconds = time.perf_counter() - start
+
+        metrics.observe("llm.file", result.seconds)
+        metrics.count("llm.retries", result.retries)
+        metrics.count("llm.tokens_in", estimate_tokens(text))
+        if result.error:
+            metrics.count("llm.failures")
+        else:
+            metrics.count("llm.tokens_out", estimate_tokens(result.text))
+        return result
+
+    def run(self, jobs, on_result=None):
+        """
+        Jobs are pulled from the iterable as workers free up, with at most
+        2 x concurrency submitted at a time, so a streaming job generator
+        (e.g. llm.read_jobs) never builds every prompt up front.
+
+        Args:
+            jobs (iterable): (name, input text) pairs.
+            on_result (callable): Called with each ExtractionResult as soon as
+                it completes, so callers can persist progress incrementally.
+
+        Returns:
+            list: ExtractionResult per job, in completion order.
+        """
+        total = f"/{len(jobs)}" if hasattr(jobs, "__len__") else ""
+        jobs = iter(jobs)
+        results = []
+        pending = set()
+        exhausted = False
+        start = time.perf_counter()
+
+        def progress():
+            elapsed = time.perf_counter() - start
+            print(f"{len(results)}{total} files done "
+                  f"({len(results) / elapsed:.2f} files/s, {elapsed:.1f}s elapsed)")
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            while True:
+                while not exhausted and len(pending) < 2 * self.concurrency:
+                    job = next(jobs, None)
+                    if job is None:
+                        exhausted = True
+                    else:
+                        pending.add(pool.submit(self._call, *job))
+                if not pending:
+                    break
+                finished, pending = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+                for future in finished:
+                    results.append(future.result())
+                    if on_result is not None:
+                        on_result(results[-1])
+                    if len(results) % self.progress_every == 0:
+                        progress()
+        if results and len(results) % self.progress_every:
+            progress()
+        return results
+
+
+def summarize_results(results, elapsed):
+    """Prints throughput, failure and retry totals for a finished run."""
+    failed = sum(1 for r in results if r.error)
+    cached = sum(1 for r in results if r.cached)
+    retries = sum(r.retries for r in results)
+    latencies = sorted(r.seconds for r in results) or [0.0]
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"Files: {len(results)}, cached: {cached}, failed: {failed}, retries: {retries}")
+    print(f"Throughput: {len(results) / elapsed:.2f} files/s, "
+          f"latency p50 {p50:.2f}s, p95 {p95:.2f}s")
+
+
+# --- Offline benchmark with the mock backend ---
+if __name__ == "__main__":
+    num_files = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    backend = MockBackend(latency=0.2, jitter=0.1, failure_rate=0.05)
+    runner = ExtractionRunner(backend, concurrency=concurrency, requests_per_minute=600)
+    jobs = [(f"paper{i}.xml", "x" * random.randint(2000, 20000)) for i in range(num_files)]
+
+    start = time.perf_counter()
+    results = runner.run(jobs)
+    summarize_results(results, time.perf_counter() - start)
@@ -1,58 +1,222 @@
+import argparse
+import csv
+import hashlib
+import json
 import os
-import shutil
 import random
+import sys
+from collections import Counter
 
-def clear_folder(folder_path):
-    """Delete all contents of a folder"""
-    if os.path.exists(folder_path):
-        shutil.rmtree(folder_path)
+# The shared corpus reader and duplicate map live in the project root
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+from corpus_reader import iter_corpus
+from dedup import skip_duplicates
+
+source_folder = os.path.join(project_root, "datas", "grobid_output")
+demo_folder = os.path.join(current_dir, "demo_files")
+manifest_folder = os.path.join(current_dir, "manifests")
+abstracts_path = os.path.join(project_root, "embedding", "abstracts.csv")
+clusters_path = os.path.join(project_root, "embedding", "abstracts_clustered.csv")
+
+# Same seed -> same sample, on any machine
+sample_seed = 42
+
+
+def list_corpus(folder):
+    """Sorted XML file names of a folder, one copy per paper (see dedup.py)."""
+    return skip_duplicates(sorted(f for f in os.listdir(folder) if f.endswith('.xml')))
+
+
+def cluster_strata(source=source_folder):
+    """
+    {file name: cluster} from the embedding step's abstracts_clustered.csv,
+    joined to file names through abstracts.csv when the clustered file has
+    no File column, and otherwise through the ID, which is the paper's
+    position in the sorted listing of the corpus the CSV was built from.
+
+    Raises:
+        ValueError: if no row can be joined to a file name.
+    """
+    if not os.path.exists(clusters_path):
+        raise FileNotFoundError(f"{clusters_path} not found; run embedding/embedding.py first.")
+    file_of = {}
+    if os.path.exists(abstracts_path):
+        with open(abstracts_path, newline='', encoding='utf-8') as f:
+            file_of = {row['ID']: row['File'] for row in csv.DictReader(f) if row.get('File')}
+    listing = sorted(f for f in os.listdir(source) if f.lower().endswith('.xml'))
+    strata = {}
+    with open(clusters_path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            name = row.get('File') or file_of.get(row['ID'])
+            if not name and row['ID'].isdigit() and 0 < int(row['ID']) <= len(listing):
+                name = listing[int(row['ID']) - 1]
+            if name and row.get('cluster') not in (None, ''):
+                strata[name] = f"cluster {row['cluster']}"
+    if not strata:
+        raise ValueError(f"No row of {clusters_path} matches a file in {source}; rerun "
+                         f"embedding/examine_abstracts.py and embedding/embedding.py, or use --stratify keyword.")
+    return strata
+
+
+def keyword_strata(folder, files):
+    """
+    {file name: keyword}: each paper's most widespread keyword across the
+    corpus, so papers group around shared topics rather than one-off terms.
+    """
+    keywords = {}
+    for record in iter_corpus(files=[os.path.join(folder, f) for f in files]):
+        keywords[record.file] = {k.lower().replace(' ', '_') for k in record.keywords}
+    counts = Counter(k for ks in keywords.values() for k in ks)
+    return {name: max(sorted(ks), key=lambda k: counts[k]) if ks else "no keywords"
+            for name, ks in keywords.items()}
+
+
+def stratified_sample(files, num_files, seed=sample_seed, strata=None):
+    """
+    Seeded sample of num_files files. With strata ({file: group}), each group
+    gets a share proportional to its size (largest remainders first), and
+    every group gets at least one file when num_files allows it.
+
+    Returns:
+        list: Sorted sample.
+    """
+    rng = random.Random(seed)
+    files = sorted(files)
+    if num_files >= len(files):
+        return files
+    if not strata:
+        return sorted(rng.sample(files, num_files))
+
+    groups = {}
+    for f in files:
+        groups.setdefault(strata.get(f, "unassigned"), []).append(f)
+    names = sorted(groups)
+    quotas = {g: num_files * len(groups[g]) / len(files) for g in names}
+    take = {g: int(quotas[g]) for g in names}
+    if num_files >= len(names):
+        for g in names:
+            take[g] = max(take[g], 1)
+    # Hand out what is left by largest remainder, ties broken by the seeded rng
+    order = sorted(names, key=lambda g: (take[g] - quotas[g], rng.random()))
+    while sum(take.values()) < num_files:
+        for g in order:
+            if sum(take.values()) < num_files and take[g] < len(groups[g]):
+                take[g] += 1
+    # The one-per-group minimum can overshoot; take back from the most over-allocated groups
+    while sum(take.values()) > num_files:
+        g = max((g for g in names if take[g] > 1), key=lambda g: take[g] - quotas[g])
+        take[g] -= 1
+    sample = []
+    for g in names:
+        sample.extend(rng.sample(groups[g], take[g]))
+    return sorted(sample)
+
+
+def shard_of(filename, num_shards):
+    """Shard index of a file: a stable hash of its name, so adding files never moves others."""
+    return int(hashlib.sha1(filename.encode('utf-8')).hexdigest(), 16) % num_shards
+
+
+def shard_files(files, num_shards, index):
+    return [f for f in files if shard_of(f, num_shards) == index]
+
+
+def write_manifest(path, source, files, **info):
+    """Writes a sample/shard manifest: the source folder, the file list and how it was made."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'source': source, 'count': len(files), **info, 'files': files}, f, indent=2, ensure_ascii=False)
+    print(f"✓ Manifest with {len(files)} files: {path}")
+
+
+def read_manifest(path):
+    """Full paths of the files listed in a manifest."""
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    return [os.path.join(manifest['source'], name) for name in manifest['files']]
+
+
+def clear_links(folder_path, source):
+    """
+    Removes links into `source` left by an earlier materialise; anything else
+    in the folder (real files, notes) is left alone.
+    """
     os.makedirs(folder_path, exist_ok=True)
-    print(f"✓ Cleared target folder: {folder_path}")
-
-def copy_random_files(destination_folder, target_folder, num_files=25):
-    """
-    Select random files from destination folder and copy to target folder.
-    Target folder is cleared first.
-    """
-    
-    # Get all XML files in destination folder
-    dest_files = [f for f in os.listdir(destination_folder) if f.endswith('.xml')]
-    
-    print(f"Found {len(dest_files)} XML files in destination folder")
-    
-    # Select random files
-    if len(dest_files) < num_files:
-        print(f"Warning: Only {len(dest_files)} files available, selecting all of them")
-        selected_files = dest_files
-    else:
-        selected_files = random.sample(dest_files, num_files)
-    
-    print(f"Selected {len(selected_files)} random files\n")
-    
-    # Clear target folder
-    clear_folder(target_folder)
-    
-    # Copy selected files to target
-    print("\nCopying files to target folder:")
-    for filename in selected_files:
-        src = os.path.join(destination_folder, filename)
-        dst = os.path.join(target_folder, filename)
-        shutil.copy2(src, dst)
-        print(f"✓ {filename}")
-    
-    print(f"\n--- Summary ---")
-    print(f"Files copied to target: {len(selected_files)}")
+    source_inodes = None
+    for entry in os.scandir(folder_path):
+        if entry.is_symlink():
+            if os.path.dirname(os.path.realpath(entry.path)) == os.path.realpath(source):
+                os.unlink(entry.path)
+            continue
+        if entry.is_file():
+            if source_inodes is None:
+                source_inodes = {(s.st_dev, s.st_ino) for s in map(os.stat, (e.path for e in os.scandir(source)))}
+            st = entry.stat()
+            if (st.st_dev, st.st_ino) in source_inodes:
+                os.unlink(entry.path)
+
+
+def materialize(manifest_path, target_folder, mode='symlink'):
+    """
+    Makes a manifest's files appear in target_folder as symlinks or hardlinks
+    (no data is copied), for scripts that take a folder.
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    source = manifest['source']
+    clear_links(target_folder, source)
+    link = os.symlink if mode == 'symlink' else os.link
+    for name in manifest['files']:
+        target = os.path.join(target_folder, name)
+        if os.path.lexists(target):
+            print(f"Warning: '{target}' already exists and is not a link from {source}; left as is.")
+            continue
+        link(os.path.join(source, name), target)
+    print(f"✓ Linked {len(manifest['files'])} files into {target_folder} ({mode}s)")
+
 
 # Usage
 if __name__ == "__main__":
-    # Get the current script's directory
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    # Navigate up one level from filtering_files to reach Nasa_NLP root
-    project_root = os.path.dirname(current_dir)
-    
-    # Set paths relative to the project structure
-    destination_folder = os.path.join(project_root, "datas", "grobid_output") 
-    target_folder = os.path.join(current_dir, "demo_files")
-    
-    copy_random_files(destination_folder, target_folder, num_files=25)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Reproducible corpus samples and shards, as manifests.")
+    sub = parser.add_subparsers(dest='command')
+    p = sub.add_parser('sample', help="seeded (optionally stratified) sample")
+    p.add_argument('-n', '--num-files', type=int, default=25)
+    p.add_argument('--seed', type=int, default=sample_seed)
+    p.add_argument('--stratify', choices=['none', 'cluster', 'keyword'], default='none')
+    p.add_argument('--link', choices=['symlink', 'hardlink', 'none'], default='symlink',
+                   help="also expose the sample in demo_files/ (default), or only write the manifest")
+    p = sub.add_parser('shard', help="split the corpus into N deterministic shards")
+    p.add_argument('num_shards', type=int)
+    p.add_argument('--link', choices=['symlink', 'hardlink', 'none'], default='none',
+                   help="also expose each shard in manifests/shard-<i>-of-<N>/")
+    for p in sub.choices.values():
+        p.add_argument('--source', default=source_folder)
+    args = parser.parse_args()
+    if args.command is None:
+        # The old default: a 25-paper demo set in demo_files/, now seeded and linked
+        args = parser.parse_args(['sample'])
+
+    files = list_corpus(args.source)
+    print(f"Found {len(files)} XML files in {args.source}")
+
+    if args.command == 'sample':
+        strata = None
+        if args.stratify == 'cluster':
+            strata = cluster_strata(args.source)
+        elif args.stratify == 'keyword':
+            strata = keyword_strata(args.source, files)
+        selected = stratified_sample(files, args.num_files, args.seed, strata)
+        path = os.path.join(manifest_folder, f"sample-{args.num_files}-{args.stratify}-seed{args.seed}.json")
+        write_manifest(path, args.source, selected, seed=args.seed, stratify=args.stratify,
+                       strata=dict(Counter(strata.get(f, 'unassigned') for f in selected)) if strata else None)
+        if args.link != 'none':
+            materialize(path, demo_folder, args.link)
+    else:
+        for index in range(args.num_shards):
+            shard = shard_files(files, args.num_shards, index)
+            path = os.path.join(manifest_folder, f"shard-{index}-of-{args.num_shards}.json")
+            write_manifest(path, args.source, shard, shard=index, num_shards=args.num_shards)
+            if args.link != 'none':
+                materialize(path, os.path.join(manifest_folder, f"shard-{index}-of-{args.num_shards}"), args.link)
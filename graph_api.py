@@ -0,0 +1,497 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import re
+import time
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from cachetools import TTLCache
+
+from canonicalize import normalize_name
+from database_test import ingest_marker, iter_documents, password, quote_name, txt_dir, uri, user
+from schema import schema_labels
+
+# Result cache: entries expire after cache_ttl seconds; the least recently
+# used entry is evicted once cache_size is reached
+cache_size = 4096
+cache_ttl = 300
+# How often (seconds) the ingest marker written by Neo4jPusher is checked
+ingest_check_interval = 1.0
+
+# Concurrent Neo4j sessions; also the driver's connection pool size
+pool_size = 32
+default_page_size = 50
+max_page_size = 500
+
+project_root = os.path.dirname(os.path.abspath(__file__))
+clusters_path = os.path.join(project_root, "embedding", "abstracts_clustered.csv")
+# Corpus the CSV IDs are numbered over (positions in its sorted file listing)
+corpus_dir = os.path.join(project_root, "datas", "grobid_output")
+# Publication ids are often the title cut short; a prefix this long still identifies one paper
+min_title_prefix = 16
+
+LABELS = schema_labels()
+
+# Experiment -> Publication path in the extraction schema, used by the organism filter
+ORGANISM_PATH = ("INVOLVES_ENTITY", "APPLIED_IN", "USES_METHOD")
+
+
+def node_pattern(var, label):
+    return f"({var}:{quote_name(label)} {{id: $id}})" if label else f"({var} {{id: $id}})"
+
+
+def compile_queries(labels=LABELS):
+    """
+    Builds every Cypher statement once. Labels cannot be query parameters,
+    so there is one variant per schema label (plus an unlabelled one); all
+    values, including pagination, are parameters.
+    """
+    queries = {}
+    for label in [None] + labels:
+        queries["neighbours", label] = (
+            f"MATCH {node_pattern('n', label)}-[r]-(m) "
+            "WITH r, m, startNode(r) = m AS incoming ORDER BY type(r), m.id "
+            "WITH collect({type: type(r), direction: CASE WHEN incoming THEN 'in' ELSE 'out' END, "
+            "label: labels(m)[0], id: m.id, name: m.name}) AS rows "
+            "RETURN size(rows) AS total, rows[$skip..$skip + $limit] AS items"
+        )
+        if label:
+            queries["nodes", label] = (
+                f"MATCH (n:{quote_name(label)}) "
+                "WHERE ($q IS NULL OR toLower(coalesce(n.name, n.id)) CONTAINS $q) "
+                "AND ($ids IS NULL OR n.id IN $ids) "
+                "WITH n ORDER BY n.id "
+                "WITH collect({label: labels(n)[0], id: n.id, name: n.name}) AS rows "
+                "RETURN size(rows) AS total, rows[$skip..$skip + $limit] AS items"
+            )
+    queries["organism"] = (
+        "MATCH (:BiologicalEntity {id: $organism})<-[:INVOLVES_ENTITY]-(:Experiment)"
+        "<-[:APPLIED_IN]-(:Methodology)<-[:USES_METHOD]-(n:Publication) "
+        "WHERE ($q IS NULL OR toLower(coalesce(n.name, n.id)) CONTAINS $q) "
+        "AND ($ids IS NULL OR n.id IN $ids) "
+        "WITH DISTINCT n ORDER BY n.id "
+        "WITH collect({label: 'Publication', id: n.id, name: n.name}) AS rows "
+        "RETURN size(rows) AS total, rows[$skip..$skip + $limit] AS items"
+    )
+    queries["paper"] = (
+        "MATCH (p:Publication {id: $id}) "
+        "OPTIONAL MATCH (p)-[r]->(m) "
+        "RETURN properties(p) AS paper, "
+        "collect(CASE WHEN m IS NULL THEN NULL ELSE {type: type(r), label: labels(m)[0], id: m.id, name: m.name} END) AS related"
+    )
+    queries["publications"] = "MATCH (n:Publication) RETURN collect({id: n.id, name: n.name}) AS rows"
+    return queries
+
+
+class Neo4jGraph:
+    """Read-only async access to Neo4j through one pooled driver and precompiled queries."""
+
+    def __init__(self, uri, user, password, pool_size=pool_size, driver=None):
+        if driver is None:
+            from neo4j import AsyncGraphDatabase
+            driver = AsyncGraphDatabase.driver(uri, auth=(user, password), max_connection_pool_size=pool_size)
+        self.driver = driver
+        self.queries = compile_queries()
+        # Never queue more sessions than the pool can serve
+        self.slots = asyncio.Semaphore(pool_size)
+
+    async def _read(self, cypher, params):
+        from neo4j import READ_ACCESS
+
+        async def work(tx):
+            result = await tx.run(cypher, params)
+            return await result.single()
+
+        async with self.slots:
+            async with self.driver.session(default_access_mode=READ_ACCESS) as session:
+                return await session.execute_read(work)
+
+    async def neighbours(self, node_id, label=None, skip=0, limit=default_page_size):
+        record = await self._read(self.queries["neighbours", label],
+                                  {"id": node_id, "skip": skip, "limit": limit})
+        return {"total": record["total"], "items": record["items"]} if record else {"total": 0, "items": []}
+
+    async def nodes(self, label, q=None, organism=None, ids=None, skip=0, limit=default_page_size):
+        params = {"q": q, "ids": ids, "skip": skip, "limit": limit, "organism": organism}
+        cypher = self.queries["organism"] if organism else self.queries["nodes", label]
+        record = await self._read(cypher, params)
+        return {"total": record["total"], "items": record["items"]} if record else {"total": 0, "items": []}
+
+    async def paper(self, paper_id):
+        record = await self._read(self.queries["paper"], {"id": paper_id})
+        if record is None:
+            return None
+        return {"paper": record["paper"], "related": record["related"]}
+
+    async def publications(self):
+        record = await self._read(self.queries["publications"], {})
+        return record["rows"] if record else []
+
+    async def close(self):
+        await self.driver.close()
+
+
+class MemoryGraph:
+    """
+    In-memory stand-in with the same async query methods as Neo4jGraph,
+    built from the txt/*.json documents. `latency` simulates the remote
+    round-trip, so caching and concurrency behave as they would against Neo4j.
+    """
+
+    def __init__(self, documents, latency=0.0):
+        self.latency = latency
+        self.records = {}
+        self.by_label = defaultdict(set)
+        self.adjacency = defaultdict(list)
+        for data in documents:
+            for node in data.get("nodes", []):
+                if node.get("label") and node.get("id"):
+                    self.records.setdefault(node["id"], {}).update(node)
+                    self.by_label[node["label"]].add(node["id"])
+            for rel in data.get("relationships", []):
+                source, rel_type, target = rel.get("from"), rel.get("type"), rel.get("to")
+                if source and rel_type and target:
+                    self.adjacency[source].append((rel_type, "out", target))
+                    self.adjacency[target].append((rel_type, "in", source))
+
+    def _summary(self, node_id):
+        node = self.records.get(node_id, {})
+        return {"label": node.get("label"), "id": node_id, "name": node.get("name")}
+
+    async def _wait(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def neighbours(self, node_id, label=None, skip=0, limit=default_page_size):
+        await self._wait()
+        if node_id not in self.records or (label and self.records[node_id].get("label") != label):
+            return {"total": 0, "items": []}
+        rows = sorted(set(self.adjacency[node_id]), key=lambda e: (e[0], e[2]))
+        items = [{"type": t, "direction": d, **self._summary(other)} for t, d, other in rows]
+        return {"total": len(items), "items": items[skip:skip + limit]}
+
+    def _via(self, targets, rel_type):
+        """Ids with a rel_type edge into any of targets."""
+        return {other for t in targets for r, d, other in self.adjacency[t] if r == rel_type and d == "in"}
+
+    async def nodes(self, label, q=None, organism=None, ids=None, skip=0, limit=default_page_size):
+        await self._wait()
+        if organism:
+            found = {organism} if organism in self.by_label["BiologicalEntity"] else set()
+            for rel_type in ORGANISM_PATH:
+                found = self._via(found, rel_type)
+            found &= self.by_label["Publication"]
+        else:
+            found = self.by_label.get(label, set())
+        rows = []
+        for node_id in sorted(found):
+            node = self.records[node_id]
+            if q and q not in str(node.get("name") or node_id).lower():
+                continue
+            if ids is not None and node_id not in ids:
+                continue
+            rows.append(self._summary(node_id))
+        return {"total": len(rows), "items": rows[skip:skip + limit]}
+
+    async def paper(self, paper_id):
+        await self._wait()
+        node = self.records.get(paper_id)
+        if node is None or node.get("label") != "Publication":
+            return None
+        related = [{"type": t, **self._summary(other)} for t, d, other in self.adjacency[paper_id] if d == "out"]
+        return {"paper": {k: v for k, v in node.items() if k != "label"}, "related": related}
+
+    async def publications(self):
+        await self._wait()
+        return [{"id": i, "name": self.records[i].get("name")} for i in sorted(self.by_label["Publication"])]
+
+    async def close(self):
+        return None
+
+
+def title_from_file(filename):
+    """Paper title recovered from a GROBID file name ("Some_title.pdf.tei.xml")."""
+    stem = re.sub(r"(\.pdf)?(\.tei)?\.xml$", "", filename, flags=re.IGNORECASE)
+    return stem.replace("_", " ").strip()
+
+
+def load_cluster_titles(path=clusters_path, corpus_dir=corpus_dir):
+    """
+    {cluster id: [paper titles]} from abstracts_clustered.csv. CSVs written
+    before the Title column existed fall back to the File column, and then
+    to the ID, which is the paper's position in the sorted corpus listing.
+    """
+    if not os.path.exists(path):
+        return {}
+    files = None
+    clusters = defaultdict(list)
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row.get("cluster") in (None, ""):
+                continue
+            title = row.get("Title") or (title_from_file(row["File"]) if row.get("File") else None)
+            if not title and row.get("ID"):
+                if files is None:
+                    files = sorted(f for f in os.listdir(corpus_dir) if f.lower().endswith(".xml")) \
+                        if os.path.isdir(corpus_dir) else []
+                position = int(row["ID"]) - 1
+                title = title_from_file(files[position]) if 0 <= position < len(files) else None
+            if title:
+                clusters[int(row["cluster"])].append(title)
+    return dict(clusters)
+
+
+def compact(value):
+    return re.sub(r"[^0-9a-z]", "", str(value).lower())
+
+
+def match_titles(titles, publications):
+    """
+    Ids of the publications whose name or id is one of `titles`. Both sides
+    are compared after normalize_name, or as letters and digits only when one
+    is a long enough prefix of the other (ids are often shortened titles).
+    """
+    wanted = {normalize_name(t) for t in titles}
+    prefixes = [compact(t) for t in titles]
+    ids = []
+    for pub in publications:
+        for value in filter(None, (pub.get("name"), pub["id"])):
+            key = compact(value)
+            if normalize_name(value) in wanted or any(
+                    min(len(key), len(p)) >= min_title_prefix and (p.startswith(key) or key.startswith(p))
+                    for p in prefixes):
+                ids.append(pub["id"])
+                break
+    return ids
+
+
+def page_args(skip, limit):
+    skip = max(0, int(skip or 0))
+    limit = min(max(1, int(limit or default_page_size)), max_page_size)
+    return skip, limit
+
+
+class QueryService:
+    """
+    Cached, paginated dashboard queries over a graph backend (Neo4jGraph or
+    MemoryGraph).
+
+    Results live in a TTL+LRU cache. Identical queries that arrive while one is
+    already running share its result instead of hitting the backend again. The
+    cache is cleared by invalidate(), and automatically when Neo4jPusher
+    touches the ingest marker after a load.
+    """
+
+    def __init__(self, graph, cluster_titles=None, size=cache_size, ttl=cache_ttl, marker=ingest_marker):
+        self.graph = graph
+        self.cluster_titles = cluster_titles or {}
+        # size=0 turns caching and request sharing off (every call reaches the graph)
+        self.cache = TTLCache(maxsize=size, ttl=ttl) if size else None
+        self.inflight = {}
+        self.marker = marker
+        self.marker_mtime = self._marker_mtime()
+        self.next_check = 0.0
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0}
+        self.latencies = []
+
+    def _marker_mtime(self):
+        try:
+            return os.stat(self.marker).st_mtime_ns
+        except (OSError, TypeError):
+            return None
+
+    def invalidate(self):
+        if self.cache is not None:
+            self.cache.clear()
+        self.stats["invalidations"] += 1
+
+    def _check_ingest(self):
+        now = time.monotonic()
+        if now < self.next_check:
+            return
+        self.next_check = now + ingest_check_interval
+        mtime = self._marker_mtime()
+        if mtime != self.marker_mtime:
+            self.marker_mtime = mtime
+            self.invalidate()
+
+    async def _cached(self, key, compute):
+        start = time.perf_counter()
+        self._check_ingest()
+        if self.cache is None:
+            self.stats["misses"] += 1
+            result = await compute()
+        elif key in self.cache:
+            self.stats["hits"] += 1
+            result = self.cache[key]
+        elif key in self.inflight:
+            self.stats["coalesced"] += 1
+            result = await asyncio.shield(self.inflight[key])
+        else:
+            self.stats["misses"] += 1
+            future = asyncio.ensure_future(compute())
+            self.inflight[key] = future
+            try:
+                result = await future
+                self.cache[key] = result
+            finally:
+                del self.inflight[key]
+        self.latencies.append(time.perf_counter() - start)
+        if len(self.latencies) > 10000:
+            del self.latencies[:5000]
+        return result
+
+    async def neighbours(self, node_id, label=None, skip=0, limit=None):
+        if label is not None and label not in LABELS:
+            raise ValueError(f"unknown label {label}")
+        skip, limit = page_args(skip, limit)
+        page = await self._cached(("neighbours", node_id, label, skip, limit),
+                                  lambda: self.graph.neighbours(node_id, label, skip, limit))
+        return self._page(page, skip, limit)
+
+    async def nodes(self, label="Publication", q=None, organism=None, cluster=None, skip=0, limit=None):
+        if label not in LABELS:
+            raise ValueError(f"unknown label {label}")
+        skip, limit = page_args(skip, limit)
+        q = q.lower() if q else None
+        ids = None
+        if cluster is not None:
+            cluster = int(cluster)
+            ids = await self._cached(("cluster", cluster), lambda: self._cluster_ids(cluster))
+        page = await self._cached(("nodes", label, q, organism, cluster, skip, limit),
+                                  lambda: self.graph.nodes(label, q, organism, ids, skip, limit))
+        return self._page(page, skip, limit)
+
+    async def _cluster_ids(self, cluster):
+        titles = self.cluster_titles.get(cluster, [])
+        return match_titles(titles, await self.graph.publications()) if titles else []
+
+    async def paper(self, paper_id):
+        return await self._cached(("paper", paper_id), lambda: self.graph.paper(paper_id))
+
+    @staticmethod
+    def _page(page, skip, limit):
+        following = skip + limit if skip + limit < page["total"] else None
+        return {**page, "skip": skip, "limit": limit, "next": following}
+
+    def report(self):
+        values = sorted(self.latencies)
+        pick = lambda q: values[min(len(values) - 1, int(q * len(values)))] * 1000 if values else 0.0
+        cached = len(self.cache) if self.cache is not None else 0
+        return {**self.stats, "cached": cached, "p50_ms": pick(0.5), "p95_ms": pick(0.95)}
+
+
+async def handle(service, reader, writer):
+    """Minimal HTTP/1.1 GET/POST handler (one request per connection) with JSON responses."""
+    try:
+        request = await reader.readuntil(b"\r\n\r\n")
+        method, target = request.split(b"\r\n", 1)[0].decode("latin-1").split(" ")[:2]
+        url = urlparse(target)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        status, body = 200, None
+        try:
+            if method == "GET" and url.path == "/neighbours" and "id" in params:
+                body = await service.neighbours(params["id"], params.get("label"), params.get("skip"), params.get("limit"))
+            elif method == "GET" and url.path == "/nodes":
+                body = await service.nodes(params.get("label", "Publication"), params.get("q"), params.get("organism"),
+                                           params.get("cluster"), params.get("skip"), params.get("limit"))
+            elif method == "GET" and url.path == "/paper" and "id" in params:
+                body = await service.paper(params["id"])
+                if body is None:
+                    status, body = 404, {"error": "paper not found"}
+            elif method == "GET" and url.path == "/stats":
+                body = service.report()
+            elif method == "POST" and url.path == "/invalidate":
+                service.invalidate()
+                body = {"invalidated": True}
+            else:
+                status, body = 404, {"error": "use /neighbours?id=, /nodes?label=, /paper?id=, /stats"}
+        except ValueError as e:
+            status, body = 400, {"error": str(e)}
+        except Exception as e:
+            status, body = 500, {"error": f"query failed: {e}"}
+        payload = json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}[status]
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\nAccess-Control-Allow-Origin: *\r\n"
+            "Connection: close\r\n\r\n".encode("latin-1") + payload
+        )
+        await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(service, host, port):
+    server = await asyncio.start_server(lambda r, w: handle(service, r, w), host, port)
+    print(f"Serving graph queries on http://{host}:{port}/ (GET /neighbours, /nodes, /paper, /stats)")
+    async with server:
+        await server.serve_forever()
+
+
+async def benchmark(service, ids, clients=50, requests=2000, seed=42):
+    """
+    Simulates concurrent dashboard users: each client issues node expansions
+    and paper lookups on popular ids (Zipf-like), so repeated views hit the
+    cache. Returns the service report.
+    """
+    rng = random.Random(seed)
+    popular = ids[:max(1, len(ids) // 10)]
+    per_client = requests // clients
+
+    async def client():
+        for _ in range(per_client):
+            node_id = rng.choice(popular) if rng.random() < 0.8 else rng.choice(ids)
+            if rng.random() < 0.7:
+                await service.neighbours(node_id)
+            else:
+                await service.paper(node_id)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    report = service.report()
+    report["seconds"] = time.perf_counter() - start
+    report["requests_per_sec"] = per_client * clients / report["seconds"]
+    return report
+
+
+def memory_graph(directory, latency=0.0):
+    return MemoryGraph((data for _, data in iter_documents(Path(directory))), latency=latency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cached async query API for the dashboard.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("serve")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8766)
+    p.add_argument("--memory", metavar="TXT_DIR", nargs="?", const=str(txt_dir),
+                   help="Serve from the txt/*.json files instead of Neo4j")
+    p = sub.add_parser("bench", help="Concurrent-user benchmark against the in-memory stand-in")
+    p.add_argument("--txt-dir", default=str(txt_dir))
+    p.add_argument("--latency", type=float, default=0.02, help="Simulated Neo4j round-trip (s)")
+    p.add_argument("--clients", type=int, default=50)
+    p.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        graph = memory_graph(args.memory) if args.memory else Neo4jGraph(uri, user, password)
+        try:
+            asyncio.run(serve(QueryService(graph, load_cluster_titles()), args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+    else:
+        graph = memory_graph(args.txt_dir, latency=args.latency)
+        ids = sorted(graph.records)
+        for size in (0, cache_size):
+            name = "no cache" if size == 0 else f"cache ({size} entries, {cache_ttl}s TTL)"
+            report = asyncio.run(benchmark(QueryService(graph, size=size), ids, args.clients, args.requests))
+            print(f"{name:<32} p50 {report['p50_ms']:7.2f} ms  p95 {report['p95_ms']:7.2f} ms  "
+                  f"{report['requests_per_sec']:8.0f} req/s  hits {report['hits']}  coalesced {report['coalesced']}")
@@ -0,0 +1,425 @@
+import argparse
+import json
+import mmap
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from pathlib import Path
+
+from canonicalize import alias_path, apply_aliases, endpoint_aliases, load_alias_table
+from database_test import iter_documents, txt_dir
+
+snapshot_path = Path(__file__).resolve().parent / "graph_snapshot.bin"
+
+# Node properties with an exact-match index (values compared lowercased)
+indexed_properties = ("type", "institution", "grant", "industry")
+
+MAGIC = b"NNLPGRF1"
+ALIGN = 8
+
+
+class StringTable:
+    """
+    Sorted UTF-8 strings stored as one blob plus an int64 offsets array;
+    indexable like a list of bytes, so bisect works on it without decoding
+    the whole table.
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]])
+
+    def find(self, value):
+        """Index of value, or -1."""
+        key = value.encode("utf-8")
+        i = bisect_left(self, key)
+        return i if i < len(self) and self[i] == key else -1
+
+    @staticmethod
+    def pack(strings):
+        """(offsets array, blob) for already sorted strings."""
+        offsets = array("q", [0])
+        parts = []
+        for s in strings:
+            data = s.encode("utf-8")
+            parts.append(data)
+            offsets.append(offsets[-1] + len(data))
+        return offsets, b"".join(parts)
+
+
+def csr(n_rows, pairs):
+    """Compressed sparse rows from (row, value) pairs: (offsets int64[n_rows+1], values int32)."""
+    counts = array("q", bytes(8 * (n_rows + 1)))
+    for row, _ in pairs:
+        counts[row + 1] += 1
+    for i in range(n_rows):
+        counts[i + 1] += counts[i]
+    values = array("i", bytes(4 * len(pairs)))
+    cursor = array("q", counts[:-1])
+    for row, value in sorted(pairs):
+        values[cursor[row]] = value
+        cursor[row] += 1
+    return counts, values
+
+
+def load_documents(txt_dir=txt_dir):
+    """The txt/*.json documents with the reviewed alias table applied, as ingest loads them."""
+    aliases = load_alias_table(alias_path)
+    endpoints = endpoint_aliases(aliases)
+    for _, data in iter_documents(Path(txt_dir)):
+        yield apply_aliases(data, aliases, endpoints) if aliases else data
+
+
+def build_snapshot(documents, path=snapshot_path):
+    """
+    Writes the graph of the given documents (the shape push_data consumes)
+    to one snapshot file. As in Neo4j, a node is identified by its label and
+    id, so one id may exist under several labels; an edge endpoint reaches
+    every node with its id. Nodes are interned in (id, label) order; every
+    relationship type gets an outgoing and an incoming CSR adjacency.
+
+    Returns:
+        dict: Node, edge, label and type counts.
+    """
+    nodes = {}
+    edges = {}
+    for data in documents:
+        for node in data.get("nodes", []):
+            if node.get("label") and node.get("id"):
+                nodes.setdefault((node["label"], node["id"]), {}).update(node)
+        for rel in data.get("relationships", []):
+            source, rel_type, target = rel.get("from"), rel.get("type"), rel.get("to")
+            if source and rel_type and target:
+                edges.setdefault(rel_type, set()).add((source, target))
+    labels_of = {}
+    for label, node_id in nodes:
+        labels_of.setdefault(node_id, []).append(label)
+    # Endpoints without a node record still exist in the graph, unlabelled
+    for pairs in edges.values():
+        for source, target in pairs:
+            for node_id in (source, target):
+                if node_id not in labels_of:
+                    labels_of[node_id] = [""]
+                    nodes[("", node_id)] = {"id": node_id, "label": ""}
+
+    keys = sorted(nodes, key=lambda k: (k[1].encode("utf-8"), k[0]))
+    index = {key: i for i, key in enumerate(keys)}
+    labels = sorted({label for label, _ in keys})
+    label_index = {label: i for i, label in enumerate(labels)}
+    rel_types = sorted(edges)
+
+    sections = {}
+    sections["id_offsets"], sections["id_blob"] = StringTable.pack(node_id for _, node_id in keys)
+    sections["label_of"] = array("i", (label_index[label] for label, _ in keys))
+    sections["label_offsets"], sections["label_nodes"] = csr(
+        len(labels), [(label_index[label], i) for i, (label, _) in enumerate(keys)])
+
+    props = [json.dumps({k: v for k, v in nodes[key].items() if k not in ("id", "label")},
+                        ensure_ascii=False, separators=(",", ":")) for key in keys]
+    sections["prop_offsets"], sections["prop_blob"] = StringTable.pack(props)
+
+    for prop in indexed_properties:
+        pairs = {}
+        for i, key in enumerate(keys):
+            value = nodes[key].get(prop)
+            if isinstance(value, str) and value:
+                pairs.setdefault(value.lower(), []).append(i)
+        values = sorted(pairs, key=lambda s: s.encode("utf-8"))
+        sections[f"index.{prop}.value_offsets"], sections[f"index.{prop}.value_blob"] = StringTable.pack(values)
+        sections[f"index.{prop}.offsets"], sections[f"index.{prop}.nodes"] = csr(
+            len(values), [(v, i) for v, value in enumerate(values) for i in pairs[value]])
+
+    n_edges = 0
+    for rel_type in rel_types:
+        pairs = [(index[ls, s], index[lt, t]) for s, t in edges[rel_type]
+                 for ls in labels_of[s] for lt in labels_of[t]]
+        n_edges += len(pairs)
+        sections[f"out.{rel_type}.offsets"], sections[f"out.{rel_type}.targets"] = csr(len(keys), pairs)
+        sections[f"in.{rel_type}.offsets"], sections[f"in.{rel_type}.targets"] = csr(
+            len(keys), [(t, s) for s, t in pairs])
+
+    # Header: JSON table of contents; each section starts 8-byte aligned
+    toc = {}
+    offset = 0
+    for name, data in sections.items():
+        raw = data.tobytes() if isinstance(data, array) else data
+        toc[name] = [offset, data.typecode if isinstance(data, array) else "B", len(raw)]
+        offset += len(raw) + (-len(raw) % ALIGN)
+    header = json.dumps({"byteorder": sys.byteorder, "nodes": len(keys), "edges": n_edges,
+                         "labels": labels, "rel_types": rel_types,
+                         "indexed_properties": list(indexed_properties), "sections": toc}).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + 8 + len(header)) % ALIGN)
+
+    tmp = Path(str(path) + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + len(header).to_bytes(8, "little") + header)
+        for name, data in sections.items():
+            raw = data.tobytes() if isinstance(data, array) else data
+            f.write(raw + b"\0" * (-len(raw) % ALIGN))
+    tmp.replace(path)
+    return {"nodes": len(keys), "edges": n_edges, "labels": len(labels), "rel_types": len(rel_types)}
+
+
+class GraphSnapshot:
+    """
+    Read-only graph over a memory-mapped snapshot file. Opening only parses
+    the header; arrays are zero-copy views into the mapping, so startup time
+    does not grow with the corpus.
+    """
+
+    def __init__(self, path=snapshot_path):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a graph snapshot")
+        size = int.from_bytes(self.map[len(MAGIC):len(MAGIC) + 8], "little")
+        start = len(MAGIC) + 8
+        self.header = json.loads(bytes(self.map[start:start + size]))
+        if self.header["byteorder"] != sys.byteorder:
+            raise ValueError("snapshot was written on a machine with a different byte order")
+        self.base = start + size
+        self.view = memoryview(self.map)
+
+        self.labels = self.header["labels"]
+        self.rel_types = self.header["rel_types"]
+        self.ids = StringTable(self._section("id_offsets"), self._section("id_blob"))
+        self.label_of = self._section("label_of")
+        self.label_offsets = self._section("label_offsets")
+        self.label_nodes = self._section("label_nodes")
+        self.props = StringTable(self._section("prop_offsets"), self._section("prop_blob"))
+        self.out = {t: (self._section(f"out.{t}.offsets"), self._section(f"out.{t}.targets")) for t in self.rel_types}
+        self.inc = {t: (self._section(f"in.{t}.offsets"), self._section(f"in.{t}.targets")) for t in self.rel_types}
+        self.indexes = {
+            p: (StringTable(self._section(f"index.{p}.value_offsets"), self._section(f"index.{p}.value_blob")),
+                self._section(f"index.{p}.offsets"), self._section(f"index.{p}.nodes"))
+            for p in self.header["indexed_properties"]
+        }
+
+    def _section(self, name):
+        offset, typecode, length = self.header["sections"][name]
+        data = self.view[self.base + offset:self.base + offset + length]
+        return data if typecode == "B" else data.cast(typecode)
+
+    def close(self):
+        # Views must be released before the mapping can close
+        for name in list(vars(self)):
+            if name not in ("file", "map", "header"):
+                delattr(self, name)
+        self.map.close()
+        self.file.close()
+
+    def __len__(self):
+        return len(self.label_of)
+
+    def lookup_all(self, node_id):
+        """Indexes of every node with this id (one per label), in label order."""
+        key = node_id.encode("utf-8")
+        start = bisect_left(self.ids, key)
+        return range(start, bisect_right(self.ids, key, start))
+
+    def lookup(self, node_id, label=None):
+        """Node index of an id (with the given label, if any), or -1."""
+        for i in self.lookup_all(node_id):
+            if label is None or self.labels[self.label_of[i]] == label:
+                return i
+        return -1
+
+    def name(self, i):
+        return self.ids[i].decode("utf-8")
+
+    def node(self, node_id, label=None):
+        i = self.lookup(node_id, label)
+        if i < 0:
+            return None
+        return {"id": node_id, "label": self.labels[self.label_of[i]], **json.loads(self.props[i])}
+
+    def _csrs(self, rel_types, direction):
+        """(offsets, targets, type, direction) of every adjacency to walk."""
+        out = []
+        for rel_type in rel_types or self.rel_types:
+            if direction in ("out", "both") and rel_type in self.out:
+                out.append((*self.out[rel_type], rel_type, "out"))
+            if direction in ("in", "both") and rel_type in self.inc:
+                out.append((*self.inc[rel_type], rel_type, "in"))
+        return out
+
+    def _adjacent(self, i, rel_types, direction):
+        for offsets, targets, rel_type, d in self._csrs(rel_types, direction):
+            for j in targets[offsets[i]:offsets[i + 1]].tolist():
+                yield rel_type, d, j
+
+    def _neighbour_indexes(self, i, csrs):
+        found = []
+        for offsets, targets, _, _ in csrs:
+            start, end = offsets[i], offsets[i + 1]
+            if start != end:
+                found.extend(targets[start:end].tolist())
+        return found
+
+    def neighbours(self, node_id, rel_types=None, direction="both"):
+        """[(relationship type, 'out'|'in', neighbour id)] of every node with this id."""
+        return [(t, d, self.name(j)) for i in self.lookup_all(node_id)
+                for t, d, j in self._adjacent(i, rel_types, direction)]
+
+    def k_hop(self, node_id, k=2, rel_types=None, direction="both"):
+        """{id: hop distance} of every node within k hops (breadth-first)."""
+        frontier = list(self.lookup_all(node_id))
+        if not frontier:
+            return {}
+        csrs = self._csrs(rel_types, direction)
+        seen = {i: 0 for i in frontier}
+        for depth in range(1, k + 1):
+            following = []
+            for i in frontier:
+                for j in self._neighbour_indexes(i, csrs):
+                    if j not in seen:
+                        seen[j] = depth
+                        following.append(j)
+            frontier = following
+        distances = {}
+        for i, d in seen.items():
+            distances.setdefault(self.name(i), d)
+        return distances
+
+    def follow(self, node_id, steps, direction="out", labels=None, max_nodes=None):
+        """
+        Ids reached by following one list of relationship types per step, in
+        the order reached, optionally only those with the given labels.
+        Returns None once more than max_nodes nodes have been visited.
+        """
+        frontier = list(self.lookup_all(node_id))
+        if not frontier:
+            return []
+        wanted = None if labels is None else {self.labels.index(l) for l in labels if l in self.labels}
+        seen = set(frontier)
+        found = []
+        for rel_types in steps:
+            csrs = self._csrs(rel_types, direction)
+            following = []
+            for i in frontier:
+                for j in self._neighbour_indexes(i, csrs):
+                    if j not in seen:
+                        seen.add(j)
+                        following.append(j)
+            if max_nodes is not None and len(seen) > max_nodes:
+                return None
+            found.extend(j for j in following if wanted is None or self.label_of[j] in wanted)
+            frontier = following
+        return list(dict.fromkeys(self.name(j) for j in found))
+
+    def filter(self, label=None, **properties):
+        """Ids of nodes with the label and every given indexed property value."""
+        result = None
+        if label is not None:
+            if label not in self.labels:
+                return []
+            li = self.labels.index(label)
+            result = set(self.label_nodes[self.label_offsets[li]:self.label_offsets[li + 1]])
+        for prop, value in properties.items():
+            if prop not in self.indexes:
+                raise ValueError(f"property {prop} is not indexed (indexed: {', '.join(self.indexes)})")
+            values, offsets, members = self.indexes[prop]
+            v = values.find(str(value).lower())
+            found = set(members[offsets[v]:offsets[v + 1]]) if v >= 0 else set()
+            result = found if result is None else result & found
+        if result is None:
+            result = range(len(self))
+        return list(dict.fromkeys(self.name(i) for i in sorted(result)))
+
+    def path(self, source, target, max_depth=6, rel_types=None):
+        """
+        Shortest path between two entities ignoring edge direction, as a list
+        of ids, or None when they are not connected within max_depth hops.
+        """
+        sources, targets = self.lookup_all(source), set(self.lookup_all(target))
+        if not sources or not targets:
+            return None
+        csrs = self._csrs(rel_types, "both")
+        parent = {a: None for a in sources}
+        queue = deque((a, 0) for a in sources)
+        while queue:
+            i, depth = queue.popleft()
+            if i in targets:
+                hops = []
+                while i is not None:
+                    hops.append(self.name(i))
+                    i = parent[i]
+                return hops[::-1]
+            if depth == max_depth:
+                continue
+            for j in self._neighbour_indexes(i, csrs):
+                if j not in parent:
+                    parent[j] = i
+                    queue.append((j, depth + 1))
+        return None
+
+    def stats(self):
+        return {"nodes": len(self), "edges": self.header["edges"],
+                "labels": {l: self.label_offsets[i + 1] - self.label_offsets[i] for i, l in enumerate(self.labels)},
+                "rel_types": {t: len(self.out[t][1]) for t in self.rel_types}}
+
+
+def time_us(fn, repeat=200):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="In-memory graph snapshot built from txt/*.json.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("build")
+    p.add_argument("--txt-dir", default=str(txt_dir))
+    p.add_argument("--out", default=str(snapshot_path))
+    p = sub.add_parser("query")
+    p.add_argument("--snapshot", default=str(snapshot_path))
+    p.add_argument("kind", choices=["node", "neighbours", "khop", "filter", "path"])
+    p.add_argument("args", nargs="*", help="ids, or label and prop=value pairs for filter")
+    p.add_argument("--k", type=int, default=2)
+    p = sub.add_parser("bench")
+    p.add_argument("--snapshot", default=str(snapshot_path))
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        counts = build_snapshot(load_documents(args.txt_dir), args.out)
+        print(f"✅ Snapshot {args.out}: {counts} in {time.perf_counter() - start:.2f}s")
+    elif args.command == "query":
+        graph = GraphSnapshot(args.snapshot)
+        if args.kind == "node":
+            out = graph.node(args.args[0])
+        elif args.kind == "neighbours":
+            out = graph.neighbours(args.args[0])
+        elif args.kind == "khop":
+            out = graph.k_hop(args.args[0], args.k)
+        elif args.kind == "path":
+            out = graph.path(args.args[0], args.args[1])
+        else:
+            label = args.args[0] if args.args and "=" not in args.args[0] else None
+            props = dict(a.split("=", 1) for a in args.args if "=" in a)
+            out = graph.filter(label, **props)
+        print(json.dumps(out, indent=2, ensure_ascii=False))
+    else:
+        start = time.perf_counter()
+        graph = GraphSnapshot(args.snapshot)
+        print(f"Opened {graph.stats()['nodes']} nodes / {graph.header['edges']} edges "
+              f"in {(time.perf_counter() - start) * 1000:.2f} ms")
+        csrs = graph._csrs(None, "both")
+        hub = max(range(len(graph)), key=lambda i: len(graph._neighbour_indexes(i, csrs)))
+        hub_id, other = graph.name(hub), graph.name(len(graph) // 2)
+        for name, fn in [("lookup", lambda: graph.lookup(hub_id)),
+                         ("node", lambda: graph.node(hub_id)),
+                         ("neighbours(hub)", lambda: graph.neighbours(hub_id)),
+                         ("2-hop(hub)", lambda: graph.k_hop(hub_id, 2)),
+                         ("filter(label)", lambda: graph.filter(graph.labels[-1])),
+                         ("path", lambda: graph.path(other, hub_id))]:
+            print(f"{name:<18}{time_us(fn):>12.1f} us")
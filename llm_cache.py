@@ -0,0 +1,147 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+
+def cache_key(input_text, identity):
+    """
+    Content address of one LLM request: hash of the input text plus the
+    backend identity (system prompt, model name and generation config).
+    """
+    h = hashlib.sha256()
+    h.update(identity.encode("utf-8"))
+    h.update(b"\0")
+    h.update(input_text.encode("utf-8"))
+    return h.hexdigest()
+
+
+def parse_status(text):
+    """
+    'ok' if the model output is a loadable JSON object (markdown fences
+    allowed), otherwise 'invalid_json'. Empty text and placeholders such as
+    "No output returned." are invalid.
+    """
+    try:
+        text = re.sub(r"^\s*```(?:json)?\s*|\s*```\s*$", "", text.strip())
+        return "ok" if isinstance(json.loads(text), dict) else "invalid_json"
+    except (AttributeError, TypeError, ValueError):
+        return "invalid_json"
+
+
+class LLMCache:
+    """
+    Persistent, size-bounded cache of raw model outputs backed by SQLite.
+
+    Entries are keyed by `cache_key`, so editing the system prompt or changing
+    the model only misses for requests made under the new identity. Only
+    outputs that parse are stored, so a bad response is retried on the next
+    run. When the stored outputs exceed `max_bytes`, the least recently used
+    entries are evicted.
+    """
+
+    def __init__(self, path="llm_cache.sqlite", max_bytes=512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " output TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+        self.conn.commit()
+        # Running total of stored bytes, so put() does not re-sum the table
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def get(self, key):
+        """
+        Returns (output, status) for a cached request, or None on a miss.
+        Entries stored with a failed parse status (by older versions) are
+        dropped and count as misses.
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT output, status FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[1] != "ok":
+                self._delete(key)
+                self.conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+            return row
+
+    def put(self, key, output):
+        """
+        Stores a model output that parses, then enforces the size bound.
+
+        Returns:
+            bool: False if the output was not cached because it does not parse.
+        """
+        status = parse_status(output)
+        if status != "ok":
+            return False
+        size = len(output.encode("utf-8"))
+        now = time.time()
+        with self.lock:
+            self._delete(key)
+            self.conn.execute(
+                "INSERT INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                (key, output, status, size, now, now),
+            )
+            self.total_bytes += size
+            self._evict()
+            self.conn.commit()
+        return True
+
+    def _delete(self, key):
+        row = self.conn.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self.conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            self.total_bytes -= row[0]
+
+    def _evict(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+        for key, size in self.conn.execute(
+            "SELECT key, size FROM results ORDER BY accessed"
+        ).fetchall():
+            self.conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            self.evictions += 1
+            self.total_bytes -= size
+            if self.total_bytes <= self.max_bytes:
+                break
+
+    def stats(self):
+        """Hit/miss counters for this run plus the current size of the cache."""
+        with self.lock:
+            entries, size = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,308 @@
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+
+from schema import schema_labels, schema_relationship_types
+
+IDENTIFIER = r"^[A-Za-z_][A-Za-z0-9_]*$"
+PRIMITIVES = (str, int, float, bool)
+
+SCHEMA_LABELS = set(schema_labels())
+SCHEMA_TYPES = set(schema_relationship_types())
+
+
+def neo4j_value(value):
+    """
+    Coerces a property to something Neo4j can store: primitives and lists of
+    primitives pass through; anything nested is kept as a JSON string.
+    """
+    if isinstance(value, PRIMITIVES):
+        return value
+    if isinstance(value, list) and all(isinstance(v, PRIMITIVES) for v in value):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def number_to_str(value):
+    """The model sometimes emits numeric ids; they are kept as strings."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return value
+
+
+class Node(BaseModel):
+    model_config = ConfigDict(extra="allow", str_strip_whitespace=True)
+
+    label: str = Field(pattern=IDENTIFIER)
+    id: str = Field(min_length=1)
+
+    @field_validator("id", mode="before")
+    @classmethod
+    def id_to_str(cls, value):
+        return number_to_str(value)
+
+    def properties(self):
+        return {k: neo4j_value(v) for k, v in (self.model_extra or {}).items() if v is not None}
+
+
+class Relationship(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True)
+
+    source: str = Field(alias="from", min_length=1)
+    type: str = Field(pattern=IDENTIFIER)
+    to: str = Field(min_length=1)
+
+    @field_validator("source", "to", mode="before")
+    @classmethod
+    def ends_to_str(cls, value):
+        return number_to_str(value)
+
+    @field_validator("type", mode="before")
+    @classmethod
+    def upper_type(cls, value):
+        return value.upper() if isinstance(value, str) else value
+
+
+class Document(BaseModel):
+    nodes: List[dict] = []
+    relationships: List[dict] = []
+
+
+def string_positions(text):
+    """Flags for every character of `text`: True inside a JSON string literal (quotes included)."""
+    inside = [False] * len(text)
+    in_string = escape = False
+    for i, ch in enumerate(text):
+        if in_string:
+            inside[i] = True
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            inside[i] = in_string = True
+    return inside
+
+
+def sub_outside_strings(pattern, repl, text):
+    """re.sub that leaves matches starting inside a string value untouched."""
+    inside = string_positions(text)
+    return re.sub(pattern, lambda m: m.group(0) if inside[m.start()] else m.expand(repl), text)
+
+
+def strip_fences(text):
+    """
+    Removes ```json ... ``` markdown fences and anything outside the outer
+    braces. Truncated output (no matching closing brace) keeps its tail.
+    """
+    text = re.sub(r"^\s*```(?:json)?\s*|\s*```\s*$", "", text.strip())
+    start = text.find("{")
+    if start < 0:
+        return text
+    text = text[start:]
+    depth = 0
+    inside = string_positions(text)
+    for i, ch in enumerate(text):
+        if inside[i]:
+            continue
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return text[:i + 1]
+    return text
+
+
+def close_truncated(text):
+    """
+    Cuts truncated JSON back to the last complete value inside a container
+    and closes every bracket still open at that point.
+    """
+    stack = []
+    last_cut = None
+    in_string = escape = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if not stack:
+                break
+            stack.pop()
+            if stack:
+                last_cut = (i + 1, "".join(reversed(stack)))
+    if last_cut is None:
+        return text
+    end, closers = last_cut
+    return re.sub(r",\s*$", "", text[:end]) + closers
+
+
+def parse_llm_output(text):
+    """
+    Parses one LLM output, applying fixes for the common failure modes only
+    when needed: markdown fences, the `{"label": {"label": ...` glitch,
+    trailing commas and truncated arrays.
+
+    Returns:
+        tuple: (parsed data, list of fixes applied)
+
+    Raises:
+        ValueError: if the text cannot be repaired into JSON.
+    """
+    fixes = []
+    attempts = [
+        ("markdown fences", strip_fences),
+        ("nested label", lambda t: sub_outside_strings(r'{"label":\s*{"label":', '{"label":', t)),
+        ("trailing commas", lambda t: sub_outside_strings(r",\s*([}\]])", r"\1", t)),
+        ("truncated output", close_truncated),
+    ]
+    try:
+        return json.loads(text), fixes
+    except json.JSONDecodeError as e:
+        error = e
+    # Fixes are cumulative: each one is applied on top of the previous ones
+    for name, fix in attempts:
+        fixed = fix(text)
+        if fixed == text:
+            continue
+        text = fixed
+        fixes.append(name)
+        try:
+            return json.loads(text), fixes
+        except json.JSONDecodeError as e:
+            error = e
+    raise ValueError(f"still invalid JSON: {error}")
+
+
+def validate_document(data):
+    """
+    Validates parsed output against the system_prompt.txt node/relationship
+    schema. Invalid items are dropped and reported instead of failing the
+    whole file; nodes repeated with the same id are merged.
+
+    Returns:
+        tuple: (normalised {"nodes", "relationships"}, errors, warnings)
+    """
+    errors, warnings = [], []
+    try:
+        document = Document.model_validate(data)
+    except ValidationError as e:
+        return {"nodes": [], "relationships": []}, [f"document: {e.errors()[0]['msg']}"], warnings
+
+    nodes = {}
+    for i, raw in enumerate(document.nodes):
+        # Structural form of the nested-label glitch: {"label": {"label": ..., "id": ...}}
+        if isinstance(raw.get("label"), dict):
+            raw = {**{k: v for k, v in raw.items() if k != "label"}, **raw["label"]}
+        try:
+            node = Node.model_validate(raw)
+        except ValidationError as e:
+            errors.append(f"node {i}: {e.errors()[0]['loc']} {e.errors()[0]['msg']}")
+            continue
+        if node.label not in SCHEMA_LABELS:
+            warnings.append(f"node {node.id}: label {node.label} not in schema")
+        entry = nodes.setdefault(node.id, {"label": node.label, "id": node.id})
+        entry.update(node.properties())
+
+    relationships = {}
+    for i, raw in enumerate(document.relationships):
+        try:
+            rel = Relationship.model_validate(raw)
+        except ValidationError as e:
+            errors.append(f"relationship {i}: {e.errors()[0]['loc']} {e.errors()[0]['msg']}")
+            continue
+        if rel.type not in SCHEMA_TYPES:
+            warnings.append(f"relationship {rel.type} not in schema")
+        for end in (rel.source, rel.to):
+            if end not in nodes:
+                warnings.append(f"relationship {rel.type}: endpoint {end} not defined in this file")
+        relationships[(rel.source, rel.type, rel.to)] = {"from": rel.source, "type": rel.type, "to": rel.to}
+
+    return {"nodes": list(nodes.values()), "relationships": list(relationships.values())}, errors, warnings
+
+
+def process_file(path, out_dir):
+    """
+    Parses, repairs and validates one LLM output file and writes the compact
+    normalised artifact `<out_dir>/<stem>.json`. When the file fails, an
+    artifact left by an earlier version of it is removed, so the graph load
+    does not fall back to stale data.
+
+    Returns:
+        dict: Per-file report (status, fixes, errors, warnings, counts).
+    """
+    path = Path(path)
+    out_path = Path(out_dir) / (path.stem + ".json")
+    report = {"file": path.name, "status": "ok", "fixes": [], "errors": [], "warnings": [],
+              "nodes": 0, "relationships": 0}
+    try:
+        text = path.read_text(encoding="utf-8").strip()
+        if not text:
+            raise ValueError("empty file")
+        data, report["fixes"] = parse_llm_output(text)
+    except (OSError, ValueError) as e:
+        report["status"] = "failed"
+        report["errors"].append(str(e))
+        out_path.unlink(missing_ok=True)
+        return report
+
+    document, report["errors"], report["warnings"] = validate_document(data)
+    report["nodes"] = len(document["nodes"])
+    report["relationships"] = len(document["relationships"])
+    if report["fixes"] or report["errors"]:
+        report["status"] = "repaired"
+    if not document["nodes"]:
+        report["status"] = "failed"
+        report["errors"].append("no valid nodes")
+        out_path.unlink(missing_ok=True)
+        return report
+
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(document, f, ensure_ascii=False, separators=(",", ":"))
+    return report
+
+
+def repair_directory(txt_dir, out_dir=None, processes=None, report_path=None, files=None):
+    """
+    Runs process_file over every txt/*.txt file across a process pool.
+
+    Args:
+        txt_dir (str): Folder of raw LLM outputs.
+        files (list): Only repair these paths instead of every txt/*.txt file.
+        out_dir (str): Folder for the .json artifacts (defaults to txt_dir).
+        processes (int): Worker processes; None uses all cores.
+        report_path (str): Optional path for the per-file JSON report.
+
+    Returns:
+        list: Per-file reports, in file name order.
+    """
+    out_dir = out_dir or txt_dir
+    os.makedirs(out_dir, exist_ok=True)
+    files = sorted(Path(f) for f in files) if files is not None else sorted(Path(txt_dir).glob("*.txt"))
+    if processes == 1 or len(files) < 2:
+        reports = [process_file(f, out_dir) for f in files]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            reports = list(pool.map(process_file, files, [out_dir] * len(files), chunksize=8))
+
+    if report_path:
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+    return reports
@@ -0,0 +1,200 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Instrumentation is off unless NASA_NLP_METRICS=1; every call is then a
+# single attribute check. NASA_NLP_PROFILE=1 adds a cProfile dump per stage
+# and NASA_NLP_TRACEMALLOC=1 records peak Python memory per stage. Both are
+# process-wide, so pipeline.py runs its branches one after the other while
+# either is on; stages that still overlap share one trace and skip profiling.
+metrics_enabled = os.environ.get("NASA_NLP_METRICS") == "1"
+profile_stages = os.environ.get("NASA_NLP_PROFILE") == "1"
+trace_memory = os.environ.get("NASA_NLP_TRACEMALLOC") == "1"
+log_path = os.environ.get(
+    "NASA_NLP_METRICS_LOG",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "run_metrics.jsonl"),
+)
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open
+HISTOGRAM_BOUNDS_MS = [1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 60000]
+
+_NULL = nullcontext()
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class Metrics:
+    """
+    Process-wide counters, latency timers and per-stage timing, with a
+    JSON-lines run log (`log_path`) and an end-of-run summary table.
+    """
+
+    def __init__(self, enabled=metrics_enabled, path=log_path, profile=profile_stages, memory=trace_memory):
+        self.enabled = enabled
+        self.path = path
+        self.profile = profile
+        self.memory = memory
+        self.run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.samples = {}
+        self.stages = []
+        self._active_stages = 0
+        self._owns_trace = False
+        self._stages_started = 0
+        self._log = None
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        """Adds one latency sample (seconds) to the `name` histogram."""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.samples.setdefault(name, []).append(seconds)
+
+    def timer(self, name):
+        """Context manager that observes the duration of its block."""
+        if not self.enabled:
+            return _NULL
+        return self._timer(name)
+
+    @contextmanager
+    def _timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def stage(self, name):
+        """
+        Context manager for one pipeline stage: logs its start and end with
+        wall time, plus peak traced memory and a cProfile dump when enabled.
+        """
+        if not self.enabled:
+            return _NULL
+        return self._stage(name)
+
+    @contextmanager
+    def _stage(self, name):
+        self.event("stage_start", stage=name)
+        # Only the outermost of overlapping stages starts and stops tracemalloc
+        # and resets its peak; a profiler is only attached when no other stage runs
+        with self.lock:
+            first = self._active_stages == 0
+            self._active_stages += 1
+            self._stages_started += 1
+            started = self._stages_started
+            if first and self.memory and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._owns_trace = True
+            if first and self.memory:
+                tracemalloc.reset_peak()
+        profiler = cProfile.Profile() if self.profile and first else None
+        if profiler:
+            profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            info = {"stage": name, "seconds": seconds}
+            if profiler:
+                profiler.disable()
+                info["profile"] = self._dump_profile(name, profiler)
+            with self.lock:
+                self._active_stages -= 1
+                if self.memory and tracemalloc.is_tracing():
+                    info["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+                    # Another stage ran at some point during this one
+                    info["shared_peak"] = not first or self._stages_started != started
+                if self._active_stages == 0 and self._owns_trace:
+                    tracemalloc.stop()
+                    self._owns_trace = False
+                self.stages.append(info)
+            self.event("stage_end", **info)
+
+    def _dump_profile(self, stage, profiler):
+        """Writes <log>.<run>.<stage>.prof and returns its path; top functions go to the log."""
+        path = f"{os.path.splitext(self.path)[0]}.{self.run_id}.{stage}.prof"
+        profiler.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(15)
+        self.event("profile", stage=stage, path=path, top=out.getvalue())
+        return path
+
+    def event(self, name, **fields):
+        """Appends one structured record to the JSON-lines run log."""
+        if not self.enabled:
+            return
+        record = {"ts": time.time(), "run": self.run_id, "event": name, **fields}
+        line = json.dumps(record, default=str)
+        with self.lock:
+            if self._log is None:
+                self._log = open(self.path, "a", encoding="utf-8")
+            self._log.write(line + "\n")
+            self._log.flush()
+
+    def summary(self):
+        """Counters, per-timer latency statistics with histogram, and stage times."""
+        with self.lock:
+            timers = {}
+            for name, values in self.samples.items():
+                values = sorted(values)
+                buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+                for v in values:
+                    ms = v * 1000
+                    buckets[next((i for i, b in enumerate(HISTOGRAM_BOUNDS_MS) if ms <= b), -1)] += 1
+                timers[name] = {
+                    "count": len(values), "total": sum(values), "mean": sum(values) / len(values),
+                    "p50": percentile(values, 0.5), "p95": percentile(values, 0.95),
+                    "max": values[-1], "histogram_ms": dict(zip([str(b) for b in HISTOGRAM_BOUNDS_MS] + ["inf"], buckets)),
+                }
+            return {"counters": dict(self.counters), "timers": timers, "stages": list(self.stages)}
+
+    def print_summary(self):
+        if not self.enabled:
+            return
+        summary = self.summary()
+        self.event("summary", **summary)
+        print(f"\n{'stage':<28}{'seconds':>10}{'peak MB':>10}")
+        for s in summary["stages"]:
+            peak = f"{s['peak_mb']:.1f}{'*' if s.get('shared_peak') else ''}" if "peak_mb" in s else "-"
+            print(f"{s['stage']:<28}{s['seconds']:>10.2f}{peak:>10}")
+        if summary["timers"]:
+            print(f"\n{'timer':<28}{'count':>8}{'total s':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+            for name, t in sorted(summary["timers"].items()):
+                print(f"{name:<28}{t['count']:>8}{t['total']:>10.2f}{t['mean'] * 1000:>10.1f}"
+                      f"{t['p50'] * 1000:>10.1f}{t['p95'] * 1000:>10.1f}{t['max'] * 1000:>10.1f}")
+        if summary["counters"]:
+            print(f"\n{'counter':<28}{'value':>14}")
+            for name, value in sorted(summary["counters"].items()):
+                print(f"{name:<28}{value:>14,}")
+        if any(s.get("shared_peak") for s in summary["stages"]):
+            print("* peak shared with a stage that ran at the same time")
+        print(f"Run log: {self.path} (run {self.run_id})")
+
+    def close(self):
+        with self.lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+
+# Shared instance used by every pipeline script
+metrics = Metrics()
@@ -0,0 +1,393 @@
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from dedup import skip_duplicates
+from metrics import metrics
+
+project_root = os.path.dirname(os.path.abspath(__file__))
+embedding_dir = os.path.join(project_root, "embedding")
+
+# Defaults mirror the folders the individual scripts use
+xml_dir = os.path.join(project_root, "xmls")
+txt_dir = os.path.join(project_root, "txt")
+corpus_dir = os.path.join(project_root, "datas", "grobid_output")
+manifest_path = os.path.join(project_root, "pipeline_manifest.json")
+# --mock runs keep their fake LLM outputs and manifest apart from the real ones
+mock_txt_dir = os.path.join(project_root, "txt_mock")
+mock_manifest_path = os.path.join(project_root, "pipeline_manifest.mock.json")
+
+# Runs before both branches, so each skips duplicate copies of a paper
+PRE_STAGES = ["dedup"]
+GRAPH_STAGES = ["extract", "repair", "load"]
+EMBEDDING_STAGES = ["abstracts", "embed"]
+
+# The manifest is rewritten at most this often while a stage runs (and always at its end)
+save_interval = 2.0
+
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def stage_key(*parts):
+    """Hash of everything a stage's output depends on for one paper."""
+    return hashlib.sha1("\0".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+class Manifest:
+    """
+    Per-stage record of every paper's input hash and status, kept in one JSON
+    file. A paper is skipped by a stage when its recorded key matches and the
+    status is "done", so reruns only process new or changed papers and an
+    interrupted run resumes where it stopped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.last_save = time.monotonic()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+        else:
+            self.data = {"files": {}, "stages": {}}
+
+    def is_current(self, stage, item, key):
+        entry = self.data["stages"].get(stage, {}).get(item)
+        return entry is not None and entry["status"] == "done" and entry["key"] == key
+
+    def record(self, stage, item, key, status, **info):
+        with self.lock:
+            self.data["stages"].setdefault(stage, {})[item] = {
+                "key": key, "status": status, "updated": time.strftime("%Y-%m-%dT%H:%M:%S"), **info,
+            }
+            if time.monotonic() - self.last_save >= save_interval:
+                self._save()
+
+    def forget(self, stage, item):
+        with self.lock:
+            return self.data["stages"].get(stage, {}).pop(item, None)
+
+    def digest(self, path):
+        """Content hash of a file, re-read only when its size or mtime changed."""
+        stat = os.stat(path)
+        with self.lock:
+            cached = self.data["files"].get(str(path))
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = file_hash(path)
+        with self.lock:
+            self.data["files"][str(path)] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def save(self):
+        with self.lock:
+            self._save()
+
+    def _save(self):
+        # Write-then-rename, so a crash never leaves a half-written manifest
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f)
+        os.replace(tmp, self.path)
+        self.last_save = time.monotonic()
+
+
+def report(stage, done, skipped, failed, seconds):
+    print(f"[{stage}] {done} processed, {skipped} unchanged, {failed} failed ({seconds:.1f}s)")
+
+
+def load_file_list(path):
+    """
+    (source folder, set of file names) of a sample/shard manifest
+    (filtering_files/filtering_script.py), or (None, None) without one.
+    """
+    if not path:
+        return None, None
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    return manifest["source"], set(manifest["files"])
+
+
+def run_extract(manifest, xml_dir, txt_dir, mock=False, only=None):
+    """LLM extraction for papers whose XML or prompt settings changed (only those in `only`, if given)."""
+    import llm
+    from extraction import ExtractionRunner, MockBackend
+    from llm_cache import LLMCache
+
+    start = time.perf_counter()
+    backend = MockBackend() if mock else llm.get_backend(llm.api_key_placeholder, llm.prompt_path)
+    settings = (llm.use_tei_sections, llm.prompt_token_budget, backend.identity)
+
+    todo = {}
+    files = skip_duplicates(sorted(f for f in os.listdir(xml_dir) if f.lower().endswith(".xml")))
+    if only is not None:
+        files = [f for f in files if f in only]
+    for name in files:
+        stem = Path(name).stem
+        key = stage_key(manifest.digest(os.path.join(xml_dir, name)), *settings)
+        if not (manifest.is_current("extract", stem, key) and os.path.exists(os.path.join(txt_dir, stem + ".txt"))):
+            todo[name] = key
+
+    counts = {"done": 0, "failed": 0}
+    if todo:
+        os.makedirs(txt_dir, exist_ok=True)
+        cache = LLMCache(llm.cache_path, max_bytes=llm.cache_max_bytes)
+        runner = ExtractionRunner(backend, concurrency=llm.concurrency,
+                                  requests_per_minute=llm.requests_per_minute,
+                                  tokens_per_minute=llm.tokens_per_minute, cache=cache)
+
+        def save_result(result):
+            stem = Path(result.name).stem
+            if result.error:
+                print(f"❌ {result.name}: {result.error}")
+                manifest.record("extract", stem, todo[result.name], "failed", error=result.error)
+                counts["failed"] += 1
+                return
+            with open(os.path.join(txt_dir, stem + ".txt"), "w") as f:
+                f.write(result.text)
+            manifest.record("extract", stem, todo[result.name], "done", cached=result.cached)
+            counts["done"] += 1
+
+        try:
+            runner.run(llm.read_jobs(xml_dir, list(todo)), on_result=save_result)
+        finally:
+            cache.close()
+    manifest.save()
+    report("extract", counts["done"], len(files) - len(todo), counts["failed"], time.perf_counter() - start)
+    return counts["failed"] == 0
+
+
+def run_repair(manifest, txt_dir):
+    """JSON repair and validation for LLM outputs that changed."""
+    from llm_json_repair import repair_directory
+
+    start = time.perf_counter()
+    outputs = sorted(Path(txt_dir).glob("*.txt"))
+    todo = {}
+    for path in outputs:
+        key = manifest.digest(path)
+        if not (manifest.is_current("repair", path.stem, key) and path.with_suffix(".json").exists()):
+            todo[path] = key
+
+    failed = 0
+    for r in repair_directory(txt_dir, files=list(todo)) if todo else []:
+        path = Path(txt_dir) / r["file"]
+        status = "failed" if r["status"] == "failed" else "done"
+        failed += status == "failed"
+        if status == "failed":
+            print(f"❌ {r['file']}: {'; '.join(r['errors'])}")
+        manifest.record("repair", path.stem, todo[path], status,
+                        nodes=r["nodes"], relationships=r["relationships"])
+    manifest.save()
+    report("repair", len(todo) - failed, len(outputs) - len(todo), failed, time.perf_counter() - start)
+    return failed == 0
+
+
+def run_load(manifest, txt_dir):
+    """
+    Refreshes the alias candidates over every artifact and pushes only
+    documents whose canonicalised content changed since they were last
+    loaded. Only the reviewed alias table is applied; new candidates wait in
+    alias_candidates.json until they are reviewed.
+
+    Pushes are MERGEs, so nothing is ever removed from the graph: nodes and
+    relationships a changed document no longer contains, and everything from
+    a deleted document, stay until the graph is rebuilt from scratch (empty
+    the database, then run database_test.py). Such documents are reported.
+    """
+    import database_test
+    from canonicalize import (alias_path, apply_aliases, build_alias_table, candidates_path,
+                              endpoint_aliases, load_alias_table, save_alias_table)
+
+    start = time.perf_counter()
+    documents = {Path(name).stem: data for name, data in database_test.iter_documents(Path(txt_dir))}
+    table = load_alias_table(alias_path)
+    candidates = build_alias_table(documents.values(), table)
+    save_alias_table(candidates, candidates_path)
+    pending = sum(len(a) for a in candidates.values()) - sum(len(a) for a in table.values())
+    if pending:
+        print(f"{pending} new alias candidates in {candidates_path}; review them into {alias_path}")
+    endpoints = endpoint_aliases(table)
+
+    todo = {}
+    for stem, data in documents.items():
+        data = apply_aliases(data, table, endpoints)
+        key = stage_key(json.dumps(data, sort_keys=True, ensure_ascii=False))
+        if not manifest.is_current("load", stem, key):
+            todo[stem] = (key, data)
+    changed = [stem for stem in todo if manifest.data["stages"].get("load", {}).get(stem)]
+    deleted = [stem for stem in list(manifest.data["stages"].get("load", {})) if stem not in documents]
+    for stem in deleted:
+        manifest.forget("load", stem)
+    if changed or deleted:
+        print(f"⚠️ {len(changed)} changed and {len(deleted)} deleted documents keep their previous nodes "
+              f"and relationships in the graph; rebuild it from scratch to drop them.")
+
+    if todo:
+        pusher = database_test.Neo4jPusher(database_test.uri, database_test.user, database_test.password,
+                                           marker=database_test.ingest_marker)
+        try:
+            # Labels of unchanged documents keep edges into them label-scoped
+            for data in documents.values():
+                pusher.register_labels(apply_aliases(data, table, endpoints)["nodes"])
+            stats = pusher.push_batched([data for _, data in todo.values()])
+        finally:
+            pusher.close()
+        database_test.print_ingest_stats(stats)
+        for stem, (key, _) in todo.items():
+            manifest.record("load", stem, key, "done")
+    manifest.save()
+    report("load", len(todo), len(documents) - len(todo), 0, time.perf_counter() - start)
+    return True
+
+
+def run_abstracts(manifest, corpus_dir):
+    """
+    Rebuilds abstracts.csv when any corpus file was added, removed or changed.
+    Always covers the whole corpus: abstracts.csv feeds the shared embedding
+    store, clusters and projection, which one shard must not overwrite.
+    """
+    sys.path.insert(0, embedding_dir)
+    from examine_abstracts import extract_abstracts_to_csv
+
+    start = time.perf_counter()
+    csv_path = os.path.join(embedding_dir, "abstracts.csv")
+    files = skip_duplicates(sorted(f for f in os.listdir(corpus_dir) if f.lower().endswith(".xml")))
+    key = stage_key(*(f"{f}:{manifest.digest(os.path.join(corpus_dir, f))}" for f in files))
+    if manifest.is_current("abstracts", "corpus", key) and os.path.exists(csv_path):
+        report("abstracts", 0, len(files), 0, time.perf_counter() - start)
+        return True
+    extract_abstracts_to_csv(corpus_dir, csv_path)
+    manifest.record("abstracts", "corpus", key, "done", papers=len(files))
+    manifest.save()
+    report("abstracts", len(files), 0, 0, time.perf_counter() - start)
+    return True
+
+
+def run_embed(manifest):
+    """
+    Runs embedding.py when abstracts.csv, the script or a module it imports
+    changed. The embedding store inside it re-encodes only new or changed
+    abstracts.
+    """
+    start = time.perf_counter()
+    script = os.path.join(embedding_dir, "embedding.py")
+    modules = ["embedding_store.py", "cluster_selection.py", "projection.py"]
+    key = stage_key(manifest.digest(os.path.join(embedding_dir, "abstracts.csv")), manifest.digest(script),
+                    *(manifest.digest(os.path.join(embedding_dir, m)) for m in modules))
+    if manifest.is_current("embed", "corpus", key):
+        report("embed", 0, 1, 0, time.perf_counter() - start)
+        return True
+    result = subprocess.run([sys.executable, script], cwd=embedding_dir)
+    ok = result.returncode == 0
+    manifest.record("embed", "corpus", key, "done" if ok else "failed", returncode=result.returncode)
+    manifest.save()
+    report("embed", int(ok), 0, int(not ok), time.perf_counter() - start)
+    return ok
+
+
+def run_dedup(xml_dir, corpus_dir):
+    """Refreshes duplicates.json over both TEI folders (unchanged files are not parsed again)."""
+    from dedup import run_dedup as find_and_save
+
+    start = time.perf_counter()
+    groups = find_and_save([xml_dir, corpus_dir])
+    print(f"[dedup] {sum(len(g['duplicates']) for g in groups)} duplicate copies in {len(groups)} papers "
+          f"({time.perf_counter() - start:.1f}s)")
+    return True
+
+
+def run_branch(stages, steps):
+    """Runs the selected stages of one branch in order; a stage that raises stops the branch."""
+    for stage, step in steps:
+        if stage not in stages:
+            continue
+        try:
+            with metrics.stage(stage):
+                ok = step()
+            if not ok:
+                print(f"⚠️ {stage} had failures; later stages of this branch use what succeeded.")
+        except Exception as e:
+            print(f"❌ {stage} stopped: {e}")
+            return False
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Incremental, resumable Nasa_NLP pipeline.",
+        epilog="The load stage only adds and updates graph data: nodes and relationships that a changed "
+               "or deleted document no longer contains stay until the graph is rebuilt with database_test.py.")
+    parser.add_argument("--stages", default=",".join(PRE_STAGES + GRAPH_STAGES + EMBEDDING_STAGES),
+                        help="Comma-separated subset of: " + ", ".join(PRE_STAGES + GRAPH_STAGES + EMBEDDING_STAGES))
+    parser.add_argument("--xml-dir", help="GROBID XMLs sent to the LLM (default: xmls/, or the source of --files)")
+    parser.add_argument("--txt-dir", help="LLM outputs and repaired .json artifacts (default: txt/, or txt_mock/ with --mock)")
+    parser.add_argument("--corpus-dir", default=corpus_dir, help="GROBID XMLs whose abstracts are embedded")
+    parser.add_argument("--manifest", help="Stage manifest (default: pipeline_manifest.json, or pipeline_manifest.mock.json with --mock)")
+    parser.add_argument("--mock", action="store_true",
+                        help="Use the offline mock LLM backend; outputs go to txt_mock/ and the load stage is skipped")
+    parser.add_argument("--files", help="Sample or shard manifest; the extract stage only handles its files, "
+                                        "read from the manifest's source folder "
+                                        "(the embedding branch always covers the whole corpus)")
+    args = parser.parse_args(argv)
+
+    stages = set(args.stages.split(","))
+    unknown = stages - set(PRE_STAGES + GRAPH_STAGES + EMBEDDING_STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    if args.mock:
+        args.txt_dir = args.txt_dir or mock_txt_dir
+        args.manifest = args.manifest or mock_manifest_path
+        if "load" in stages:
+            # Mock graphs must never reach the real Neo4j instance
+            print("--mock: skipping the load stage.")
+            stages.discard("load")
+    args.txt_dir = args.txt_dir or txt_dir
+    args.manifest = args.manifest or manifest_path
+
+    source, only = load_file_list(args.files)
+    if source and args.xml_dir and os.path.realpath(args.xml_dir) != os.path.realpath(source):
+        parser.error(f"--files lists files from {source}, but --xml-dir is {args.xml_dir}")
+    args.xml_dir = args.xml_dir or source or xml_dir
+
+    manifest = Manifest(args.manifest)
+    graph = [
+        ("extract", lambda: run_extract(manifest, args.xml_dir, args.txt_dir, args.mock, only)),
+        ("repair", lambda: run_repair(manifest, args.txt_dir)),
+        ("load", lambda: run_load(manifest, args.txt_dir)),
+    ]
+    embedding = [
+        ("abstracts", lambda: run_abstracts(manifest, args.corpus_dir)),
+        ("embed", lambda: run_embed(manifest)),
+    ]
+
+    # The LLM/graph branch and the embedding branch share no inputs, so they run side by
+    # side; cProfile and tracemalloc are process-wide, so with either on they run in turn
+    start = time.perf_counter()
+    ok = run_branch(stages, [("dedup", lambda: run_dedup(args.xml_dir, args.corpus_dir))])
+    workers = 1 if metrics.enabled and (metrics.profile or metrics.memory) else 2
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        branches = [pool.submit(run_branch, stages, graph), pool.submit(run_branch, stages, embedding)]
+        ok = all([branch.result() for branch in branches]) and ok
+    manifest.save()
+    metrics.print_summary()
+    metrics.close()
+    print(f"\n{'✅' if ok else '❌'} Pipeline finished in {time.perf_counter() - start:.1f}s. Manifest: {args.manifest}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,30 @@
-import os, re, json
+import json
+import os
+
+from llm_json_repair import repair_directory
+from metrics import metrics
 
 txt_dir = "/home/ady/prjs/hh/Nasa_NLP/txt"
+# Kept outside txt/ so the loader never mistakes it for a graph artifact
+report_path = os.path.join(os.path.dirname(txt_dir), "repair_report.json")
 
-for f in os.listdir(txt_dir):
-    if not f.endswith(".txt"):
-        continue
-    path = os.path.join(txt_dir, f)
-    text = open(path).read()
+# Parse, repair and validate every txt/*.txt LLM output once, writing the
+# compact txt/*.json artifacts that database_test.py loads directly
+if __name__ == "__main__":
+    with metrics.stage("repair"):
+        reports = repair_directory(txt_dir, report_path=report_path)
 
-    # Fix common malformed pattern: {"label": {"label": ...
-    fixed_text = re.sub(
-        r'{"label":\s*{"label":',
-        '{"label":',
-        text
-    )
+    for report in reports:
+        f = report["file"]
+        if report["status"] == "ok":
+            print(f"{f} ✅ valid ({report['nodes']} nodes, {report['relationships']} relationships)")
+        elif report["status"] == "repaired":
+            print(f"{f} ✅ repaired successfully: {', '.join(report['fixes'] + report['errors'])}")
+        else:
+            print(f"{f} ❌ still invalid JSON: {'; '.join(report['errors'])}")
 
-    # Try validating
-    try:
-        json.loads(fixed_text)
-        with open(path, "w") as fw:
-            fw.write(fixed_text)
-        print(f"{f} ✅ repaired successfully.")
-    except json.JSONDecodeError as e:
-        print(f"{f} ❌ still invalid JSON: {e}")
+    failed = sum(1 for r in reports if r["status"] == "failed")
+    print(f"\n{len(reports) - failed}/{len(reports)} files valid. Report: {report_path}")
+    print(json.dumps({s: sum(1 for r in reports if r["status"] == s) for s in ("ok", "repaired", "failed")}))
+    metrics.print_summary()
+    metrics.close()
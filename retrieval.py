@@ -0,0 +1,546 @@
+import argparse
+import json
+import math
+import mmap
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from canonicalize import STOPWORDS, normalize_name
+from corpus_reader import iter_corpus, list_tei_files
+from extraction import estimate_tokens
+from graph_snapshot import GraphSnapshot, StringTable, snapshot_path
+from metrics import metrics
+
+project_root = Path(__file__).resolve().parent
+# The embedding store and vector search live in embedding/
+sys.path.insert(0, str(project_root / "embedding"))
+from embedding_store import make_encoder
+from search import SemanticSearch, parse_k
+
+# Same TEI folder examine_abstracts.py reads, so file names line up with abstracts.csv
+corpus_dir = project_root / "datas" / "grobid_output"
+index_path = project_root / "retrieval_index.bin"
+
+# BM25 parameters; title and abstract terms count extra (a simple BM25F)
+k1 = 1.2
+b = 0.75
+field_weights = {"title": 3, "abstract": 2, "sections": 1}
+
+# Candidates taken from each retriever, and the reciprocal-rank-fusion constant
+candidate_depth = 100
+rrf_k = 60
+keyword_weight = 1.0
+vector_weight = 1.0
+
+# Graph expansion: hits expanded, entities kept per hit, and entities whose walk
+# back to papers visits more than hub_limit nodes are not used to find related papers
+expand_hits = 5
+entities_per_hit = 8
+hub_limit = 500
+# Publication -> Methodology -> Experiment -> Result / Phenomenon / BiologicalEntity
+EXPANSION_STEPS = [["USES_METHOD"], ["APPLIED_IN"], ["YIELDS_RESULT", "OBSERVES_PHENOMENON", "INVOLVES_ENTITY"]]
+EXPANSION_LABELS = ["Result", "Phenomenon", "BiologicalEntity"]
+
+# Budget (estimated tokens) of the context handed to the LLM
+context_tokens = 3000
+snippet_chars = 1200
+
+MAGIC = b"NNLPBM25"
+ALIGN = 8
+
+TEXT_STOPWORDS = STOPWORDS | set(
+    "as at be been but by can could did do does had has have he her his however i if into is it its "
+    "may more most not no or our she such than that their them then there these they this those "
+    "thus using via was we were what when where which while who will within without would".split()
+)
+
+
+def tokenize(text):
+    """Lowercased word tokens without stopwords, with plurals singularised as in canonicalize."""
+    out = []
+    for word in re.findall(r"[^\W_]+", text.lower()):
+        if len(word) < 2 or word in TEXT_STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        out.append(word)
+    return out
+
+
+def record_terms(record):
+    """Field-weighted term counts of one PaperRecord."""
+    counts = Counter()
+    for field, text in (("title", record.title), ("abstract", record.abstract),
+                        ("sections", " ".join(t for _, t in record.sections))):
+        weight = field_weights[field]
+        for token in tokenize(text):
+            counts[token] += weight
+    return counts
+
+
+def record_snippet(record):
+    """Text kept for the LLM context: the abstract, or the start of the body without one."""
+    text = record.abstract or " ".join(t for _, t in record.sections)
+    return text[:snippet_chars]
+
+
+def build_arrays(doc_terms, vocab):
+    """
+    Forward and inverted index arrays from per-document term counts.
+
+    Args:
+        doc_terms (list): One (term ids int32 array, counts array) pair per document.
+        vocab (list): Sorted terms; ids index into it.
+
+    Returns:
+        dict: Named NumPy arrays (see RetrievalIndex).
+    """
+    lengths = np.array([len(t) for t, _ in doc_terms], dtype=np.int64)
+    doc_offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+    fwd_terms = np.concatenate([t for t, _ in doc_terms] or [np.zeros(0)]).astype(np.int32)
+    fwd_tf = np.minimum(np.concatenate([c for _, c in doc_terms] or [np.zeros(0)]), 65535).astype(np.uint16)
+    doc_ids = np.repeat(np.arange(len(doc_terms), dtype=np.int32), lengths)
+
+    # Postings are the forward entries regrouped by term (stable, so doc ids stay sorted)
+    order = np.argsort(fwd_terms, kind="stable")
+    df = np.bincount(fwd_terms, minlength=len(vocab))
+    return {
+        "doc_offsets": doc_offsets, "fwd_terms": fwd_terms, "fwd_tf": fwd_tf,
+        "term_offsets": np.concatenate([[0], np.cumsum(df)]).astype(np.int64),
+        "post_docs": doc_ids[order], "post_tf": fwd_tf[order],
+        "doc_len": np.bincount(doc_ids, weights=fwd_tf, minlength=len(doc_terms)).astype(np.float32),
+    }
+
+
+def write_index(path, docs, vocab, arrays, snippets):
+    """Writes the index as one file: a JSON header followed by 8-byte-aligned arrays."""
+    vocab_offsets, vocab_blob = StringTable.pack(vocab)
+    snippet_offsets, snippet_blob = StringTable.pack(snippets)
+    sections = dict(arrays)
+    sections["vocab_offsets"] = np.frombuffer(vocab_offsets.tobytes(), dtype=np.int64)
+    sections["vocab_blob"] = np.frombuffer(vocab_blob, dtype=np.uint8)
+    sections["snippet_offsets"] = np.frombuffer(snippet_offsets.tobytes(), dtype=np.int64)
+    sections["snippet_blob"] = np.frombuffer(snippet_blob, dtype=np.uint8)
+
+    toc = {}
+    offset = 0
+    for name, data in sections.items():
+        toc[name] = [offset, data.dtype.str, len(data)]
+        offset += data.nbytes + (-data.nbytes % ALIGN)
+    header = json.dumps({"docs": docs, "sections": toc}, ensure_ascii=False).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + 8 + len(header)) % ALIGN)
+
+    tmp = Path(str(path) + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + len(header).to_bytes(8, "little") + header)
+        for data in sections.values():
+            f.write(data.tobytes() + b"\0" * (-data.nbytes % ALIGN))
+    tmp.replace(path)
+
+
+class RetrievalIndex:
+    """
+    BM25 inverted index over TEI titles, abstracts and section text, memory
+    mapped from one file. Postings are term-sorted CSR arrays, the vocabulary
+    is a sorted string table searched with bisect, and a forward index (terms
+    per document) lets update() reuse unchanged papers without reparsing.
+    """
+
+    def __init__(self, path=index_path):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a retrieval index")
+        size = int.from_bytes(self.map[len(MAGIC):len(MAGIC) + 8], "little")
+        start = len(MAGIC) + 8
+        header = json.loads(bytes(self.map[start:start + size]))
+        self.docs = header["docs"]
+        self.arrays = {
+            name: np.frombuffer(self.map, dtype=np.dtype(dtype), count=count, offset=start + size + offset)
+            for name, (offset, dtype, count) in header["sections"].items()
+        }
+        self.vocab = StringTable(self.arrays["vocab_offsets"], self.arrays["vocab_blob"])
+        self.snippets = StringTable(self.arrays["snippet_offsets"], self.arrays["snippet_blob"])
+        self.row_of = {doc["file"]: i for i, doc in enumerate(self.docs)}
+
+        doc_len = self.arrays["doc_len"]
+        avgdl = float(doc_len.mean()) if len(doc_len) else 1.0
+        # Per-document part of the BM25 denominator, computed once
+        self.norm = (k1 * (1 - b + b * doc_len / max(avgdl, 1e-9))).astype(np.float32)
+
+    def __len__(self):
+        return len(self.docs)
+
+    def close(self):
+        self.arrays = self.vocab = self.snippets = self.norm = None
+        self.map.close()
+        self.file.close()
+
+    def snippet(self, i):
+        return self.snippets[i].decode("utf-8")
+
+    def doc_terms(self, i, remap=None):
+        """(term ids, counts) of one stored document, copied out of the mapping."""
+        offsets = self.arrays["doc_offsets"]
+        start, end = offsets[i], offsets[i + 1]
+        terms = self.arrays["fwd_terms"][start:end]
+        return (terms.copy() if remap is None else remap[terms]), self.arrays["fwd_tf"][start:end].astype(np.int64)
+
+    def search(self, text, k=candidate_depth):
+        """
+        Args:
+            text (str): Free-text query.
+            k (int): Number of results.
+
+        Returns:
+            tuple: (document rows, BM25 scores), best first.
+        """
+        scores = np.zeros(len(self.docs), dtype=np.float32)
+        term_offsets = self.arrays["term_offsets"]
+        n = len(self.docs)
+        for term in set(tokenize(text)):
+            t = self.vocab.find(term)
+            if t < 0:
+                continue
+            start, end = term_offsets[t], term_offsets[t + 1]
+            docs = self.arrays["post_docs"][start:end]
+            tf = self.arrays["post_tf"][start:end].astype(np.float32)
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tf * (k1 + 1) / (tf + self.norm[docs])
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return hits, scores[hits]
+
+
+def update_index(xml_directory=corpus_dir, path=index_path, processes=None):
+    """
+    Brings the index in line with the TEI files in a folder. Papers whose
+    size and modification time are unchanged keep their stored terms; only
+    new or changed files are parsed (through the shared corpus reader).
+
+    Returns:
+        dict: Counts of papers kept, parsed and removed.
+    """
+    files = list_tei_files(str(xml_directory))
+    stats = {Path(f).name: os.stat(f) for f in files}
+    old = RetrievalIndex(path) if Path(path).exists() else None
+
+    kept, changed = {}, []
+    for f in files:
+        name, st = Path(f).name, stats[Path(f).name]
+        row = old.row_of.get(name) if old else None
+        if row is not None and old.docs[row]["size"] == st.st_size and old.docs[row]["mtime_ns"] == st.st_mtime_ns:
+            kept[name] = row
+        else:
+            changed.append(f)
+
+    # Terms of new or changed papers, by string; kept papers stay as old term ids
+    parsed = {}
+    for record in iter_corpus(files=changed, processes=processes):
+        if record.error:
+            print(f"⚠️ Could not parse {record.file}: {record.error}")
+        parsed[record.file] = record
+
+    old_vocab = [old.vocab[i].decode("utf-8") for i in range(len(old.vocab))] if old else []
+    new_terms = set()
+    for record in parsed.values():
+        new_terms.update(record_terms(record))
+    vocab = sorted(set(old_vocab) | new_terms, key=lambda s: s.encode("utf-8"))
+    term_id = {t: i for i, t in enumerate(vocab)}
+    remap = np.array([term_id[t] for t in old_vocab], dtype=np.int32)
+
+    docs, doc_terms, snippets = [], [], []
+    for f in files:
+        name, st = Path(f).name, stats[Path(f).name]
+        if name in kept:
+            row = kept[name]
+            doc_terms.append(old.doc_terms(row, remap))
+            docs.append(old.docs[row])
+            snippets.append(old.snippet(row))
+            continue
+        record = parsed[name]
+        counts = record_terms(record)
+        doc_terms.append((np.array([term_id[t] for t in counts], dtype=np.int32),
+                          np.array(list(counts.values()), dtype=np.int64)))
+        docs.append({"file": name, "title": record.title, "size": st.st_size, "mtime_ns": st.st_mtime_ns})
+        snippets.append(record_snippet(record))
+    removed = sum(1 for doc in old.docs if doc["file"] not in stats) if old else 0
+    if old:
+        old.close()
+
+    # Drop terms no remaining paper uses, then renumber
+    used = np.zeros(len(vocab), dtype=bool)
+    for terms, _ in doc_terms:
+        used[terms] = True
+    renumber = np.cumsum(used) - 1
+    vocab = [t for t, u in zip(vocab, used) if u]
+    doc_terms = [(renumber[t].astype(np.int32), c) for t, c in doc_terms]
+
+    write_index(path, docs, vocab, build_arrays(doc_terms, vocab), snippets)
+    return {"papers": len(docs), "kept": len(kept), "parsed": len(changed), "removed": removed, "terms": len(vocab)}
+
+
+def load_semantic_search():
+    """SemanticSearch over the embedding store, or None when there is no store yet."""
+    try:
+        return SemanticSearch()
+    except FileNotFoundError as e:
+        print(f"⚠️ {e} Vector search is disabled.")
+        return None
+
+
+class HybridRetriever:
+    """
+    Keyword (BM25) and vector (abstract embedding) retrieval fused with
+    reciprocal rank fusion, with the top hits expanded through their
+    knowledge-graph neighbourhood and packed into an LLM context window.
+    """
+
+    def __init__(self, index=None, semantic=None, graph=None, encoder=None):
+        """
+        Args:
+            index (RetrievalIndex): Keyword index; opened from index_path if None.
+            semantic (SemanticSearch): Vector search; None disables it.
+            graph (GraphSnapshot): Graph used for expansion; None disables it.
+            encoder (callable): Query encoder; defaults to the search model.
+        """
+        self.index = index or RetrievalIndex()
+        self.semantic = semantic
+        self.graph = graph
+        self.encoder = encoder
+        self.encoder_lock = threading.Lock()
+        # Embedding store rows -> index rows, through the File column of abstracts.csv
+        self.row_of_vector = {}
+        if semantic is not None:
+            for row, paper_id in enumerate(semantic.ids):
+                doc = self.index.row_of.get(semantic.papers.get(paper_id, {}).get("File"))
+                if doc is not None:
+                    self.row_of_vector[row] = doc
+            if not self.row_of_vector:
+                print("⚠️ abstracts.csv has no File column matching the index; "
+                      "rerun examine_abstracts.py to enable vector retrieval.")
+        # Papers are linked to their Publication node by normalised title
+        self.publication_of = {}
+        self.row_of_publication = {}
+        if graph is not None:
+            titles = {normalize_name(doc["title"]): i for i, doc in enumerate(self.index.docs) if doc["title"]}
+            for pub in graph.filter("Publication"):
+                row = titles.get(normalize_name(pub))
+                if row is not None:
+                    self.publication_of.setdefault(row, pub)
+                    self.row_of_publication[pub] = row
+
+    def _vector_hits(self, text, depth):
+        if self.semantic is None:
+            return []
+        with self.encoder_lock:
+            if self.encoder is None:
+                self.encoder = make_encoder()
+        rows, _ = self.semantic.index.search(self.encoder([text]), depth)
+        return [self.row_of_vector[r] for r in rows[0] if r in self.row_of_vector]
+
+    def expand(self, row):
+        """Results, phenomena and biological entities reachable from a paper's Publication node."""
+        pub = self.publication_of.get(row)
+        if pub is None:
+            return []
+        found = self.graph.follow(pub, EXPANSION_STEPS, "out", EXPANSION_LABELS)
+        return [self.graph.node(node_id) for node_id in found[:entities_per_hit]]
+
+    def related(self, entities, exclude):
+        """Other papers sharing the expanded entities, most shared first."""
+        shared = Counter()
+        for entity in entities:
+            pubs = self.graph.follow(entity["id"], EXPANSION_STEPS[::-1], "in", ["Publication"], hub_limit)
+            if pubs is None:
+                continue
+            papers = {self.row_of_publication[p] for p in pubs if p in self.row_of_publication}
+            shared.update(papers - exclude)
+        return [row for row, _ in shared.most_common(expand_hits)]
+
+    def retrieve(self, text, k=10):
+        """
+        Args:
+            text (str): The user's question.
+            k (int): Papers to return.
+
+        Returns:
+            dict: {query, hits, related, context}; each hit has its file,
+            title, fused score, per-retriever ranks and graph entities.
+        """
+        with metrics.timer("retrieval.keyword"):
+            keyword_rows, _ = self.index.search(text, candidate_depth)
+        with metrics.timer("retrieval.vector"):
+            vector_rows = self._vector_hits(text, candidate_depth)
+
+        fused = Counter()
+        ranks = {}
+        for source, rows, weight in (("keyword", keyword_rows.tolist(), keyword_weight),
+                                     ("vector", vector_rows, vector_weight)):
+            for rank, row in enumerate(rows):
+                fused[row] += weight / (rrf_k + rank + 1)
+                ranks.setdefault(row, {})[source] = rank + 1
+
+        hits = []
+        for row, score in fused.most_common(k):
+            doc = self.index.docs[row]
+            hits.append({"file": doc["file"], "title": doc["title"], "score": score,
+                         "ranks": ranks[row], "snippet": self.index.snippet(row), "entities": []})
+
+        related = []
+        if self.graph is not None:
+            with metrics.timer("retrieval.graph"):
+                rows = [row for row, _ in fused.most_common(k)]
+                found = []
+                for hit, row in zip(hits[:expand_hits], rows):
+                    hit["entities"] = self.expand(row)
+                    found.extend(hit["entities"])
+                related = [{"file": self.index.docs[r]["file"], "title": self.index.docs[r]["title"]}
+                           for r in self.related(found, set(rows))]
+
+        metrics.count("retrieval.queries")
+        return {"query": text, "hits": hits, "related": related,
+                "context": build_context(text, hits, related)}
+
+
+def build_context(question, hits, related, budget=context_tokens):
+    """
+    Numbered source blocks (title, snippet, graph facts) for the LLM prompt,
+    best hit first, stopping before the estimated token budget is exceeded.
+    """
+    parts = [f"Question: {question}\n\nSources:"]
+    used = estimate_tokens(parts[0])
+    for n, hit in enumerate(hits, 1):
+        block = f"[{n}] {hit['title'] or hit['file']}\n{hit['snippet']}"
+        for label in EXPANSION_LABELS:
+            facts = [e["id"] + (f": {e['description']}" if e.get("description") else "")
+                     for e in hit["entities"] if e["label"] == label]
+            if facts:
+                block += f"\n{label}: " + "; ".join(facts)
+        cost = estimate_tokens(block)
+        if used + cost > budget:
+            break
+        parts.append(block)
+        used += cost
+    if related:
+        line = "Related papers: " + "; ".join(r["title"] or r["file"] for r in related)
+        if used + estimate_tokens(line) <= budget:
+            parts.append(line)
+    return "\n\n".join(parts)
+
+
+def synthetic_index(path, n_docs, n_terms=100000, doc_terms=300, seed=0):
+    """Writes an index of Zipf-distributed random documents, a stand-in for a large corpus."""
+    rng = np.random.default_rng(seed)
+    vocab = sorted((f"t{i}" for i in range(n_terms)), key=lambda s: s.encode("utf-8"))
+    docs, terms = [], []
+    for i in range(n_docs):
+        ids = np.minimum(rng.zipf(1.3, doc_terms), n_terms) - 1
+        unique, counts = np.unique(ids, return_counts=True)
+        terms.append((unique.astype(np.int32), counts))
+        docs.append({"file": f"paper_{i:06d}.xml", "title": f"Paper {i}", "size": 0, "mtime_ns": 0})
+    write_index(path, docs, vocab, build_arrays(terms, vocab), [""] * n_docs)
+
+
+def make_handler(retriever):
+    """HTTP handler for GET /retrieve?q=...&k=10 (used by the ChatBot)."""
+
+    class RetrievalHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            if url.path != "/retrieve" or "q" not in params:
+                return self._send(404, {"error": "use /retrieve?q=...&k=10"})
+            try:
+                k = parse_k(params)
+            except ValueError as e:
+                return self._send(400, {"error": str(e)})
+            self._send(200, retriever.retrieve(params["q"][0], k))
+
+        def _send(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return RetrievalHandler
+
+
+def open_retriever(use_vectors=True, use_graph=True):
+    graph = GraphSnapshot() if use_graph and snapshot_path.exists() else None
+    if use_graph and graph is None:
+        print(f"⚠️ No {snapshot_path.name}; run graph_snapshot.py build for graph expansion.")
+    return HybridRetriever(semantic=load_semantic_search() if use_vectors else None, graph=graph)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hybrid keyword + vector + graph retrieval for the ChatBot.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("build", help="create or incrementally update retrieval_index.bin")
+    p.add_argument("--xml-dir", default=str(corpus_dir))
+    p = sub.add_parser("query", help="print the fused hits and the LLM context for a question")
+    p.add_argument("text")
+    p.add_argument("-k", type=int, default=10)
+    p.add_argument("--no-vectors", action="store_true")
+    p = sub.add_parser("serve", help="serve /retrieve over HTTP")
+    p.add_argument("--port", type=int, default=8767)
+    p.add_argument("--no-vectors", action="store_true")
+    p = sub.add_parser("bench", help="keyword query latency")
+    p.add_argument("--synthetic", type=int, default=0,
+                   help="benchmark a synthetic index of this many papers instead of the real one")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        with metrics.stage("retrieval.index"):
+            counts = update_index(args.xml_dir)
+        print(f"✅ {index_path.name}: {counts} in {time.perf_counter() - start:.2f}s")
+    elif args.command == "query":
+        result = open_retriever(not args.no_vectors).retrieve(args.text, args.k)
+        for hit in result["hits"]:
+            print(f"{hit['score']:.4f}  {hit['ranks']}  {hit['file']}  {hit['title']}")
+        print("\n" + result["context"])
+    elif args.command == "serve":
+        server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(open_retriever(not args.no_vectors)))
+        print(f"Serving retrieval on http://127.0.0.1:{args.port}/retrieve?q=...")
+        server.serve_forever()
+    else:
+        path = index_path
+        if args.synthetic:
+            path = Path(str(index_path) + ".bench")
+            start = time.perf_counter()
+            synthetic_index(path, args.synthetic)
+            print(f"Built a {args.synthetic}-paper synthetic index in {time.perf_counter() - start:.1f}s")
+        start = time.perf_counter()
+        index = RetrievalIndex(path)
+        print(f"Opened {len(index)} papers in {(time.perf_counter() - start) * 1000:.1f} ms")
+        rng = np.random.default_rng(1)
+        terms = [index.vocab[i].decode("utf-8") for i in range(min(len(index.vocab), 2000))]
+        queries = [" ".join(rng.choice(terms, 5)) for _ in range(200)]
+        timings = []
+        for q in queries:
+            start = time.perf_counter()
+            index.search(q, candidate_depth)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        print(f"5-term BM25 queries: p50 {timings[100] * 1000:.2f} ms, p95 {timings[190] * 1000:.2f} ms, "
+              f"max {timings[-1] * 1000:.2f} ms")
+        index.close()
+        if args.synthetic:
+            path.unlink()
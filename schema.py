@@ -0,0 +1,26 @@
+import re
+from pathlib import Path
+
+prompt_path = Path(__file__).resolve().parent / "system_prompt.txt"
+
+
+def schema_labels(system_prompt_path=prompt_path):
+    """
+    Reads the node labels (Publication, Objective, Experiment, ...) declared in
+    the extraction schema of system_prompt.txt, in declaration order.
+    """
+    with open(system_prompt_path, "r") as f:
+        text = f.read()
+    labels = re.findall(r"label:\s*[‘'\"]([A-Za-z_][A-Za-z0-9_]*)[’'\"]", text)
+    return list(dict.fromkeys(labels))
+
+
+def schema_relationship_types(system_prompt_path=prompt_path):
+    """
+    Reads the relationship types declared as `fromId|TYPE|toId` lines in
+    system_prompt.txt (HAS_OBJECTIVE, USES_METHOD, ...), in declaration order.
+    """
+    with open(system_prompt_path, "r") as f:
+        text = f.read()
+    types = re.findall(r"^\s*\w+\|([A-Z_]+)\|\w+\s*$", text, flags=re.MULTILINE)
+    return list(dict.fromkeys(types))
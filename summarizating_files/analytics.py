@@ -0,0 +1,440 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from array import array
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+# The shared corpus reader and graph helpers live in the project root
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.normpath(os.path.join(script_dir, '..'))
+sys.path.insert(0, project_root)
+from canonicalize import apply_aliases, endpoint_aliases, load_alias_table, normalize_name
+from corpus_reader import iter_corpus, list_tei_files
+from database_test import document_files, txt_dir
+from graph_api import load_cluster_titles
+from metrics import metrics
+
+grobid_path = os.path.join(project_root, 'datas', 'grobid_output')
+state_path = os.path.join(script_dir, 'analytics_state.npz')
+# Written next to cluster_projection.json so the dashboard can fetch it
+output_path = os.path.join(project_root, 'NASA_NLP_Frontend-main', 'public', 'analytics.json')
+
+# Knowledge-graph entities counted alongside the TEI keywords
+ENTITY_LABELS = ['BiologicalEntity', 'Phenomenon', 'Methodology', 'Technology', 'Measurement']
+
+# Terms in fewer papers are left out of the co-occurrence matrix; pairs in fewer
+# papers are left out of the PMI ranking (PMI is noisy for rare pairs)
+min_term_count = 3
+min_pair_count = 3
+top_n = 50
+
+
+def keyword_term(keyword):
+    """Keyword terms use summarize.py's spelling (lowercase, spaces as underscores)."""
+    return 'keyword:' + keyword.lower().replace(' ', '_')
+
+
+class RowStore:
+    """
+    Term-id rows keyed by source file, kept as CSR arrays (array('q') row
+    offsets, array('i') term ids) with each file's size and mtime so only
+    new or changed files are read again.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.info = []
+        self.indptr = array('q', [0])
+        self.indices = array('i')
+
+    def __len__(self):
+        return len(self.keys)
+
+    def row(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def append(self, key, info, term_ids):
+        self.keys.append(key)
+        self.info.append(info)
+        self.indices.extend(sorted(set(term_ids)))
+        self.indptr.append(len(self.indices))
+
+    def sync(self, paths, read):
+        """
+        Re-reads new or changed files and drops deleted ones.
+
+        Args:
+            paths (list): Source files that should be in the store.
+            read (callable): list of changed paths -> iterable of (path, info, term ids).
+
+        Returns:
+            tuple: (rows kept, rows read, rows removed)
+        """
+        stats = {str(p): os.stat(p) for p in paths}
+        old = {key: i for i, key in enumerate(self.keys)}
+        kept, changed = [], []
+        for p, st in stats.items():
+            i = old.get(p)
+            if i is not None and self.info[i]['size'] == st.st_size and self.info[i]['mtime_ns'] == st.st_mtime_ns:
+                kept.append(i)
+            else:
+                changed.append(p)
+
+        previous = self.keys, self.info, self.indptr, self.indices
+        self.__init__()
+        for i in kept:
+            start, end = previous[2][i], previous[2][i + 1]
+            self.keys.append(previous[0][i])
+            self.info.append(previous[1][i])
+            self.indices.extend(previous[3][start:end])
+            self.indptr.append(len(self.indices))
+        for p, info, term_ids in read(changed):
+            info.update(size=stats[p].st_size, mtime_ns=stats[p].st_mtime_ns)
+            self.append(p, info, term_ids)
+        return len(kept), len(changed), sum(1 for key in previous[0] if key not in stats)
+
+    def matrix(self, n_terms):
+        """Binary (rows x terms) scipy CSR matrix; one pass, no per-cell Python work."""
+        indices = np.frombuffer(self.indices, dtype=np.int32) if self.indices else np.zeros(0, np.int32)
+        indptr = np.frombuffer(self.indptr, dtype=np.int64)
+        return sparse.csr_matrix((np.ones(len(indices), dtype=np.float32), indices, indptr),
+                                 shape=(len(self.keys), n_terms))
+
+    def to_arrays(self, prefix):
+        return {f'{prefix}_indptr': np.frombuffer(self.indptr, dtype=np.int64),
+                f'{prefix}_indices': np.frombuffer(self.indices, dtype=np.int32)}
+
+    @classmethod
+    def from_arrays(cls, keys, info, indptr, indices):
+        store = cls()
+        store.keys, store.info = keys, info
+        store.indptr = array('q', indptr.tobytes())
+        store.indices = array('i', indices.tobytes())
+        return store
+
+
+class CooccurrenceEngine:
+    """
+    Keyword and entity analytics over the corpus. Every keyword and graph
+    entity is interned to an integer id; papers (TEI keywords) and graph
+    documents (txt/*.json entities) are kept as sparse rows, joined by
+    normalised title, and all aggregates are sparse/dense matrix products.
+    """
+
+    def __init__(self):
+        self.terms = []
+        self.term_id = {}
+        self.papers = RowStore()
+        self.graphs = RowStore()
+        # Hash of the alias table the graph rows were read with
+        self.alias_digest = None
+
+    def intern(self, term):
+        i = self.term_id.get(term)
+        if i is None:
+            i = self.term_id[term] = len(self.terms)
+            self.terms.append(term)
+        return i
+
+    # --- Building and incremental updates ---
+
+    def _read_papers(self, paths):
+        path_of = {os.path.basename(p): p for p in paths}
+        for record in iter_corpus(files=paths):
+            if record.error:
+                print(f"Warning: '{record.file}' is not a well-formed XML file or is corrupted.")
+            info = {'title': normalize_name(record.title), 'year': record.year}
+            yield path_of[record.file], info, [self.intern(keyword_term(k)) for k in record.keywords]
+
+    def _read_graphs(self, paths, table):
+        endpoints = endpoint_aliases(table or {})
+        for p in paths:
+            try:
+                data = json.loads(Path(p).read_text(encoding='utf-8') or '{}')
+            except json.JSONDecodeError as e:
+                print(f"⚠️ Invalid JSON in {Path(p).name}: {e}")
+                data = {}
+            if table:
+                data = apply_aliases(data, table, endpoints)
+            title = ''
+            term_ids = []
+            for node in data.get('nodes', []):
+                if node.get('label') == 'Publication':
+                    title = normalize_name(node.get('id', ''))
+                elif node.get('label') in ENTITY_LABELS and node.get('id'):
+                    term_ids.append(self.intern(f"{node['label']}:{node['id']}"))
+            yield p, {'title': title}, term_ids
+
+    def update(self, xml_directory=grobid_path, graph_directory=txt_dir, alias_table=None):
+        """
+        Brings both row stores in line with the TEI and graph folders; only
+        new or changed files are parsed.
+
+        Returns:
+            dict: (kept, read, removed) per store.
+        """
+        paths = list_tei_files(xml_directory) if os.path.isdir(xml_directory) else []
+        # A different alias table renames entities, so every graph row is read again
+        digest = hashlib.sha1(json.dumps(alias_table or {}, sort_keys=True).encode('utf-8')).hexdigest()
+        if digest != self.alias_digest:
+            self.graphs = RowStore()
+            self.alias_digest = digest
+        # Same file choice as database_test.iter_documents: the repaired .json artifact, else the raw .txt
+        graph_directory = Path(graph_directory)
+        graph_files = document_files(graph_directory) if graph_directory.is_dir() else []
+        return {
+            'papers': self.papers.sync(paths, self._read_papers),
+            'graphs': self.graphs.sync(graph_files, lambda changed: self._read_graphs(changed, alias_table)),
+        }
+
+    def save(self, path=state_path):
+        meta = {'terms': self.terms, 'alias_digest': self.alias_digest,
+                'papers': {'keys': self.papers.keys, 'info': self.papers.info},
+                'graphs': {'keys': [str(k) for k in self.graphs.keys], 'info': self.graphs.info}}
+        tmp = path + '.tmp.npz'
+        np.savez(tmp, meta=np.array(json.dumps(meta)),
+                 **self.papers.to_arrays('papers'), **self.graphs.to_arrays('graphs'))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=state_path):
+        engine = cls()
+        if not os.path.exists(path):
+            return engine
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            engine.terms = meta['terms']
+            engine.alias_digest = meta['alias_digest']
+            engine.term_id = {t: i for i, t in enumerate(engine.terms)}
+            for name in ('papers', 'graphs'):
+                setattr(engine, name, RowStore.from_arrays(meta[name]['keys'], meta[name]['info'],
+                                                           data[f'{name}_indptr'], data[f'{name}_indices']))
+        return engine
+
+    # --- Aggregates ---
+
+    def matrix(self):
+        """
+        Binary paper x term CSR matrix: each paper's keywords plus the entities
+        of the graph documents whose Publication title matches its title.
+        """
+        n_terms = len(self.terms)
+        keywords = self.papers.matrix(n_terms)
+        row_of_title = {info['title']: i for i, info in enumerate(self.papers.info) if info['title']}
+        pairs = [(row_of_title[info['title']], j) for j, info in enumerate(self.graphs.info)
+                 if info['title'] in row_of_title]
+        if not pairs:
+            return keywords
+        rows, cols = np.array(pairs).T
+        link = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)),
+                                 shape=(len(self.papers), len(self.graphs)))
+        matrix = keywords + link @ self.graphs.matrix(n_terms)
+        matrix.data[:] = 1.0
+        return matrix
+
+    def analyze(self, clusters=None, matrix=None):
+        """
+        Dashboard aggregates: top terms, co-occurring pairs by count and by
+        PMI, distinctive terms per cluster and per-year trends.
+
+        Args:
+            clusters (dict): {cluster id: [paper titles]} (see load_cluster_titles).
+            matrix (csr_matrix): Paper x term matrix; built from the stores if None.
+
+        Returns:
+            dict: JSON-serialisable aggregates.
+        """
+        X = self.matrix() if matrix is None else matrix
+        n_papers = X.shape[0]
+        df = np.asarray(X.sum(axis=0)).ravel()
+        terms = np.array(self.terms + [''] * (X.shape[1] - len(self.terms)), dtype=object)
+
+        def term_entry(t, **fields):
+            kind, _, name = terms[t].partition(':')
+            return {'term': name, 'kind': kind, 'papers': int(df[t]), **fields}
+
+        order = np.argsort(-df, kind='stable')[:top_n]
+        result = {'papers': int(n_papers), 'terms': int((df > 0).sum()),
+                  'top_terms': [term_entry(t) for t in order if df[t] > 0]}
+
+        # Co-occurrence over the terms frequent enough to matter
+        with metrics.timer('analytics.cooccurrence'):
+            frequent = np.flatnonzero(df >= min_term_count)
+            Xf = X[:, frequent].tocsc().astype(np.int32)
+            C = sparse.triu(Xf.T @ Xf, k=1).tocoo()
+            a, b, counts = frequent[C.row], frequent[C.col], C.data.astype(np.float64)
+            pmi = np.log(counts * n_papers / (df[a] * df[b]))
+            npmi = np.where(counts < n_papers, pmi / -np.log(counts / n_papers), 1.0)
+
+        def pair_entries(index):
+            return [{'a': term_entry(a[i])['term'], 'a_kind': term_entry(a[i])['kind'],
+                     'b': term_entry(b[i])['term'], 'b_kind': term_entry(b[i])['kind'],
+                     'papers': int(counts[i]), 'pmi': round(float(pmi[i]), 4), 'npmi': round(float(npmi[i]), 4)}
+                    for i in index]
+
+        result['pairs_by_count'] = pair_entries(np.argsort(-counts, kind='stable')[:top_n])
+        strong = np.flatnonzero(counts >= min_pair_count)
+        result['pairs_by_pmi'] = pair_entries(strong[np.argsort(-npmi[strong], kind='stable')[:top_n]])
+
+        # Per-cluster counts: (clusters x papers) one-hot matrix times X
+        if clusters:
+            cluster_of = {}
+            for cluster, titles in clusters.items():
+                for title in titles:
+                    cluster_of[normalize_name(title)] = cluster
+            labels = sorted(clusters)
+            members = [(labels.index(cluster_of[info['title']]), i)
+                       for i, info in enumerate(self.papers.info) if info['title'] in cluster_of]
+            result['clusters'] = self._group_table(X, labels, members, df, term_entry)
+
+        # Per-year shares and least-squares trend slope of every frequent term
+        years = [(info['year'], i) for i, info in enumerate(self.papers.info) if info.get('year')]
+        if years:
+            year_labels = sorted({y for y, _ in years})
+            G = self._one_hot(len(year_labels), [(year_labels.index(y), i) for y, i in years], n_papers)
+            per_year = np.asarray((G @ X[:, frequent]).todense())
+            sizes = np.asarray(G.sum(axis=1)).ravel()
+            share = per_year / np.maximum(sizes, 1)[:, None]
+            result['years'] = {str(y): int(n) for y, n in zip(year_labels, sizes)}
+            if len(year_labels) > 1:
+                x = np.array(year_labels, dtype=np.float64)
+                x -= x.mean()
+                slope = (x @ (share - share.mean(axis=0))) / (x @ x)
+                rising = np.argsort(-slope, kind='stable')[:top_n]
+                falling = np.argsort(slope, kind='stable')[:top_n]
+                result['rising'] = [term_entry(frequent[t], slope=round(float(slope[t]), 6)) for t in rising if slope[t] > 0]
+                result['falling'] = [term_entry(frequent[t], slope=round(float(slope[t]), 6)) for t in falling if slope[t] < 0]
+            top = [np.searchsorted(frequent, t) for t in order[:20] if df[t] >= min_term_count]
+            result['trends'] = {terms[frequent[t]]: [int(v) for v in per_year[:, t]] for t in top}
+        return result
+
+    @staticmethod
+    def _one_hot(n_groups, members, n_papers):
+        rows, cols = (np.array(members).T if members else (np.zeros(0, int), np.zeros(0, int)))
+        return sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(n_groups, n_papers))
+
+    def _group_table(self, X, labels, members, df, term_entry):
+        """Most distinctive terms per group, ranked by lift over the corpus rate."""
+        G = self._one_hot(len(labels), members, X.shape[0])
+        counts = (G @ X).tocsr()
+        sizes = np.asarray(G.sum(axis=1)).ravel()
+        n_papers = X.shape[0]
+        table = {}
+        for g, label in enumerate(labels):
+            row = counts.getrow(g)
+            t, c = row.indices, row.data
+            keep = c >= min(min_pair_count, max(sizes[g], 1))
+            t, c = t[keep], c[keep]
+            lift = (c / max(sizes[g], 1)) / (df[t] / n_papers)
+            best = np.lexsort((-c, -lift))[:top_n // 2]
+            table[str(label)] = {'papers': int(sizes[g]),
+                                 'terms': [term_entry(t[i], count=int(c[i]), lift=round(float(lift[i]), 3))
+                                           for i in best]}
+        return table
+
+    def related(self, term, k=20, matrix=None):
+        """Terms co-occurring with one term, by normalised PMI."""
+        X = self.matrix() if matrix is None else matrix
+        t = self.term_id.get(term)
+        if t is None:
+            return []
+        df = np.asarray(X.sum(axis=0)).ravel()
+        counts = np.asarray((X[:, [t]].T @ X).todense()).ravel()
+        counts[t] = 0
+        n = X.shape[0]
+        candidates = np.flatnonzero(counts >= min(min_pair_count, df[t]))
+        pmi = np.log(counts[candidates] * n / (df[t] * df[candidates]))
+        npmi = pmi / np.maximum(-np.log(counts[candidates] / n), 1e-9)
+        best = np.argsort(-npmi, kind='stable')[:k]
+        return [(self.terms[candidates[i]], int(counts[candidates[i]]), round(float(npmi[i]), 4)) for i in best]
+
+
+def synthetic_engine(n_papers, n_keywords=20000, n_entities=50000, seed=0):
+    """
+    Engine filled with Zipf-distributed keywords (~6 per paper) and graph
+    entities (~30 per paper), years and 20 clusters; a stand-in for a large corpus.
+    """
+    rng = np.random.default_rng(seed)
+    engine = CooccurrenceEngine()
+    engine.terms = [f'keyword:k{i}' for i in range(n_keywords)] + \
+                   [f'{ENTITY_LABELS[i % len(ENTITY_LABELS)]}:e{i}' for i in range(n_entities)]
+    engine.term_id = {t: i for i, t in enumerate(engine.terms)}
+    clusters = {c: [] for c in range(20)}
+    for i in range(n_papers):
+        title = f'paper {i}'
+        keywords = np.minimum(rng.zipf(1.6, 6), n_keywords) - 1
+        entities = n_keywords + np.minimum(rng.zipf(1.4, 30), n_entities) - 1
+        engine.papers.append(f'p{i}', {'title': title, 'year': int(rng.integers(2000, 2025))}, keywords.tolist())
+        engine.graphs.append(f'g{i}', {'title': title}, entities.tolist())
+        clusters[int(rng.integers(0, 20))].append(title)
+    return engine, clusters
+
+
+def naive_pair_counts(engine, matrix, limit):
+    """Dict-of-dicts co-occurrence counting over the first `limit` papers (for comparison)."""
+    counts = {}
+    for i in range(min(limit, matrix.shape[0])):
+        row = matrix.indices[matrix.indptr[i]:matrix.indptr[i + 1]].tolist()
+        for a in row:
+            inner = counts.setdefault(a, {})
+            for b in row:
+                if a < b:
+                    inner[b] = inner.get(b, 0) + 1
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Keyword and entity co-occurrence analytics.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('build', help="update the state from new papers and write the dashboard JSON")
+    p.add_argument('--xml-dir', default=grobid_path)
+    p.add_argument('--txt-dir', default=str(txt_dir))
+    p.add_argument('--out', default=output_path)
+    p = sub.add_parser('related', help="terms co-occurring with one term, e.g. keyword:microgravity")
+    p.add_argument('term')
+    p.add_argument('-k', type=int, default=20)
+    p = sub.add_parser('bench', help="time the aggregates on a synthetic corpus")
+    p.add_argument('--synthetic', type=int, default=100000)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        engine = CooccurrenceEngine.load()
+        with metrics.stage('analytics.update'):
+            changes = engine.update(args.xml_dir, args.txt_dir, load_alias_table())
+        engine.save()
+        print(f"Papers (kept, read, removed): {changes['papers']}; graph files: {changes['graphs']}")
+        with metrics.stage('analytics.aggregate'):
+            result = engine.analyze(load_cluster_titles())
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False)
+        print(f"✅ {result['papers']} papers, {result['terms']} terms -> {args.out} "
+              f"in {time.perf_counter() - start:.2f}s")
+        metrics.print_summary()
+        metrics.close()
+    elif args.command == 'related':
+        for term, count, npmi in CooccurrenceEngine.load().related(args.term, args.k):
+            print(f"{npmi:>8.4f} {count:>6}  {term}")
+    else:
+        start = time.perf_counter()
+        engine, clusters = synthetic_engine(args.synthetic)
+        print(f"Generated {args.synthetic} synthetic papers in {time.perf_counter() - start:.1f}s")
+        start = time.perf_counter()
+        X = engine.matrix()
+        print(f"Matrix {X.shape[0]} x {X.shape[1]}, {X.nnz} entries in {time.perf_counter() - start:.2f}s")
+        start = time.perf_counter()
+        result = engine.analyze(clusters, X)
+        print(f"Aggregates (pairs, PMI, {len(result['clusters'])} clusters, {len(result['years'])} years) "
+              f"in {time.perf_counter() - start:.2f}s")
+        limit = min(args.synthetic, 10000)
+        start = time.perf_counter()
+        naive_pair_counts(engine, X, limit)
+        naive = time.perf_counter() - start
+        print(f"Dict-of-dicts pair counting: {naive:.2f}s for {limit} papers "
+              f"(~{naive * X.shape[0] / limit:.0f}s for all)")
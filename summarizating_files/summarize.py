@@ -1,7 +1,11 @@
 import os
-import xml.etree.ElementTree as ET
+import sys
 import csv  # CSV modülünü içe aktarıyoruz
 
+# The shared corpus reader lives in the project root
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+from corpus_reader import iter_corpus
+
 def count_keywords():
     """
     Scans all .xml files in the grobid_output directory,
@@ -9,8 +13,6 @@ def count_keywords():
     returns the results as a dictionary.
     """
     keyword_counts = {}
-    # Define the namespace used in the XML files
-    namespace = {'tei': 'http://www.tei-c.org/ns/1.0'}
 
     # Define the path to grobid_output folder
     grobid_path = os.path.join('..', 'datas/grobid_output')
@@ -20,39 +22,19 @@ def count_keywords():
         print(f"Error: Directory '{grobid_path}' not found.")
         return keyword_counts
 
-    # List all files in the grobid_output directory
-    for file_name in os.listdir(grobid_path):
-        # Process only files with the .xml extension
-        if file_name.endswith('.xml'):
-            try:
-                # Parse the XML file with full path
-                full_path = os.path.join(grobid_path, file_name)
-                tree = ET.parse(full_path)
-                root = tree.getroot()
+    # Stream every .xml file in the grobid_output directory through the shared corpus reader
+    for record in iter_corpus(grobid_path):
+        if record.error:
+            print(f"Warning: '{record.file}' is not a well-formed XML file or is corrupted.")
+            continue
 
-                # Find the 'keywords' element using its namespace
-                keywords_element = root.find('.//tei:keywords', namespace)
+        # Get each keyword, convert it to lowercase, and replace spaces with underscores.
+        # A temporary set counts a keyword only once per file.
+        keywords_in_file = {term.lower().replace(' ', '_') for term in record.keywords}
 
-                # Proceed only if the <keywords> tag was found
-                if keywords_element is not None:
-                    # Use a temporary set to store keywords found in this file
-                    keywords_in_file = set()
-                    
-                    # Find all <term> tags within the <keywords> element
-                    for term_element in keywords_element.findall('tei:term', namespace):
-                        if term_element.text:
-                            # Get the keyword, convert it to lowercase, and replace spaces with underscores
-                            keyword = term_element.text.strip().lower().replace(' ', '_')
-                            keywords_in_file.add(keyword)
-                    
-                    # Increment the main counter for each unique keyword found
-                    for keyword in keywords_in_file:
-                        keyword_counts[keyword] = keyword_counts.get(keyword, 0) + 1
-            
-            except ET.ParseError:
-                print(f"Warning: '{file_name}' is not a well-formed XML file or is corrupted.")
-            except Exception as e:
-                print(f"An error occurred while processing '{file_name}': {e}")
+        # Increment the main counter for each unique keyword found
+        for keyword in keywords_in_file:
+            keyword_counts[keyword] = keyword_counts.get(keyword, 0) + 1
 
     return keyword_counts
 
@@ -0,0 +1,108 @@
+import os
+import sys
+
+from corpus_reader import iter_corpus, parse_tei
+from extraction import estimate_tokens
+
+# Body sections worth sending, matched against the section heading in this order
+section_priority = ['abstract', 'introduction', 'background', 'method', 'material',
+                    'experiment', 'result', 'discussion', 'conclusion', 'summary']
+
+# Approximate input tokens allowed per paper (front matter is always kept)
+default_token_budget = 6000
+
+
+def select_sections(sections, priority=section_priority):
+    """
+    Orders body sections by the first priority word found in their heading.
+    Sections without a matching heading keep document order after the
+    prioritised ones.
+    """
+    def rank(item):
+        index, (head, _) = item
+        head = head.lower()
+        for position, word in enumerate(priority):
+            if word in head:
+                return (position, index)
+        return (len(priority), index)
+
+    return [section for _, section in sorted(enumerate(sections), key=rank)]
+
+
+def build_prompt(record, token_budget=default_token_budget):
+    """
+    Renders the parts of a PaperRecord the extraction prompt needs (title,
+    DOI, keywords, affiliations, funding/acknowledgement, abstract, body
+    sections) as plain text for the LLM. Coordinates, figures and the
+    bibliography never make it into the record. Front matter is always
+    included; body sections are added in priority order until the token
+    budget is spent, the last one truncated to fit.
+    """
+    lines = [f"Title: {record.title}"]
+    if record.doi:
+        lines.append(f"DOI: {record.doi}")
+    if record.keywords:
+        lines.append(f"Keywords: {', '.join(record.keywords)}")
+    if record.affiliations:
+        lines.append(f"Affiliations: {'; '.join(record.affiliations)}")
+    if record.funding:
+        lines.append(f"Funding: {'; '.join(record.funding)}")
+    if record.acknowledgement:
+        lines.append(f"Acknowledgement: {record.acknowledgement}")
+    lines.append(f"Abstract: {record.abstract}")
+
+    prompt = "\n".join(lines)
+    remaining = token_budget - estimate_tokens(prompt)
+    for head, text in select_sections(record.sections):
+        if remaining <= 0:
+            break
+        block = f"\n\n## {head or 'Section'}\n{text}"
+        if estimate_tokens(block) > remaining:
+            block = block[:remaining * 4]
+        prompt += block
+        remaining -= estimate_tokens(block)
+    return prompt
+
+
+def build_prompt_from_record(record, token_budget=default_token_budget):
+    """
+    Builds the reduced LLM input for one parsed TEI file.
+
+    Returns:
+        tuple: (prompt text, {"raw_tokens", "prompt_tokens", "reduction"})
+    """
+    prompt = build_prompt(record, token_budget)
+
+    raw_tokens = max(1, record.size // 4)
+    prompt_tokens = estimate_tokens(prompt)
+    return prompt, {
+        'raw_tokens': raw_tokens,
+        'prompt_tokens': prompt_tokens,
+        'reduction': 1 - prompt_tokens / raw_tokens,
+    }
+
+
+def build_prompt_from_xml(xml_file_path, token_budget=default_token_budget):
+    """Parses one TEI file and builds its reduced LLM input (see build_prompt_from_record)."""
+    record = parse_tei(xml_file_path)
+    if record.error:
+        raise ValueError(record.error)
+    return build_prompt_from_record(record, token_budget)
+
+
+# --- Report the token reduction for a folder of TEI files ---
+if __name__ == '__main__':
+    xml_folder = sys.argv[1] if len(sys.argv) > 1 else os.path.join('datas', 'grobid_output')
+    total_raw = total_prompt = 0
+    for record in iter_corpus(xml_folder):
+        filename = record.file
+        if record.error:
+            print(f"Error: Could not parse {filename}. It might be a malformed XML file.")
+            continue
+        _, stats = build_prompt_from_record(record)
+        total_raw += stats['raw_tokens']
+        total_prompt += stats['prompt_tokens']
+        print(f"{filename}: {stats['raw_tokens']} -> {stats['prompt_tokens']} tokens "
+              f"({stats['reduction']:.0%} less)")
+    if total_raw:
+        print(f"\nTotal: {total_raw} -> {total_prompt} tokens ({1 - total_prompt / total_raw:.0%} less)")
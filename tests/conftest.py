@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The modules under test are flat scripts in the project root, embedding/ and benchmarks/
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ("", "embedding", "benchmarks", "filtering_files"):
+    path = os.path.join(project_root, folder)
+    if path not in sys.path:
+        sys.path.insert(0, path)
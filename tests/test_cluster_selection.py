@@ -0,0 +1,22 @@
+import math
+
+import numpy as np
+
+from cluster_selection import sampled_silhouette
+
+
+def test_sample_with_a_single_label_is_nan():
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(1000, 4))
+    labels = np.zeros(1000, dtype=int)
+    labels[0] = 1  # the second label is almost never drawn into a 20-row sample
+    assert math.isnan(sampled_silhouette(embeddings, labels, sample_size=20))
+
+
+def test_sampled_score_is_deterministic():
+    rng = np.random.default_rng(0)
+    embeddings = np.vstack([rng.normal(0, 1, (300, 4)), rng.normal(8, 1, (300, 4))])
+    labels = np.repeat([0, 1], 300)
+    first = sampled_silhouette(embeddings, labels, sample_size=100, seed=3)
+    assert first == sampled_silhouette(embeddings, labels, sample_size=100, seed=3)
+    assert first > 0.5
@@ -0,0 +1,119 @@
+import database_test
+from database_test import Neo4jPusher
+from stub_neo4j import StubDriver
+
+
+def make_pusher(labels=()):
+    driver = StubDriver(keep_statements=True)
+    pusher = Neo4jPusher(None, None, None, driver=driver, schema_path=None)
+    pusher.ensure_constraints(labels)
+    return pusher, driver
+
+
+def unwind_statements(driver):
+    return [(q, p["rows"]) for q, p in driver.statements if q.startswith("UNWIND")]
+
+
+DOCUMENTS = [
+    {
+        "nodes": [
+            {"label": "Publication", "id": "paperA", "summary": "first"},
+            {"label": "Methodology", "id": "rnaSeq"},
+        ],
+        "relationships": [{"from": "paperA", "type": "USES_METHOD", "to": "rnaSeq"}],
+    },
+    {
+        "nodes": [
+            {"label": "Publication", "id": "paperA", "DOI": "10.1000/x1"},
+            {"label": "Publication", "id": "paperB"},
+            {"label": "Methodology", "id": "rnaSeq"},
+        ],
+        "relationships": [
+            {"from": "paperA", "type": "USES_METHOD", "to": "rnaSeq"},
+            {"from": "paperB", "type": "USES_METHOD", "to": "rnaSeq"},
+        ],
+    },
+]
+
+
+def test_group_rows_merges_nodes_and_drops_duplicate_edges():
+    pusher, _ = make_pusher()
+    nodes, relationships = pusher.group_rows(DOCUMENTS)
+
+    publications = {row["id"]: row["props"] for row in nodes["Publication"]}
+    assert publications == {"paperA": {"summary": "first", "DOI": "10.1000/x1"}, "paperB": {}}
+    assert [row["id"] for row in nodes["Methodology"]] == ["rnaSeq"]
+    assert relationships == {
+        ("Publication", "USES_METHOD", "Methodology"): [
+            {"from": "paperA", "to": "rnaSeq"},
+            {"from": "paperB", "to": "rnaSeq"},
+        ]
+    }
+
+
+def test_push_batched_sends_label_scoped_unwind_batches():
+    pusher, driver = make_pusher()
+    stats = pusher.push_batched(DOCUMENTS, batch_size=1)
+
+    statements = unwind_statements(driver)
+    node_merges = [(q, rows) for q, rows in statements if "MERGE (n:" in q]
+    rel_merges = [(q, rows) for q, rows in statements if "MATCH" in q]
+    # Nodes go first, so every edge MATCH can find both endpoints
+    assert statements.index(rel_merges[0]) > max(statements.index(s) for s in node_merges)
+    # batch_size=1: one statement (and transaction) per row
+    assert all(len(rows) == 1 for _, rows in statements)
+    assert sum(len(rows) for q, rows in node_merges if "`Publication`" in q) == 2
+    assert all("MATCH (a:`Publication` {id: row.from}), (b:`Methodology` {id: row.to})" in q
+               for q, _ in rel_merges)
+    assert stats["Publication"]["rows"] == 2
+    assert stats["USES_METHOD"]["rows"] == 2
+
+
+def test_push_batched_creates_constraints_once_per_label():
+    pusher, driver = make_pusher()
+    pusher.push_batched(DOCUMENTS)
+    pusher.push_batched(DOCUMENTS)
+
+    constraints = [q for q, _ in driver.statements if q.startswith("CREATE CONSTRAINT")]
+    assert len(constraints) == 2
+    assert any("FOR (n:`Publication`) REQUIRE n.id IS UNIQUE" in q for q in constraints)
+    assert any("FOR (n:`Methodology`) REQUIRE n.id IS UNIQUE" in q for q in constraints)
+
+
+def test_ambiguous_ids_fall_back_to_unlabelled_match():
+    pusher, driver = make_pusher()
+    pusher.push_batched([{
+        "nodes": [{"label": "Result", "id": "x"}, {"label": "Phenomenon", "id": "x"},
+                  {"label": "Publication", "id": "p"}],
+        "relationships": [{"from": "p", "type": "YIELDS_RESULT", "to": "x"}],
+    }])
+
+    (query, _), = [(q, rows) for q, rows in unwind_statements(driver) if "MATCH" in q]
+    assert "(a:`Publication` {id: row.from}), (b {id: row.to})" in query
+
+
+def test_ingest_marker_is_only_written_when_configured(tmp_path, monkeypatch):
+    marker = tmp_path / ".graph_ingested"
+    monkeypatch.setattr(database_test, "ingest_marker", marker)
+    pusher, _ = make_pusher()
+    pusher.push_batched(DOCUMENTS)
+    assert not marker.exists()
+
+    pusher.marker = marker
+    pusher.push_batched(DOCUMENTS)
+    assert marker.exists()
+
+
+def test_push_data_quotes_labels_and_relationship_types():
+    pusher, driver = make_pusher()
+    pusher.push_data({
+        "nodes": [{"label": "Publication", "id": "p", "summary": "s"},
+                  {"label": "Odd Label", "id": "q"}],
+        "relationships": [{"from": "p", "type": "USES_METHOD", "to": "q"}],
+    })
+
+    queries = [q for q, _ in driver.statements if not q.startswith("CREATE CONSTRAINT")]
+    assert queries[0] == "MERGE (n:`Publication` {id: $id}) SET n += $props"
+    assert queries[1].startswith("MERGE (n:`Odd Label` {id: $id})")
+    assert queries[2].endswith("MERGE (a)-[r:`USES_METHOD`]->(b)")
+    assert driver.statements[-3][1] == {"id": "p", "props": {"summary": "s"}}
@@ -0,0 +1,61 @@
+import numpy as np
+
+from dedup import find_duplicates, normalize_doi, skip_duplicates
+
+TITLE = "bone loss in mice after spaceflight"
+
+
+def fp(name, doi="", title=TITLE, signature=None):
+    signature = np.zeros(64, dtype=np.uint64) if signature is None else signature
+    return name, 0, 0, doi, title, signature
+
+
+def test_a_doi_less_copy_never_bridges_two_dois():
+    fingerprints = {
+        "a.xml": fp("a.xml"),
+        "b.xml": fp("b.xml", "10.1000/x1"),
+        "c.xml": fp("c.xml", "10.1000/y2"),
+    }
+    groups = find_duplicates(fingerprints)
+
+    assert len(groups) == 1
+    members = {groups[0]["canonical"], *groups[0]["duplicates"]}
+    assert members in ({"a.xml", "b.xml"}, {"a.xml", "c.xml"})
+    assert groups[0]["reasons"] == ["title"]
+
+
+def test_same_doi_and_near_identical_bodies_are_grouped():
+    signature = np.arange(64, dtype=np.uint64) + 1
+    near = signature.copy()
+    near[:5] = 0
+    fingerprints = {
+        "x.xml": fp("x.xml", "10.1000/x1", "first title here now"),
+        "x_copy.xml": fp("x_copy.xml", "10.1000/x1", "other words entirely here"),
+        "y.xml": fp("y.xml", title="short", signature=signature),
+        "y_copy.xml": fp("y_copy.xml", title="tiny", signature=near),
+    }
+    groups = sorted(find_duplicates(fingerprints), key=lambda g: g["canonical"])
+
+    assert [(g["canonical"], g["duplicates"], g["reasons"]) for g in groups] == [
+        ("x.xml", ["x_copy.xml"], ["doi"]),
+        ("y.xml", ["y_copy.xml"], ["body"]),
+    ]
+
+
+def test_short_titles_alone_do_not_merge():
+    fingerprints = {"a.xml": fp("a.xml", title="introduction"), "b.xml": fp("b.xml", title="introduction")}
+    assert find_duplicates(fingerprints) == []
+
+
+def test_normalize_doi_strips_resolver_prefixes():
+    assert normalize_doi("https://doi.org/10.1000/ABC1") == normalize_doi("doi: 10.1000/abc1") == "10.1000/abc1"
+    # Truncated DOIs carry no digit after the prefix and would merge unrelated papers
+    assert normalize_doi("10.1016/j.isci") == ""
+
+
+def test_skip_duplicates_keeps_one_copy_per_paper():
+    duplicates = {"b.xml": "a.xml", "c.xml": "a.xml"}
+    assert skip_duplicates(["a.xml", "b.xml", "c.xml", "d.xml"], duplicates) == ["a.xml", "d.xml"]
+    # Without the canonical copy, the first remaining copy stands in for it
+    assert skip_duplicates(["c.xml", "b.xml"], duplicates) == ["b.xml"]
+    assert skip_duplicates(["txt/b.json", "txt/d.json"], duplicates, by_stem=True) == ["txt/b.json", "txt/d.json"]
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+import filtering_script
+import pipeline
+from filtering_script import shard_files, shard_of, stratified_sample
+
+FILES = [f"paper{i:03d}.xml" for i in range(60)]
+STRATA = {f: f"cluster {i % 3 if i < 54 else 3}" for i, f in enumerate(FILES)}
+
+
+def test_sample_is_deterministic_per_seed():
+    first = stratified_sample(FILES, 10, seed=7)
+    assert first == stratified_sample(list(reversed(FILES)), 10, seed=7)
+    assert first != stratified_sample(FILES, 10, seed=8)
+    assert first == sorted(first) and len(set(first)) == 10
+    assert stratified_sample(FILES, 100) == FILES
+
+
+def test_stratified_sample_is_proportional_and_covers_every_group():
+    sample = stratified_sample(FILES, 10, seed=7, strata=STRATA)
+    assert sample == stratified_sample(FILES, 10, seed=7, strata=STRATA)
+    counts = {g: sum(STRATA[f] == g for f in sample) for g in set(STRATA.values())}
+    # 18/18/18/6 files: the small cluster still gets one
+    assert sum(counts.values()) == 10
+    assert counts["cluster 3"] >= 1
+    assert all(counts[f"cluster {g}"] in (2, 3) for g in range(3))
+
+
+def test_shards_are_stable_and_partition_the_corpus():
+    shards = [shard_files(FILES, 4, i) for i in range(4)]
+    assert sorted(f for shard in shards for f in shard) == FILES
+    # A file's shard depends only on its own name, so new files never move others
+    grown = FILES + [f"new{i}.xml" for i in range(20)]
+    for i in range(4):
+        assert [f for f in shard_files(grown, 4, i) if f in FILES] == shards[i]
+    # SHA-1 of the name, not hash(): the same on every machine and interpreter run
+    assert (shard_of("paper000.xml", 4), shard_of("paper001.xml", 4)) == (0, 1)
+
+
+def test_cluster_strata_joins_rows_by_id_position(tmp_path, monkeypatch):
+    source = tmp_path / "corpus"
+    source.mkdir()
+    for name in ("b.xml", "a.xml", "notes.txt"):
+        (source / name).write_text("", encoding="utf-8")
+    clusters = tmp_path / "abstracts_clustered.csv"
+    clusters.write_text("ID,Abstract,cluster\n1,x,0\n2,y,1\n", encoding="utf-8")
+    monkeypatch.setattr(filtering_script, "clusters_path", str(clusters))
+    monkeypatch.setattr(filtering_script, "abstracts_path", str(tmp_path / "missing.csv"))
+
+    assert filtering_script.cluster_strata(str(source)) == {"a.xml": "cluster 0", "b.xml": "cluster 1"}
+
+    clusters.write_text("ID,Abstract,cluster\n9,x,0\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        filtering_script.cluster_strata(str(source))
+
+
+def test_pipeline_rejects_an_xml_dir_other_than_the_manifest_source(tmp_path):
+    manifest = tmp_path / "shard.json"
+    manifest.write_text(json.dumps({"source": str(tmp_path), "files": ["a.xml"]}), encoding="utf-8")
+
+    assert pipeline.load_file_list(str(manifest)) == (str(tmp_path), {"a.xml"})
+    assert pipeline.load_file_list(None) == (None, None)
+    with pytest.raises(SystemExit):
+        pipeline.main(["--files", str(manifest), "--xml-dir", str(tmp_path / "elsewhere"),
+                       "--manifest", str(tmp_path / "m.json"), "--stages", "repair"])
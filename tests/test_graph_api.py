@@ -0,0 +1,131 @@
+import asyncio
+import os
+
+import pytest
+
+import graph_api
+from graph_api import MemoryGraph, QueryService, load_cluster_titles, match_titles
+
+DOCUMENTS = [
+    {
+        "nodes": [
+            {"label": "Publication", "id": "37DayMicrogravityExposureInFemaleMice"},
+            {"label": "Publication", "id": "rootGrowth", "name": "ARG1 Functions in Root Growth"},
+            {"label": "Publication", "id": "plantSignalling"},
+            {"label": "Methodology", "id": "rnaSeq"},
+        ],
+        "relationships": [
+            {"from": "37DayMicrogravityExposureInFemaleMice", "type": "USES_METHOD", "to": "rnaSeq"},
+            {"from": "rootGrowth", "type": "USES_METHOD", "to": "rnaSeq"},
+        ],
+    }
+]
+
+
+class CountingGraph(MemoryGraph):
+    """MemoryGraph that counts how often each query reaches the backend."""
+
+    def __init__(self, documents, latency=0.0):
+        super().__init__(documents, latency)
+        self.calls = 0
+
+    async def neighbours(self, *args, **kwargs):
+        self.calls += 1
+        return await super().neighbours(*args, **kwargs)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_cluster_query_returns_its_papers(tmp_path):
+    csv_path = tmp_path / "abstracts_clustered.csv"
+    csv_path.write_text(
+        "ID,Abstract,cluster,Title\n"
+        '1,a,0,"37-day microgravity exposure in female mice, a bone loss study"\n'
+        "2,b,0,ARG1 functions in root growth\n"
+        "3,c,1,Plant signalling\n",
+        encoding="utf-8",
+    )
+    service = QueryService(MemoryGraph(DOCUMENTS), load_cluster_titles(str(csv_path)), marker=None)
+
+    page = run(service.nodes(cluster="0"))
+    assert [item["id"] for item in page["items"]] == ["37DayMicrogravityExposureInFemaleMice", "rootGrowth"]
+    assert [item["id"] for item in run(service.nodes(cluster=1))["items"]] == ["plantSignalling"]
+    assert run(service.nodes(cluster=7))["total"] == 0
+
+
+def test_cluster_titles_fall_back_to_the_corpus_listing(tmp_path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    for name in ("b_Plant_signalling.pdf.tei.xml", "a_Root_growth.pdf.tei.xml"):
+        (corpus / name).write_text("<TEI/>", encoding="utf-8")
+    csv_path = tmp_path / "abstracts_clustered.csv"
+    csv_path.write_text("ID,Abstract,cluster\n1,a,0\n2,b,1\n3,c,1\n", encoding="utf-8")
+
+    assert load_cluster_titles(str(csv_path), str(corpus)) == {0: ["a Root growth"], 1: ["b Plant signalling"]}
+
+
+def test_match_titles_needs_a_long_prefix():
+    publications = [{"id": "plantGrowth", "name": None}, {"id": "boneLossInMiceAfterFlight", "name": None}]
+    assert match_titles(["Plant growth under microgravity"], publications) == []
+    assert match_titles(["Bone loss in mice after flight aboard the ISS"], publications) == ["boneLossInMiceAfterFlight"]
+    assert match_titles(["Plant growth"], publications) == ["plantGrowth"]
+
+
+def test_repeated_queries_hit_the_cache():
+    graph = CountingGraph(DOCUMENTS)
+    service = QueryService(graph, marker=None)
+    first = run(service.neighbours("rnaSeq"))
+    second = run(service.neighbours("rnaSeq"))
+
+    assert first == second and first["total"] == 2
+    assert graph.calls == 1
+    assert service.stats["hits"] == 1 and service.stats["misses"] == 1
+
+
+def test_ingest_marker_invalidates_the_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(graph_api, "ingest_check_interval", 0.0)
+    marker = tmp_path / ".graph_ingested"
+    graph = CountingGraph(DOCUMENTS)
+    service = QueryService(graph, marker=marker)
+    run(service.neighbours("rnaSeq"))
+
+    marker.touch()
+    run(service.neighbours("rnaSeq"))
+    assert service.stats["invalidations"] == 1
+    assert graph.calls == 2
+
+    os.utime(marker, ns=(0, 0))
+    run(service.neighbours("rnaSeq"))
+    assert service.stats["invalidations"] == 2
+
+
+def test_identical_queries_in_flight_are_coalesced():
+    graph = CountingGraph(DOCUMENTS, latency=0.05)
+    service = QueryService(graph, marker=None)
+
+    async def burst():
+        return await asyncio.gather(*(service.neighbours("rnaSeq") for _ in range(10)))
+
+    results = run(burst())
+    assert all(r == results[0] for r in results)
+    assert graph.calls == 1
+    assert service.stats["coalesced"] == 9
+
+
+def test_pagination_bounds():
+    service = QueryService(MemoryGraph(DOCUMENTS), marker=None)
+
+    page = run(service.nodes("Publication", skip=-5, limit=2))
+    assert (page["skip"], page["limit"], page["total"], page["next"]) == (0, 2, 3, 2)
+    assert len(page["items"]) == 2
+
+    last = run(service.nodes("Publication", skip=2, limit=2))
+    assert len(last["items"]) == 1 and last["next"] is None
+
+    assert run(service.nodes("Publication", limit=10**6))["limit"] == graph_api.max_page_size
+    assert run(service.nodes("Publication", limit=0))["limit"] == graph_api.default_page_size
+
+    with pytest.raises(ValueError):
+        run(service.nodes("NotALabel"))
@@ -0,0 +1,54 @@
+import graph_snapshot
+from graph_snapshot import GraphSnapshot, build_snapshot, load_documents
+
+DOCUMENTS = [
+    {
+        "nodes": [
+            {"label": "Publication", "id": "paperA"},
+            {"label": "Result", "id": "boneLoss", "summary": "result"},
+            {"label": "Phenomenon", "id": "boneLoss", "type": "Physiological"},
+        ],
+        "relationships": [{"from": "paperA", "type": "YIELDS_RESULT", "to": "boneLoss"}],
+    },
+    {
+        "nodes": [{"label": "Publication", "id": "paperB"}],
+        "relationships": [{"from": "paperB", "type": "CITES", "to": "paperC"}],
+    },
+]
+
+
+def test_nodes_are_keyed_by_label_and_id(tmp_path):
+    path = tmp_path / "graph.bin"
+    counts = build_snapshot(DOCUMENTS, path)
+    graph = GraphSnapshot(path)
+    try:
+        # boneLoss is two nodes; the unlabelled edge endpoint reaches both, as in Neo4j
+        assert counts == {"nodes": 5, "edges": 3, "labels": 4, "rel_types": 2}
+        assert graph.node("boneLoss", "Result") == {"id": "boneLoss", "label": "Result", "summary": "result"}
+        assert graph.node("boneLoss", "Phenomenon")["type"] == "Physiological"
+        assert graph.node("boneLoss", "Publication") is None
+        assert len(graph.neighbours("paperA")) == 2
+        assert graph.neighbours("boneLoss", direction="in") == [("YIELDS_RESULT", "in", "paperA")] * 2
+        assert graph.filter("Phenomenon", type="physiological") == ["boneLoss"]
+        assert graph.follow("paperA", [["YIELDS_RESULT"]], labels=["Result"]) == ["boneLoss"]
+        assert graph.k_hop("boneLoss", 1) == {"boneLoss": 0, "paperA": 1}
+        assert graph.path("boneLoss", "paperA") == ["boneLoss", "paperA"]
+        # Endpoints without a node record are kept, unlabelled
+        assert graph.node("paperC") == {"id": "paperC", "label": ""}
+    finally:
+        graph.close()
+
+
+def test_load_documents_applies_the_alias_table(tmp_path, monkeypatch):
+    (tmp_path / "paper.json").write_text(
+        '{"nodes": [{"label": "Publication", "id": "p"}, {"label": "Result", "id": "boneLosses"}],'
+        ' "relationships": [{"from": "p", "type": "YIELDS_RESULT", "to": "boneLosses"}]}',
+        encoding="utf-8",
+    )
+    table = tmp_path.parent / f"{tmp_path.name}_alias_table.json"
+    table.write_text('{"Result": {"boneLosses": "boneLoss"}}', encoding="utf-8")
+    monkeypatch.setattr(graph_snapshot, "alias_path", table)
+
+    data, = load_documents(tmp_path)
+    assert [n["id"] for n in data["nodes"]] == ["p", "boneLoss"]
+    assert data["relationships"] == [{"from": "p", "type": "YIELDS_RESULT", "to": "boneLoss"}]
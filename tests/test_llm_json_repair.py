@@ -0,0 +1,67 @@
+import pytest
+
+from llm_json_repair import parse_llm_output, strip_fences, validate_document
+
+
+def test_valid_json_needs_no_fixes():
+    assert parse_llm_output('{"nodes": [], "relationships": []}') == (
+        {"nodes": [], "relationships": []}, [])
+
+
+def test_strip_fences_drops_text_around_the_outer_braces():
+    text = '```json\nHere it is: {"a": "}", "b": {"c": 1}} Hope this helps {x}\n```'
+    assert strip_fences(text) == '{"a": "}", "b": {"c": 1}}'
+    # Truncated output has no closing brace, so its tail is kept for close_truncated
+    assert strip_fences('Sure: {"a": [1, 2') == '{"a": [1, 2'
+
+
+def test_parse_applies_only_the_fixes_it_needs():
+    data, fixes = parse_llm_output('```json\n{"nodes": [{"label": {"label": "Result", "id": "r1"},]}\n```')
+    assert data == {"nodes": [{"label": "Result", "id": "r1"}]}
+    assert fixes == ["markdown fences", "nested label", "trailing commas"]
+
+
+def test_parse_closes_truncated_arrays_and_keeps_string_contents():
+    data, fixes = parse_llm_output('{"nodes": [{"label": "Result", "id": "a,]"}, {"label": "Res')
+    assert data == {"nodes": [{"label": "Result", "id": "a,]"}]}
+    assert fixes == ["truncated output"]
+
+
+def test_parse_raises_on_unrepairable_text():
+    with pytest.raises(ValueError):
+        parse_llm_output("no json here")
+
+
+def test_validate_document_drops_invalid_items_and_merges_nodes():
+    document, errors, warnings = validate_document({
+        "nodes": [
+            {"label": "Publication", "id": "p", "summary": "s"},
+            {"label": "Publication", "id": "p", "DOI": "10.1000/x1"},
+            {"label": "Result", "id": 42},
+            {"label": "bad label", "id": "x"},
+            {"label": "Publication", "id": ""},
+        ],
+        "relationships": [
+            {"from": "p", "type": "yields_result", "to": 42},
+            {"from": "p", "type": "YIELDS_RESULT", "to": "42"},
+            {"from": "p", "type": "USES_METHOD", "to": "missing"},
+            {"from": "p", "to": "42"},
+        ],
+    })
+
+    assert document["nodes"] == [
+        {"label": "Publication", "id": "p", "summary": "s", "DOI": "10.1000/x1"},
+        {"label": "Result", "id": "42"},
+    ]
+    assert document["relationships"] == [
+        {"from": "p", "type": "YIELDS_RESULT", "to": "42"},
+        {"from": "p", "type": "USES_METHOD", "to": "missing"},
+    ]
+    assert len(errors) == 3
+    assert any("endpoint missing" in w for w in warnings)
+
+
+def test_validate_document_rejects_a_non_document():
+    document, errors, _ = validate_document({"nodes": "oops"})
+    assert document == {"nodes": [], "relationships": []}
+    assert errors
@@ -0,0 +1,45 @@
+import threading
+import tracemalloc
+
+from metrics import Metrics
+
+
+def test_overlapping_stages_share_one_trace(tmp_path):
+    metrics = Metrics(enabled=True, path=str(tmp_path / "run.jsonl"), profile=True, memory=True)
+    entered, release = threading.Event(), threading.Event()
+
+    def other_stage():
+        with metrics.stage("embed"):
+            entered.set()
+            release.wait(5)
+
+    with metrics.stage("load"):
+        thread = threading.Thread(target=other_stage)
+        thread.start()
+        entered.wait(5)
+        # The second stage must not stop or reset the trace the first one relies on
+        assert tracemalloc.is_tracing()
+        release.set()
+        thread.join()
+        assert tracemalloc.is_tracing()
+    assert not tracemalloc.is_tracing()
+    metrics.close()
+
+    stages = {s["stage"]: s for s in metrics.stages}
+    assert stages["load"]["shared_peak"] and stages["embed"]["shared_peak"]
+    # Only the stage that started with nothing else running is profiled
+    assert "profile" in stages["load"] and "profile" not in stages["embed"]
+
+
+def test_sequential_stages_get_their_own_peak(tmp_path):
+    metrics = Metrics(enabled=True, path=str(tmp_path / "run.jsonl"), profile=False, memory=True)
+    with metrics.stage("big"):
+        block = bytearray(20_000_000)
+        del block
+    with metrics.stage("small"):
+        pass
+    metrics.close()
+
+    big, small = metrics.stages
+    assert big["peak_mb"] > 15 and small["peak_mb"] < 15
+    assert not big["shared_peak"] and not small["shared_peak"]